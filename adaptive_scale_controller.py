@@ -0,0 +1,56 @@
+class AdaptiveScaleController:
+
+    '''
+    This class adapts the downsize factor (scale_percent) of the webcam frames used for object detection to hold a
+    target frame rate on the current CPU. The processing time per frame is smoothed, and after every change the
+    controller waits some frames before it changes the scale again, so it does not oscillate.
+    @author: Marcel Achner
+    '''
+    def __init__(self, target_fps=15, scale_percent=100, min_scale_percent=30, max_scale_percent=100,
+                 step_percent=10, tolerance=0.15, smoothing=0.2, cooldown_frames=15):
+        self.target_fps = target_fps
+        self.scale_percent = scale_percent
+        self.min_scale_percent = min_scale_percent
+        self.max_scale_percent = max_scale_percent
+        self.step_percent = step_percent
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.cooldown_frames = cooldown_frames
+        self.frame_time = None
+        self.frames_since_change = 0
+
+    '''
+    This function takes the processing time of the last frame in seconds and returns the scale for the next frame
+    @author: Marcel Achner
+    '''
+    def update(self, frame_time):
+        if self.frame_time is None:
+            self.frame_time = frame_time
+        else:
+            self.frame_time = self.smoothing * frame_time + (1 - self.smoothing) * self.frame_time
+
+        self.frames_since_change += 1
+        if self.frames_since_change < self.cooldown_frames or self.frame_time <= 0:
+            return self.scale_percent
+
+        fps = 1 / self.frame_time
+        if fps < self.target_fps * (1 - self.tolerance) and self.scale_percent > self.min_scale_percent:
+            self.set_scale(max(self.min_scale_percent, self.scale_percent - self.step_percent))
+        elif fps > self.target_fps * (1 + self.tolerance) and self.scale_percent < self.max_scale_percent:
+            self.set_scale(min(self.max_scale_percent, self.scale_percent + self.step_percent))
+        return self.scale_percent
+
+    def set_scale(self, scale_percent):
+        self.scale_percent = scale_percent
+        self.frames_since_change = 0
+        # the smoothed time belongs to the old scale
+        self.frame_time = None
+
+    '''
+    This function returns the smoothed frame rate
+    @author: Marcel Achner
+    '''
+    def get_fps(self):
+        if not self.frame_time:
+            return None
+        return 1 / self.frame_time
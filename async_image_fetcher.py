@@ -0,0 +1,78 @@
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from image_fetcher import IMAGE_OK
+
+
+class AsyncImageFetcher:
+
+    '''
+    This class downloads the images of one class concurrently with asyncio. The blocking downloads of the image
+    fetcher run in a thread pool, the amount of requests in flight is limited for the whole process and per host.
+    As soon as the quota of images is reached, all pending downloads are cancelled.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, image_fetcher, requests_in_flight=16, requests_per_host=4):
+        self.image_fetcher = image_fetcher
+        self.requests_in_flight = requests_in_flight
+        self.requests_per_host = requests_per_host
+
+    '''
+    This function downloads the given (url, target) pairs until the quota is reached. Every image that passed the
+    checks of the image fetcher is passed to save_image(url, target, content), which returns True if the image counts
+    for the quota, None if it does not (e.g. a duplicate) and False to stop the download (e.g. if other processes
+    reached the quota). If record_outcome is given, it gets the url and outcome of
+    every finished download. The amount of saved images is returned.
+    @author: Bastian Pechler
+    '''
+    def download(self, img_jobs, quota, save_image, record_outcome=None):
+        if quota <= 0 or len(img_jobs) == 0:
+            return 0
+        return asyncio.run(self.download_async(img_jobs, quota, save_image, record_outcome))
+
+    async def download_async(self, img_jobs, quota, save_image, record_outcome=None):
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=self.requests_in_flight)
+        in_flight = asyncio.Semaphore(self.requests_in_flight)
+        per_host = defaultdict(lambda: asyncio.Semaphore(self.requests_per_host))
+        quota_reached = asyncio.Event()
+        saved_images = 0
+
+        async def download_image(img_url, img_target):
+            nonlocal saved_images
+            # the host slot is taken first, so requests waiting for a busy host do not block other hosts
+            async with per_host[urlsplit(img_url).hostname]:
+                async with in_flight:
+                    if quota_reached.is_set():
+                        return
+                    outcome, content = await loop.run_in_executor(executor, self.image_fetcher.fetch, img_url)
+            if record_outcome is not None:
+                record_outcome(img_url, outcome)
+            if outcome != IMAGE_OK or quota_reached.is_set():
+                return
+            saved = save_image(img_url, img_target, content)
+            if saved is False:
+                quota_reached.set()
+                return
+            if not saved:
+                return
+            saved_images += 1
+            if saved_images >= quota:
+                quota_reached.set()
+
+        tasks = [asyncio.ensure_future(download_image(img_url, img_target))
+                 for img_url, img_target in img_jobs]
+        all_downloads = asyncio.gather(*tasks, return_exceptions=True)
+        stop_task = asyncio.ensure_future(quota_reached.wait())
+        try:
+            await asyncio.wait([stop_task, all_downloads], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop_task.cancel()
+            for task in tasks:
+                task.cancel()
+            await all_downloads
+            # downloads already running in the thread pool are finished within the timeout, their result is ignored
+            executor.shutdown(wait=False, cancel_futures=True)
+        return saved_images
@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from box_tracker import BoxTracker, DetectionScheduler
+from model.boxTrackingImagenet.detector1K.detections import Detections
+
+FRAME_WIDTH = 800
+FRAME_HEIGHT = 600
+FRAMES = 300
+
+
+'''
+This class simulates a webcam scene with objects moving at constant speed. The detector returns the true boxes with
+some jitter, misses some objects and burns a fixed amount of CPU time like the ONNX object localizer would.
+@author: Marcel Achner
+'''
+class SyntheticScene:
+    def __init__(self, amount_objects=4, detector_ms=25.0, jitter=3.0, miss_rate=0.1, seed=0):
+        self.rng = np.random.default_rng(seed)
+        positions = self.rng.uniform([50, 50], [500, 350], (amount_objects, 2))
+        sizes = self.rng.uniform(80, 200, (amount_objects, 2))
+        self.start_boxes = np.concatenate([positions, positions + sizes], axis=1)
+        self.velocities = np.repeat(self.rng.uniform(-2, 2, (amount_objects, 2)), 2, axis=0).reshape(-1, 4)
+        self.detector_seconds = detector_ms / 1000
+        self.jitter = jitter
+        self.miss_rate = miss_rate
+
+    def true_boxes(self, frame_index):
+        return self.start_boxes + self.velocities * frame_index
+
+    def frame(self, frame_index):
+        image = np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+        for box in self.true_boxes(frame_index).astype(int):
+            cv2.rectangle(image, (box[0], box[1]), (box[2], box[3]), (200, 180, 160), -1)
+        return image
+
+    def detect(self, frame_index):
+        end_time = time.process_time() + self.detector_seconds
+        while time.process_time() < end_time:
+            pass
+        boxes = self.true_boxes(frame_index) + self.rng.normal(0, self.jitter, (len(self.start_boxes), 4))
+        boxes = boxes[self.rng.uniform(size=len(boxes)) >= self.miss_rate]
+        return Detections(boxes, np.ones(len(boxes), dtype=np.float32), np.zeros(len(boxes), dtype=int))
+
+
+'''
+This function runs the scene with the given detection interval and returns the CPU time per frame, the track id
+switches per object (an object getting another track id, frames without box are not counted), the share of frames
+in which an object has no box and the mean intersection over union of the shown boxes with the true boxes
+@author: Marcel Achner
+'''
+def run(detection_interval, frames):
+    scene = SyntheticScene()
+    scheduler = DetectionScheduler(detection_interval)
+    tracker = BoxTracker.for_detection_interval(detection_interval)
+    images = [scene.frame(i) for i in range(frames)]
+
+    cpu_time = 0.0
+    id_switches = 0
+    missing_boxes = 0
+    last_ids = {}
+    ious = []
+    detector_runs = 0
+    for frame_index, image in enumerate(images):
+        start_time = time.process_time()
+        if scheduler.should_detect(image):
+            detector_runs += 1
+            detections = tracker.update(scene.detect(frame_index))
+        else:
+            detections = tracker.predict()
+        cpu_time += time.process_time() - start_time
+
+        true_boxes = scene.true_boxes(frame_index)
+        # every object is matched to at most one shown box, so the box of a neighbour does not count for it
+        object_matches, box_matches = tracker.associate(true_boxes, detections.boxes)
+        iou = BoxTracker.iou_matrix(true_boxes, detections.boxes) if len(detections) > 0 else None
+        missing_boxes += len(true_boxes) - len(object_matches)
+        ious.extend([0.0] * (len(true_boxes) - len(object_matches)))
+        for object_index, box_index in zip(object_matches, box_matches):
+            ious.append(iou[object_index, box_index])
+            track_id = detections.track_ids[box_index]
+            if object_index in last_ids and track_id != last_ids[object_index]:
+                id_switches += 1
+            last_ids[object_index] = track_id
+
+    amount_objects = len(scene.start_boxes)
+    return cpu_time / frames, id_switches / amount_objects, missing_boxes / (frames * amount_objects), \
+        float(np.mean(ious)), detector_runs
+
+
+def main():
+    print('interval  cpu/frame  detector runs  id switches/object  missing boxes  mean IoU')
+    for detection_interval in [1, 3, 5, 10]:
+        frame_time, switches, missing, mean_iou, runs = run(detection_interval, FRAMES)
+        print(f'{detection_interval:8d}  {frame_time * 1000:6.2f} ms  {runs:13d}  {switches:18.2f}  '
+              f'{missing * 100:12.1f}%  {mean_iou:8.3f}')
+
+
+if __name__ == '__main__':
+    main()
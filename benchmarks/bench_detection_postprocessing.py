@@ -0,0 +1,89 @@
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model.boxTrackingImagenet.detector1K.detections import Detections
+
+IMAGE_WIDTH = 800
+IMAGE_HEIGHT = 600
+THRESHOLD = 0.22
+
+
+'''
+This function creates synthetic outputs of the object localizer (boxes, classes, scores, number of objects)
+@author: Marcel Achner
+'''
+def synthetic_outputs(num_objects, seed=0):
+    rng = np.random.default_rng(seed)
+    y1 = rng.uniform(0, 0.8, num_objects)
+    x1 = rng.uniform(0, 0.8, num_objects)
+    boxes = np.stack([y1, x1, y1 + 0.2, x1 + 0.2], axis=1).astype(np.float32)[np.newaxis]
+    classes = np.zeros((1, num_objects), dtype=np.float32)
+    scores = rng.uniform(0, 1, (1, num_objects)).astype(np.float32)
+    return [boxes, classes, scores, np.array([num_objects], dtype=np.float32)]
+
+
+'''
+This function is the former per detection loop of Detector1K.process_output and Detector1K.draw_detections
+(without drawing), used as baseline
+@author: Marcel Achner
+'''
+def legacy_postprocessing(outputs, scale_percent=100):
+    boxes = np.squeeze(outputs[0])
+    scores = np.squeeze(outputs[2])
+    num_objects = int(outputs[3][0])
+
+    results = []
+    for i in range(num_objects):
+        if scores[i] >= THRESHOLD:
+            y1 = (IMAGE_HEIGHT * boxes[i][0]).astype(int)
+            y2 = (IMAGE_HEIGHT * boxes[i][2]).astype(int)
+            x1 = (IMAGE_WIDTH * boxes[i][1]).astype(int)
+            x2 = (IMAGE_WIDTH * boxes[i][3]).astype(int)
+            results.append({
+                'bounding_box': np.array([x1, y1, x2, y2], dtype=int),
+                'class_id': 0,
+                'label': "",
+                'detection_score': scores[i],
+                'classification_score': 0,
+            })
+
+    boxes_list = []
+    for detection in results:
+        box = detection['bounding_box']
+        if int(box[3]) + (30 * (scale_percent / 100)) >= IMAGE_HEIGHT / (100 / scale_percent):
+            continue
+        boxes_list.append(np.multiply(box, (100 / scale_percent)))
+    return boxes_list
+
+
+'''
+This function is the column wise post processing used by Detector1K now (process_output and filter_detections),
+the detection runs on the full image
+@author: Marcel Achner
+'''
+def vectorized_postprocessing(outputs):
+    detections = Detections.from_model_outputs(outputs, THRESHOLD, IMAGE_WIDTH, IMAGE_HEIGHT)
+    return detections.fit_to_image(IMAGE_WIDTH, IMAGE_HEIGHT, IMAGE_WIDTH, IMAGE_HEIGHT).to_boxes_list()
+
+
+def main():
+    for num_objects in [10, 100, 1000]:
+        outputs = synthetic_outputs(num_objects)
+        legacy = legacy_postprocessing(outputs)
+        vectorized = vectorized_postprocessing(outputs)
+        assert len(legacy) == len(vectorized)
+        assert all(np.array_equal(a, b) for a, b in zip(legacy, vectorized))
+
+        repetitions = 200
+        legacy_time = timeit.timeit(lambda: legacy_postprocessing(outputs), number=repetitions) / repetitions
+        vectorized_time = timeit.timeit(lambda: vectorized_postprocessing(outputs), number=repetitions) / repetitions
+        print(f'{num_objects:5d} detections: loop {legacy_time * 1e6:9.1f} us, '
+              f'vectorized {vectorized_time * 1e6:9.1f} us, speedup {legacy_time / vectorized_time:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
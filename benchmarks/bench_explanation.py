@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+
+import numpy as np
+from lime import lime_image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from explanation_engine import ExplanationEngine
+from prediction_cache import PredictionCache
+
+DEFAULT_MODEL_PATH = 'model_backup.h5'
+NUM_SAMPLES = 1000
+
+'''
+This benchmark compares a LIME explanation of one image with LimeImageExplainer (batches of 10 samples) to the
+explanation engine: preview, refinement to all samples and a repeated request of the same image. With a saved keras
+model the real forward passes are measured, otherwise a small synthetic classifier is used.
+@author: Marcel Achner
+'''
+
+
+'''
+This function returns the predict function of the keras model or of a synthetic classifier which detects a striped
+object in the image
+@author: Marcel Achner
+'''
+def make_predict_batch(model_path):
+    if os.path.isfile(model_path):
+        import tensorflow as tf
+        model = tf.keras.models.load_model(model_path, compile=False)
+        return lambda images: model(images.astype(np.float32), training=False).numpy()
+
+    print(f'model file {model_path} not found, using a synthetic classifier')
+
+    def predict_batch(images):
+        stripes = (images[:, 60:120, 80:160, 1] > 200).mean(axis=(1, 2)) * 4
+        return np.stack([1 - stripes * 0.8, stripes * 0.8, np.zeros(len(images))], axis=1)
+    return predict_batch
+
+
+def make_image():
+    rng = np.random.default_rng(1)
+    image = (rng.random((224, 224, 3)) * 60).astype(np.uint8)
+    image[60:120, 80:160] = (220, 40, 40)
+    image[60:120:4, 80:160] = (255, 255, 255)
+    return image
+
+
+def main():
+    predict_batch = make_predict_batch(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODEL_PATH)
+    image = make_image()
+    image_bytes = image.tobytes()
+
+    start_time = time.perf_counter()
+    lime_image.LimeImageExplainer().explain_instance(image, predict_batch, top_labels=1, num_samples=NUM_SAMPLES,
+                                                     random_seed=0)
+    lime_time = time.perf_counter() - start_time
+
+    engine = ExplanationEngine(predict_batch, PredictionCache(), full_samples=NUM_SAMPLES)
+    start_time = time.perf_counter()
+    engine.explain(image_bytes, image, engine.preview_samples)
+    preview_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    engine.explain(image_bytes, image, engine.full_samples)
+    refine_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    engine.explain(image_bytes, image, engine.full_samples)
+    cached_time = time.perf_counter() - start_time
+
+    results = [(f'LimeImageExplainer ({NUM_SAMPLES} samples)', lime_time),
+               (f'engine preview ({engine.preview_samples} samples)', preview_time),
+               (f'engine refinement (+{NUM_SAMPLES - engine.preview_samples} samples)', refine_time),
+               ('engine repeated request', cached_time)]
+    for name, seconds in results:
+        print(f'{name:40s} {seconds:7.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+import requests
+from requests.exceptions import ConnectionError, ReadTimeout
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from image_fetcher import ImageFetcher, IMAGE_OK
+from local_image_server import start_server, make_urls
+
+AMOUNT_IMAGES = 400
+
+
+'''
+This function is the former download of ImageNetDownloadProcess.get_images: one bare request per image, the whole
+body is downloaded before content type and size are checked
+@author: Bastian Pechler
+'''
+def fetch_without_session(urls):
+    downloaded = 0
+    for img_url in urls:
+        try:
+            img_resp = requests.get(img_url, timeout=1)
+        except (ConnectionError, ReadTimeout):
+            continue
+        if 'image' not in img_resp.headers.get('content-type', ''):
+            continue
+        if len(img_resp.content) < 1000:
+            continue
+        downloaded += 1
+    return downloaded
+
+
+'''
+This function downloads the images with the pooled, streaming image fetcher
+@author: Bastian Pechler
+'''
+def fetch_with_session(urls):
+    image_fetcher = ImageFetcher(timeout=1)
+    downloaded = sum(1 for img_url in urls if image_fetcher.fetch(img_url)[0] == IMAGE_OK)
+    image_fetcher.close()
+    return downloaded
+
+
+def main():
+    server, port = start_server()
+    urls = make_urls(port, AMOUNT_IMAGES)
+    for name, fetch in [('bare requests.get', fetch_without_session), ('pooled session', fetch_with_session)]:
+        start_time = time.perf_counter()
+        downloaded = fetch(urls)
+        elapsed = time.perf_counter() - start_time
+        print(f'{name:20s} {downloaded} of {len(urls)} images in {elapsed:6.2f} s '
+              f'({len(urls) / elapsed:7.1f} urls/s)')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
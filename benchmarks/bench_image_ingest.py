@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from image_ingest import ImageIngest
+
+AMOUNT_IMAGES = 40
+TRAINING_SIZE = (224, 224)
+
+'''
+This benchmark compares the images as downloaded (photos up to 4000 pixels, PNG with alpha channel, grayscale and
+broken files) with their training copies of the image ingest: bytes on disk and the time to decode and resize them
+to the input size of the model once per epoch.
+@author: Bastian Pechler
+'''
+
+
+'''
+This function creates downloaded images of different sizes and formats, some of them truncated
+@author: Bastian Pechler
+'''
+def make_downloads():
+    rng = np.random.default_rng(0)
+    downloads = []
+    for i in range(AMOUNT_IMAGES):
+        width, height = [(4000, 3000), (1600, 1200), (640, 480), (3000, 2000)][i % 4]
+        # smooth content like a photo, noise would not be compressed
+        img = cv2.resize(rng.integers(0, 255, (height // 50, width // 50, 3), dtype=np.uint8), (width, height),
+                         interpolation=cv2.INTER_CUBIC)
+        if i % 5 == 1:
+            encoded = cv2.imencode('.png', cv2.cvtColor(img, cv2.COLOR_BGR2BGRA))[1].tobytes()
+        elif i % 5 == 2:
+            encoded = cv2.imencode('.jpg', cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))[1].tobytes()
+        else:
+            encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+        if i % 10 == 9:
+            encoded = encoded[:len(encoded) // 50]
+        downloads.append(encoded)
+    return downloads
+
+
+'''
+This function decodes and resizes all images like the training input does once per epoch
+@author: Bastian Pechler
+'''
+def load_epoch(images):
+    start_time = time.perf_counter()
+    for content in images:
+        img = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is not None:
+            cv2.resize(img, TRAINING_SIZE, interpolation=cv2.INTER_AREA)
+    return time.perf_counter() - start_time
+
+
+def main():
+    downloads = make_downloads()
+    image_ingest = ImageIngest(short_side=256)
+    start_time = time.perf_counter()
+    ingested = [image_ingest.ingest(content) for content in downloads]
+    ingest_time = time.perf_counter() - start_time
+    rejected = sum(1 for content in ingested if content is None)
+    ingested = [content for content in ingested if content is not None]
+
+    print(f'ingest once: {ingest_time:6.2f} s, {rejected} of {len(downloads)} images rejected')
+    for name, images in [('as downloaded', downloads), ('ingested', ingested)]:
+        sizes = np.array([len(content) for content in images]) / 1024
+        print(f'{name:14s} {sizes.sum() / 1024:7.2f} MB on disk (max {sizes.max():7.1f} KB per image), '
+              f'{load_epoch(images):6.3f} s per epoch')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model.boxTrackingImagenet.detector1K.detector1K import Detector1K
+
+DEFAULT_MODEL_PATH = 'model/boxTrackingImagenet/models/object_localizer_float32.onnx'
+FRAMES = 100
+
+
+'''
+This function is the former Detector1K.prepare_input and inference path which creates new arrays for every frame
+@author: Marcel Achner
+'''
+def legacy_detect(detector, img):
+    img = cv2.resize(img, (detector.input_width, detector.input_height))
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    img = img.transpose(2, 0, 1)
+    input_tensor = img[np.newaxis, :, :, :].astype(np.float32)
+    return detector.session.run(detector.output_names, {detector.input_name: input_tensor})
+
+
+'''
+This function is the current path using the preallocated input tensor bound to the session
+@author: Marcel Achner
+'''
+def buffered_detect(detector, img):
+    detector.img_height, detector.img_width, detector.img_channels = img.shape
+    return detector.inference(detector.prepare_input(img))
+
+
+'''
+This function measures the peak memory allocated by numpy per frame (traced by tracemalloc) and the time per frame
+@author: Marcel Achner
+'''
+def measure(detect, detector, frames):
+    detect(detector, frames[0])
+    peaks = []
+    start_time = time.perf_counter()
+    tracemalloc.start()
+    for frame in frames:
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        detect(detector, frame)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    elapsed = time.perf_counter() - start_time
+    return np.mean(peaks), elapsed / len(frames)
+
+
+def main():
+    model_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODEL_PATH
+    detector = Detector1K(model_path)
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (600, 800, 3), dtype=np.uint8) for _ in range(FRAMES)]
+
+    legacy_tensor = cv2.cvtColor(cv2.resize(frames[0], (detector.input_width, detector.input_height)),
+                                 cv2.COLOR_BGR2RGB).transpose(2, 0, 1)[np.newaxis].astype(np.float32)
+    detector.img_height, detector.img_width, detector.img_channels = frames[0].shape
+    np.testing.assert_array_equal(legacy_tensor, detector.prepare_input(frames[0]))
+
+    for name, detect in [('before (new arrays per frame)', legacy_detect),
+                         ('after (preallocated + io binding)', buffered_detect)]:
+        allocated, frame_time = measure(detect, detector, frames)
+        print(f'{name:35s} allocated per frame {allocated / 1024:9.1f} KiB, {frame_time * 1000:6.2f} ms/frame')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from async_image_fetcher import AsyncImageFetcher
+from image_fetcher import ImageFetcher, IMAGE_OK
+from local_image_server import start_server, make_urls, FaultInjectingRequestHandler
+from rate_limiter import RateLimiter
+
+AMOUNT_IMAGES = 400
+
+'''
+This benchmark downloads a url list spread over a good, a throttling and a slow host of the fault injecting server,
+once without and once with the shared rate limiter. Without it, the slow host costs a timeout per url and the
+throttling host answers most requests with 429, with it the slow host is skipped after some timeouts and the
+throttling host is paced and retried.
+@author: Bastian Pechler
+'''
+
+
+def download(urls, rate_limiter):
+    image_fetcher = ImageFetcher(timeout=1, pool_maxsize=8, rate_limiter=rate_limiter)
+    outcomes = {}
+    record_outcome = lambda img_url, outcome: outcomes.__setitem__(outcome, outcomes.get(outcome, 0) + 1)
+    start_time = time.perf_counter()
+    AsyncImageFetcher(image_fetcher, requests_in_flight=16, requests_per_host=4).download(
+        [(img_url, None) for img_url in urls], len(urls), lambda img_url, img_target, content: True, record_outcome)
+    elapsed = time.perf_counter() - start_time
+    image_fetcher.close()
+    return elapsed, outcomes
+
+
+def main():
+    server, port = start_server(FaultInjectingRequestHandler)
+    urls = make_urls(port, AMOUNT_IMAGES)
+    manager = multiprocessing.Manager()
+    rate_limiter = RateLimiter(manager, rate_per_host=40, burst=4, failure_threshold=4)
+    for name, limiter in [('no rate limiter', None), ('shared rate limiter', rate_limiter)]:
+        elapsed, outcomes = download(urls, limiter)
+        print(f'{name:20s} {outcomes.get(IMAGE_OK, 0)} of {len(urls)} images in {elapsed:6.2f} s  {outcomes}')
+    print('skipped hosts:', rate_limiter.get_open_hosts())
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shard_packer import ShardPacker, ShardDataset
+
+AMOUNT_CLASSES = 10
+IMAGES_PER_CLASS = 200
+BATCH_SIZE = 32
+IMAGE_SIZE = (224, 224)
+
+'''
+This benchmark compares the input throughput of one training epoch: reading the images from the class folders (open,
+decode and resize every file) and gathering the shuffled batches from the packed, memory mapped shards.
+@author: Bastian Pechler
+'''
+
+
+'''
+This function creates class folders with JPEG images like the ones of the image ingest (256 pixels short side)
+@author: Bastian Pechler
+'''
+def make_class_folders(images_folder):
+    rng = np.random.default_rng(0)
+    for class_index in range(AMOUNT_CLASSES):
+        class_folder = os.path.join(images_folder, 'n%08d' % class_index)
+        os.makedirs(class_folder)
+        for i in range(IMAGES_PER_CLASS):
+            img = cv2.resize(rng.integers(0, 255, (8, 10, 3), dtype=np.uint8), (320, 256),
+                             interpolation=cv2.INTER_CUBIC)
+            cv2.imwrite(os.path.join(class_folder, '%05d.jpg' % i), img)
+
+
+'''
+This function reads one epoch from the class folders in batches
+@author: Bastian Pechler
+'''
+def epoch_from_folders(images_folder):
+    file_paths = [os.path.join(root, file_name) for root, _, file_names in os.walk(images_folder)
+                  for file_name in file_names]
+    amount_images = 0
+    for i in range(0, len(file_paths), BATCH_SIZE):
+        batch = np.stack([cv2.cvtColor(cv2.resize(cv2.imread(file_path), IMAGE_SIZE, interpolation=cv2.INTER_AREA),
+                                       cv2.COLOR_BGR2RGB) for file_path in file_paths[i:i + BATCH_SIZE]])
+        amount_images += len(batch)
+    return amount_images
+
+
+'''
+This function reads one epoch from the shards in batches, touching every image like the training does
+@author: Bastian Pechler
+'''
+def epoch_from_shards(dataset, rng):
+    amount_images = 0
+    for indices in dataset.get_batch_indices(BATCH_SIZE, shuffle=True, rng=rng):
+        images, labels = dataset.get_batch(indices)
+        images.sum(dtype=np.uint64)
+        amount_images += len(images)
+    return amount_images
+
+
+def main():
+    folder = tempfile.mkdtemp()
+    try:
+        images_folder = os.path.join(folder, 'images')
+        make_class_folders(images_folder)
+        shard_packer = ShardPacker(images_folder, os.path.join(folder, 'shards'), image_size=IMAGE_SIZE)
+        start_time = time.perf_counter()
+        shard_packer.pack()
+        print(f'packing once: {time.perf_counter() - start_time:6.2f} s')
+        dataset = ShardDataset(shard_packer.shard_folder)
+        rng = np.random.default_rng(0)
+
+        for name, read_epoch in [('class folders', lambda: epoch_from_folders(images_folder)),
+                                 ('memmap shards', lambda: epoch_from_shards(dataset, rng))]:
+            read_epoch()
+            start_time = time.perf_counter()
+            amount_images = read_epoch()
+            elapsed = time.perf_counter() - start_time
+            print(f'{name:14s} {amount_images} images in {elapsed:6.2f} s ({amount_images / elapsed:8.0f} images/s)')
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
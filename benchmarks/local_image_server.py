@@ -0,0 +1,110 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+'''
+This module provides a local stand-in for the image hosts of the ImageNet url lists. The server listens on all
+loopback addresses, so 127.0.0.1, 127.0.0.2, ... can be used as different host names.
+@author: Bastian Pechler
+'''
+
+
+class ImageRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    image_bytes = np.random.default_rng(0).integers(0, 255, 20000, dtype=np.uint8).tobytes()
+
+    def do_GET(self):
+        if self.path.endswith('.txt'):
+            self.send_body(b'<html>not an image</html>', 'text/html')
+        elif 'tiny' in self.path:
+            self.send_body(self.image_bytes[:200], 'image/jpeg')
+        else:
+            self.send_body(self.image_bytes, 'image/jpeg')
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # the client stopped waiting, e.g. after a timeout
+            pass
+
+    def log_message(self, format, *args):
+        return
+
+
+class FaultInjectingRequestHandler(ImageRequestHandler):
+
+    '''
+    This handler behaves like the bad hosts of the ImageNet url lists: the host 127.0.0.3 allows only
+    throttled_requests_per_second requests per second and answers all others with 429 and Retry-After, the host
+    127.0.0.4 answers after slow_delay seconds, so the downloads time out. All other hosts answer normally.
+    @author: Bastian Pechler
+    '''
+    throttled_host = '127.0.0.3'
+    throttled_requests_per_second = 50
+    slow_host = '127.0.0.4'
+    slow_delay = 1.5
+    request_times = []
+    request_times_lock = threading.Lock()
+
+    def do_GET(self):
+        host = self.headers.get('Host', '').split(':')[0]
+        if host == self.slow_host:
+            time.sleep(self.slow_delay)
+        elif host == self.throttled_host and not self.allow_request():
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        super().do_GET()
+
+    def allow_request(self):
+        with self.request_times_lock:
+            now = time.monotonic()
+            self.request_times[:] = [t for t in self.request_times if now - t < 1]
+            if len(self.request_times) >= self.throttled_requests_per_second:
+                return False
+            self.request_times.append(now)
+            return True
+
+
+'''
+This function starts the server in a background thread and returns it with its port
+@author: Bastian Pechler
+'''
+def start_server(handler=ImageRequestHandler):
+    server = ThreadingHTTPServer(('', 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, server.server_address[1]
+
+
+'''
+This function creates a url list with the given amount of images spread over several host names. Every tenth url
+is a html page and every twentieth url a too small image, like dead links in the ImageNet lists.
+@author: Bastian Pechler
+'''
+def make_urls(port, amount_images, amount_hosts=4):
+    urls = []
+    for i in range(amount_images):
+        host = f'127.0.0.{i % amount_hosts + 1}'
+        if i % 10 == 9:
+            name = f'page_{i}.txt'
+        elif i % 20 == 4:
+            name = f'tiny_{i}.jpg'
+        else:
+            name = f'image_{i}.jpg'
+        urls.append(f'http://{host}:{port}/{name}')
+    return urls
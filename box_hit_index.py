@@ -0,0 +1,93 @@
+import time
+
+import numpy as np
+
+
+class BoxHitIndex:
+
+    '''
+    This class is a uniform grid over the bounding boxes (x1, y1, x2, y2) of one detection result. Every cell knows
+    the boxes overlapping it, so the box under the finger tip is found by looking at one cell instead of all boxes.
+    If several boxes contain the point, the smallest box (the innermost object) or the box with the highest
+    detection score is returned.
+    @author: Marcel Achner
+    '''
+    def __init__(self, detections, cell_size=64, prefer='smallest'):
+        self.boxes = np.asarray(detections.boxes, dtype=np.float64).reshape(-1, 4)
+        self.scores = detections.scores
+        self.box_ids = detections.track_ids if detections.track_ids is not None else np.arange(len(self.boxes))
+        self.cell_size = cell_size
+        self.prefer = prefer
+        self.areas = (self.boxes[:, 2] - self.boxes[:, 0]) * (self.boxes[:, 3] - self.boxes[:, 1])
+
+        cells = {}
+        cell_ranges = np.floor_divide(self.boxes, cell_size).astype(int)
+        for index, (cell_x1, cell_y1, cell_x2, cell_y2) in enumerate(cell_ranges):
+            for cell_x in range(cell_x1, cell_x2 + 1):
+                for cell_y in range(cell_y1, cell_y2 + 1):
+                    cells.setdefault((cell_x, cell_y), []).append(index)
+        self.cells = {cell: np.array(indices) for cell, indices in cells.items()}
+
+    def __len__(self):
+        return len(self.boxes)
+
+    '''
+    This function returns the index of the box containing the point (x, y) or None if no box contains it
+    @author: Marcel Achner
+    '''
+    def query(self, x, y):
+        candidates = self.cells.get((int(x // self.cell_size), int(y // self.cell_size)))
+        if candidates is None:
+            return None
+
+        boxes = self.boxes[candidates]
+        inside = (boxes[:, 0] <= x) & (x <= boxes[:, 2]) & (boxes[:, 1] <= y) & (y <= boxes[:, 3])
+        candidates = candidates[inside]
+        if len(candidates) == 0:
+            return None
+        if self.prefer == 'score':
+            return candidates[np.argmax(self.scores[candidates])]
+        return candidates[np.argmin(self.areas[candidates])]
+
+
+class DwellSelector:
+
+    '''
+    This class only selects a box if the finger tip stays on the same box (same track id) for dwell_time seconds,
+    so a single noisy hand landmark does not trigger a screenshot. Frames without a hit are tolerated up to
+    max_gap_frames.
+    @author: Marcel Achner
+    '''
+    def __init__(self, dwell_time=0.3, max_gap_frames=2):
+        self.dwell_time = dwell_time
+        self.max_gap_frames = max_gap_frames
+        self.candidate_id = None
+        self.candidate_since = None
+        self.gap_frames = 0
+
+    '''
+    This function takes the id of the box under the finger tip in the current frame (or None) and returns the id
+    once the dwell time is reached, otherwise None
+    @author: Marcel Achner
+    '''
+    def update(self, box_id, now=None):
+        now = time.perf_counter() if now is None else now
+        if box_id is None:
+            self.gap_frames += 1
+            if self.gap_frames > self.max_gap_frames:
+                self.reset()
+            return None
+
+        self.gap_frames = 0
+        if box_id != self.candidate_id:
+            self.candidate_id = box_id
+            self.candidate_since = now
+        if now - self.candidate_since >= self.dwell_time:
+            self.reset()
+            return box_id
+        return None
+
+    def reset(self):
+        self.candidate_id = None
+        self.candidate_since = None
+        self.gap_frames = 0
@@ -0,0 +1,230 @@
+import cv2
+import numpy as np
+
+from model.boxTrackingImagenet.detector1K.detections import Detections
+
+
+class DetectionScheduler:
+
+    '''
+    This class decides for every webcam frame if the object detector has to run. It runs every detection_interval
+    frames or earlier if the scene changed, measured as mean absolute difference of a small grayscale thumbnail to
+    the thumbnail of the last detected frame.
+    @author: Marcel Achner
+    '''
+    def __init__(self, detection_interval=1, scene_change_threshold=12.0, thumbnail_size=(64, 48)):
+        self.detection_interval = max(1, int(detection_interval))
+        self.scene_change_threshold = scene_change_threshold
+        self.thumbnail_size = thumbnail_size
+        self.frames_since_detection = None
+        self.last_thumbnail = None
+        self.scene_changes = 0
+
+    '''
+    This function returns True if the detector should run on the given frame
+    @author: Marcel Achner
+    '''
+    def should_detect(self, img):
+        if self.detection_interval == 1 or self.frames_since_detection is None:
+            return self.mark_detection(img)
+        if self.frames_since_detection + 1 >= self.detection_interval:
+            return self.mark_detection(img)
+
+        thumbnail = self.make_thumbnail(img)
+        if self.scene_change_threshold is not None and \
+                cv2.absdiff(thumbnail, self.last_thumbnail).mean() > self.scene_change_threshold:
+            self.scene_changes += 1
+            return self.mark_detection(img, thumbnail)
+
+        self.frames_since_detection += 1
+        return False
+
+    '''
+    This function remembers the frame the detector runs on
+    @author: Marcel Achner
+    '''
+    def mark_detection(self, img, thumbnail=None):
+        self.frames_since_detection = 0
+        if self.detection_interval > 1:
+            self.last_thumbnail = thumbnail if thumbnail is not None else self.make_thumbnail(img)
+        return True
+
+    def make_thumbnail(self, img):
+        return cv2.cvtColor(cv2.resize(img, self.thumbnail_size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+    '''
+    This function forgets the last detected frame, e.g. when a new webcam session starts
+    @author: Marcel Achner
+    '''
+    def reset(self):
+        self.frames_since_detection = None
+        self.last_thumbnail = None
+
+
+class BoxTracker:
+
+    '''
+    This class carries bounding boxes forward between two detections with a constant velocity model. New detections
+    are associated to the existing tracks by their intersection over union, so every object keeps the same track id
+    as long as it is visible. Tracks that are not detected anymore are kept for max_missed detections, so a box does
+    not flicker if the detector misses it once. With show_missed=False these tracks are only kept for the association
+    and not returned.
+    @author: Marcel Achner
+    '''
+    def __init__(self, iou_threshold=0.3, max_missed=2, velocity_smoothing=0.5, show_missed=True):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.velocity_smoothing = velocity_smoothing
+        self.show_missed = show_missed
+        self.next_track_id = 0
+        self.frame_index = 0
+        self.reset()
+
+    '''
+    This function creates the tracker for the given detection interval. If the detector runs on every frame, the
+    tracker only gives the boxes their ids: the detected boxes are returned as they are (no motion model) and boxes
+    missed by the detector are not shown, like without tracker.
+    @author: Marcel Achner
+    '''
+    @classmethod
+    def for_detection_interval(cls, detection_interval):
+        if detection_interval <= 1:
+            return cls(velocity_smoothing=0.0, show_missed=False)
+        return cls()
+
+    '''
+    This function removes all tracks
+    @author: Marcel Achner
+    '''
+    def reset(self):
+        self.track_ids = np.zeros(0, dtype=int)
+        self.boxes = np.zeros((0, 4), dtype=np.float64)
+        self.velocities = np.zeros((0, 4), dtype=np.float64)
+        self.detected_boxes = np.zeros((0, 4), dtype=np.float64)
+        self.detected_frames = np.zeros(0, dtype=int)
+        self.missed = np.zeros(0, dtype=int)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.class_ids = np.zeros(0, dtype=int)
+
+    '''
+    This function moves all tracks one frame forward without a detection and returns them
+    @author: Marcel Achner
+    '''
+    def predict(self):
+        self.frame_index += 1
+        self.boxes = self.boxes + self.velocities
+        return self.get_detections()
+
+    '''
+    This function associates the detections of the current frame to the tracks and returns the updated tracks
+    @author: Marcel Achner
+    '''
+    def update(self, detections):
+        self.frame_index += 1
+        predicted_boxes = self.boxes + self.velocities
+        new_boxes = np.asarray(detections.boxes, dtype=np.float64).reshape(-1, 4)
+
+        track_matches, detection_matches = self.associate(predicted_boxes, new_boxes)
+
+        # matched tracks: the velocity is the movement per frame since the last detection of this track
+        elapsed_frames = self.frame_index - self.detected_frames[track_matches]
+        measured_velocities = (new_boxes[detection_matches] - self.detected_boxes[track_matches]) / \
+            elapsed_frames[:, np.newaxis]
+        self.velocities[track_matches] = self.velocity_smoothing * measured_velocities + \
+            (1 - self.velocity_smoothing) * self.velocities[track_matches]
+        predicted_boxes[track_matches] = new_boxes[detection_matches]
+        self.boxes = predicted_boxes
+        self.detected_boxes[track_matches] = new_boxes[detection_matches]
+        self.detected_frames[track_matches] = self.frame_index
+        self.scores[track_matches] = detections.scores[detection_matches]
+        self.class_ids[track_matches] = detections.class_ids[detection_matches]
+
+        # tracks without detection are kept for some detections to avoid flickering
+        unmatched_tracks = np.ones(len(self.track_ids), dtype=bool)
+        unmatched_tracks[track_matches] = False
+        self.missed[unmatched_tracks] += 1
+        self.missed[track_matches] = 0
+        self.keep_tracks(self.missed <= self.max_missed)
+
+        # detections without track start a new track
+        unmatched_detections = np.ones(len(new_boxes), dtype=bool)
+        unmatched_detections[detection_matches] = False
+        self.add_tracks(new_boxes[unmatched_detections], detections.scores[unmatched_detections],
+                        detections.class_ids[unmatched_detections])
+
+        return self.get_detections()
+
+    '''
+    This function greedily assigns every detection to the track with the highest intersection over union above the
+    threshold and returns the indices of the matched tracks and detections
+    @author: Marcel Achner
+    '''
+    def associate(self, track_boxes, detection_boxes):
+        if len(track_boxes) == 0 or len(detection_boxes) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+        iou = self.iou_matrix(track_boxes, detection_boxes)
+        candidates = np.argwhere(iou >= self.iou_threshold)
+        candidates = candidates[np.argsort(-iou[candidates[:, 0], candidates[:, 1]], kind='stable')]
+
+        track_matches = []
+        detection_matches = []
+        used_tracks = set()
+        used_detections = set()
+        for track_index, detection_index in candidates:
+            if track_index in used_tracks or detection_index in used_detections:
+                continue
+            used_tracks.add(track_index)
+            used_detections.add(detection_index)
+            track_matches.append(track_index)
+            detection_matches.append(detection_index)
+        return np.array(track_matches, dtype=int), np.array(detection_matches, dtype=int)
+
+    '''
+    This function calculates the intersection over union of all pairs of boxes (x1, y1, x2, y2)
+    @author: Marcel Achner
+    '''
+    @staticmethod
+    def iou_matrix(boxes_a, boxes_b):
+        x1 = np.maximum(boxes_a[:, np.newaxis, 0], boxes_b[np.newaxis, :, 0])
+        y1 = np.maximum(boxes_a[:, np.newaxis, 1], boxes_b[np.newaxis, :, 1])
+        x2 = np.minimum(boxes_a[:, np.newaxis, 2], boxes_b[np.newaxis, :, 2])
+        y2 = np.minimum(boxes_a[:, np.newaxis, 3], boxes_b[np.newaxis, :, 3])
+        intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+        area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+        union = area_a[:, np.newaxis] + area_b[np.newaxis, :] - intersection
+        return intersection / np.maximum(union, 1e-9)
+
+    def keep_tracks(self, mask):
+        self.track_ids = self.track_ids[mask]
+        self.boxes = self.boxes[mask]
+        self.velocities = self.velocities[mask]
+        self.detected_boxes = self.detected_boxes[mask]
+        self.detected_frames = self.detected_frames[mask]
+        self.missed = self.missed[mask]
+        self.scores = self.scores[mask]
+        self.class_ids = self.class_ids[mask]
+
+    def add_tracks(self, boxes, scores, class_ids):
+        amount = len(boxes)
+        self.track_ids = np.concatenate([self.track_ids, np.arange(self.next_track_id, self.next_track_id + amount)])
+        self.next_track_id += amount
+        self.boxes = np.concatenate([self.boxes, boxes])
+        self.velocities = np.concatenate([self.velocities, np.zeros((amount, 4))])
+        self.detected_boxes = np.concatenate([self.detected_boxes, boxes])
+        self.detected_frames = np.concatenate([self.detected_frames, np.full(amount, self.frame_index)])
+        self.missed = np.concatenate([self.missed, np.zeros(amount, dtype=int)])
+        self.scores = np.concatenate([self.scores, np.asarray(scores, dtype=np.float32)])
+        self.class_ids = np.concatenate([self.class_ids, np.asarray(class_ids, dtype=int)])
+
+    '''
+    This function returns the current tracks as Detections with their track ids
+    @author: Marcel Achner
+    '''
+    def get_detections(self):
+        if not self.show_missed:
+            detected = self.missed == 0
+            return Detections(self.boxes[detected], self.scores[detected], self.class_ids[detected],
+                              self.track_ids[detected])
+        return Detections(self.boxes.copy(), self.scores.copy(), self.class_ids.copy(), self.track_ids.copy())
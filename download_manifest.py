@@ -0,0 +1,151 @@
+import hashlib
+import os
+import sqlite3
+
+from image_fetcher import IMAGE_OK
+
+IMAGE_DUPLICATE = 'duplicate'
+
+
+class DownloadManifest:
+
+    '''
+    This class is the manifest of the downloaded images of one class, stored in a SQLite database. It records the url,
+    content hash (sha256), size and status (ok or duplicate) of every downloaded image. Images are stored under their
+    content hash, so an image found under different urls is stored only once, and the amount of images of the class
+    is kept in a counter, so it can be read without listing the class folder. Files of downloads without manifest
+    are imported once. Several download processes can use the manifest of the same class.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, manifest_path, class_folder):
+        self.class_folder = class_folder
+        os.makedirs(self.class_folder, exist_ok=True)
+        # autocommit, transactions are started explicitly
+        self.connection = sqlite3.connect(manifest_path, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS files '
+                                    '(sha256 TEXT PRIMARY KEY, file_name TEXT, size INTEGER)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS urls '
+                                    '(url TEXT PRIMARY KEY, sha256 TEXT, size INTEGER, status TEXT)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS summary '
+                                    '(id INTEGER PRIMARY KEY CHECK (id = 0), ok_count INTEGER)')
+            if self.connection.execute('SELECT ok_count FROM summary').fetchone() is None:
+                self.connection.execute('INSERT INTO summary VALUES (0, 0)')
+                self.import_existing_files()
+            self.connection.execute('COMMIT')
+        except:
+            self.connection.execute('ROLLBACK')
+            raise
+
+    '''
+    This function adds the images which are already in the class folder, e.g. downloaded before the manifest existed.
+    Files already in the manifest are skipped. With an image ingest the files are replaced by their training copy (see
+    ingest_file). Returns the amount of added images.
+    @author: Bastian Pechler
+    '''
+    def import_existing_files(self, image_ingest=None):
+        known_files = {row[0] for row in self.connection.execute('SELECT file_name FROM files')}
+        amount_added = 0
+        for file_name in sorted(os.listdir(self.class_folder)):
+            file_path = os.path.join(self.class_folder, file_name)
+            if file_name in known_files or not os.path.isfile(file_path) or file_name.endswith('.tmp'):
+                continue
+            with open(file_path, 'rb') as img_f:
+                content = img_f.read()
+            if image_ingest is None:
+                amount_added += self.insert_file(hashlib.sha256(content).hexdigest(), file_name, len(content))
+            else:
+                amount_added += self.ingest_file(file_path, content, image_ingest)
+        return amount_added
+
+    '''
+    This function adds the images written into the class folder by another downloader (e.g. Bing), which does not use
+    the manifest, so the amount of images of the class stays correct. Returns the amount of added images.
+    @author: Bastian Pechler
+    '''
+    def import_new_files(self, image_ingest=None):
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            amount_added = self.import_existing_files(image_ingest)
+            self.connection.execute('COMMIT')
+        except:
+            self.connection.execute('ROLLBACK')
+            raise
+        return amount_added
+
+    '''
+    This function replaces a file by the training copy of the image ingest, stored under its content hash like the
+    downloaded images. Undecodable files and images which are already stored are removed. Returns True if the image
+    was added.
+    @author: Bastian Pechler
+    '''
+    def ingest_file(self, file_path, content, image_ingest):
+        content = image_ingest.ingest(content)
+        stored_path = None
+        if content is not None:
+            sha256 = hashlib.sha256(content).hexdigest()
+            file_name = sha256 + '.' + image_ingest.extension
+            if self.insert_file(sha256, file_name, len(content)):
+                stored_path = os.path.join(self.class_folder, file_name)
+                with open(stored_path + '.tmp', 'wb') as img_f:
+                    img_f.write(content)
+                os.replace(stored_path + '.tmp', stored_path)
+        if stored_path != file_path:
+            os.remove(file_path)
+        return stored_path is not None
+
+    def insert_file(self, sha256, file_name, size):
+        inserted = self.connection.execute('INSERT OR IGNORE INTO files VALUES (?, ?, ?)',
+                                           (sha256, file_name, size)).rowcount
+        if inserted:
+            self.connection.execute('UPDATE summary SET ok_count = ok_count + 1')
+        return inserted == 1
+
+    '''
+    This function returns the amount of different images of the class
+    @author: Bastian Pechler
+    '''
+    def get_ok_count(self):
+        return self.connection.execute('SELECT ok_count FROM summary').fetchone()[0]
+
+    '''
+    This function returns all urls which have been downloaded before
+    @author: Bastian Pechler
+    '''
+    def get_known_urls(self):
+        return {row[0] for row in self.connection.execute('SELECT url FROM urls')}
+
+    '''
+    This function stores the downloaded content of an url under its content hash and records it. It returns the status
+    (IMAGE_OK or IMAGE_DUPLICATE if the same image is already stored) and the file path.
+    @author: Bastian Pechler
+    '''
+    def add_image(self, img_url, content, extension):
+        sha256 = hashlib.sha256(content).hexdigest()
+        file_name = sha256 + '.' + extension
+        file_path = os.path.join(self.class_folder, file_name)
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            if self.insert_file(sha256, file_name, len(content)):
+                status = IMAGE_OK
+                # written to a temporary file first, so there is no half written image if the download is stopped
+                tmp_path = file_path + '.tmp'
+                with open(tmp_path, 'wb') as img_f:
+                    img_f.write(content)
+                os.replace(tmp_path, file_path)
+            else:
+                status = IMAGE_DUPLICATE
+                file_path = os.path.join(self.class_folder, self.connection.execute(
+                    'SELECT file_name FROM files WHERE sha256 = ?', (sha256,)).fetchone()[0])
+            self.connection.execute('INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?)',
+                                    (img_url, sha256, len(content), status))
+            self.connection.execute('COMMIT')
+        except:
+            self.connection.execute('ROLLBACK')
+            raise
+        return status, file_path
+
+    def close(self):
+        self.connection.close()
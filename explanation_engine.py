@@ -0,0 +1,184 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import sklearn.metrics
+from lime.lime_base import LimeBase
+from lime.lime_image import ImageExplanation
+from lime.wrappers.scikit_image import SegmentationAlgorithm
+from skimage.segmentation import mark_boundaries
+
+
+class ExplanationEngine:
+
+    '''
+    This class explains the predictions of the companion model with LIME and returns two overlays as PNG bytes:
+    the superpixels speaking for the predicted class and the superpixels speaking for (green) and against (red) it.
+    The segmentation of every image and the perturbation samples with their predictions are cached by the hash of
+    the image bytes. The samples belong to the model version of the prediction cache, so they are dropped after a
+    retrain, the segmentation is kept. The samples are predicted in batches of batch_size. An explanation can be
+    refined: asking for more samples only predicts the missing samples and fits the explanation again.
+    predict_batch_function gets the samples as uint8 RGB images and returns one row of class scores per sample (e.g.
+    the probabilities or a one hot row of the predicted class), it has to do the preprocessing of the model itself.
+    @author: Marcel Achner
+    '''
+    def __init__(self, predict_batch_function, prediction_cache, preview_samples=150, full_samples=1000,
+                 batch_size=100, num_features=5, kernel_width=0.25, max_entries=8, random_seed=0):
+        self.predict_batch_function = predict_batch_function
+        self.prediction_cache = prediction_cache
+        self.preview_samples = preview_samples
+        self.full_samples = full_samples
+        self.batch_size = batch_size
+        self.num_features = num_features
+        self.random_seed = random_seed
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # the same kernel as LimeImageExplainer
+        self.lime_base = LimeBase(lambda distances: np.sqrt(np.exp(-(distances ** 2) / kernel_width ** 2)))
+        self.segmentation_fn = SegmentationAlgorithm('quickshift', kernel_size=4, max_dist=200, ratio=0.2,
+                                                     random_seed=random_seed)
+
+    '''
+    This function returns the key of the image bytes in the cache
+    @author: Marcel Achner
+    '''
+    @staticmethod
+    def make_key(image_bytes):
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    '''
+    This function explains the prediction of the image (RGB, the input size of the companion model) with at least
+    num_samples perturbation samples and returns the two overlays as PNG bytes. The image_bytes are only used for the
+    cache. The progress of the samples is passed to progress_callback(done, total) if one is given. If
+    stop_requested() returns True, the sampling stops after the current batch, the samples so far are kept for the
+    next call and None is returned. The lock is only held while the cache entry is read or updated, the segmentation,
+    the predictions and the fitting run without it.
+    @author: Marcel Achner
+    '''
+    def explain(self, image_bytes, image, num_samples=None, progress_callback=None, stop_requested=None):
+        num_samples = self.full_samples if num_samples is None else num_samples
+        entry = self.get_entry(self.make_key(image_bytes), image)
+        if not self.add_samples(entry, num_samples, progress_callback, stop_requested):
+            return None
+
+        with self.lock:
+            data, labels = entry['data'], entry['labels']
+            if entry['overlays_samples'] == len(data):
+                return entry['overlays']
+        overlays = self.make_overlays(entry['image'], entry['segments'], data, labels)
+        with self.lock:
+            if entry['data'] is data:
+                entry['overlays'] = overlays
+                entry['overlays_samples'] = len(data)
+        return overlays
+
+    '''
+    This function returns the cache entry of the image, the image is segmented if it is not cached. The samples of an
+    entry are reset if they were predicted by another model version.
+    @author: Marcel Achner
+    '''
+    def get_entry(self, key, image):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            segments = self.segmentation_fn(image)
+            new_entry = {'image': image, 'segments': segments, 'fudged_image': self.make_fudged_image(image, segments),
+                         'model_version': None}
+            with self.lock:
+                # another thread may have segmented the same image meanwhile
+                entry = self.entries.setdefault(key, new_entry)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            model_version = self.prediction_cache.model_version
+            if entry['model_version'] != model_version:
+                # the predictions of the samples belong to the old weights
+                n_features = int(entry['segments'].max()) + 1
+                entry.update({'model_version': model_version, 'data': np.zeros((0, n_features), dtype=int),
+                              'labels': None, 'overlays': None, 'overlays_samples': None,
+                              'random_state': np.random.RandomState(self.random_seed)})
+        return entry
+
+    '''
+    This function replaces every superpixel of the image by its mean color, the switched off superpixels of the
+    samples are taken from this image
+    @author: Marcel Achner
+    '''
+    @staticmethod
+    def make_fudged_image(image, segments):
+        n_features = int(segments.max()) + 1
+        flat_segments = segments.ravel()
+        pixel_counts = np.maximum(np.bincount(flat_segments, minlength=n_features), 1)
+        channels = image.reshape(-1, image.shape[-1]).astype(np.float64)
+        mean_colors = np.stack([np.bincount(flat_segments, weights=channels[:, channel], minlength=n_features)
+                                for channel in range(channels.shape[1])], axis=1) / pixel_counts[:, np.newaxis]
+        return mean_colors[segments].astype(image.dtype)
+
+    '''
+    This function predicts samples until the entry has num_samples samples. The first sample is the image itself.
+    Every predicted batch is added to the entry right away, unless the model changed meanwhile. Returns False if the
+    sampling was stopped or the model changed.
+    @author: Marcel Achner
+    '''
+    def add_samples(self, entry, num_samples, progress_callback, stop_requested):
+        with self.lock:
+            model_version = entry['model_version']
+            done = len(entry['data'])
+            missing = num_samples - done
+            if missing <= 0:
+                return True
+            new_data = entry['random_state'].randint(0, 2, (missing, entry['data'].shape[1]))
+        if done == 0:
+            new_data[0, :] = 1
+
+        if progress_callback is not None:
+            progress_callback(0, missing)
+        for start in range(0, missing, self.batch_size):
+            if stop_requested is not None and stop_requested():
+                return False
+            rows = new_data[start:start + self.batch_size]
+            # a switched off superpixel shows the fudged image
+            masks = rows.astype(bool)[:, entry['segments']]
+            samples = np.repeat(entry['fudged_image'][np.newaxis], len(rows), axis=0)
+            np.copyto(samples, entry['image'], where=masks[..., np.newaxis])
+            predictions = np.asarray(self.predict_batch_function(samples))
+            with self.lock:
+                if entry['model_version'] != model_version:
+                    return False
+                entry['data'] = np.concatenate([entry['data'], rows])
+                entry['labels'] = predictions if entry['labels'] is None else \
+                    np.concatenate([entry['labels'], predictions])
+            if progress_callback is not None:
+                progress_callback(start + len(rows), missing)
+        return True
+
+    '''
+    This function fits the explanation of the predicted class to the samples and draws the two overlays
+    @author: Marcel Achner
+    '''
+    def make_overlays(self, image, segments, data, labels):
+        distances = sklearn.metrics.pairwise_distances(data, data[0].reshape(1, -1), metric='cosine').ravel()
+        label = int(np.argmax(labels[0]))
+        explanation = ImageExplanation(image, segments)
+        explanation.intercept[label], explanation.local_exp[label], explanation.score, explanation.local_pred = \
+            self.lime_base.explain_instance_with_data(data, labels, distances, label, data.shape[1])
+
+        image, mask = explanation.get_image_and_mask(label, positive_only=True, num_features=self.num_features,
+                                                     hide_rest=False)
+        positive_overlay = mark_boundaries(image / 255.0, mask)
+        image, mask = explanation.get_image_and_mask(label, positive_only=False, num_features=self.num_features,
+                                                     hide_rest=False)
+        pros_and_cons_overlay = mark_boundaries(image / 255.0, mask)
+        return self.encode_png(positive_overlay), self.encode_png(pros_and_cons_overlay)
+
+    @staticmethod
+    def encode_png(overlay):
+        overlay = cv2.cvtColor(np.clip(overlay * 255, 0, 255).astype(np.uint8), cv2.COLOR_RGB2BGR)
+        success, encoded_image = cv2.imencode('.png', overlay)
+        return encoded_image.tobytes() if success else None
@@ -0,0 +1,113 @@
+import time
+
+
+class HandTracker:
+
+    '''
+    This method initialises the hand tracker. The MediaPipe Hands graph is created once per webcam session (and not
+    once per frame), so the landmarks of the previous frame can be used for tracking instead of running the palm
+    detection again on every frame. MediaPipe is only imported when the tracker is opened the first time, so creating
+    the tracker does not slow down the start of the application.
+    @author: Marcel Achner
+    '''
+    def __init__(self, max_num_hands=1, min_detection_confidence=0.6, min_tracking_confidence=0.6):
+        self.mp_hands = None
+        self.mp_drawing = None
+        self.max_num_hands = max_num_hands
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.hands = None
+        self.hand_visible = False
+
+        # latency statistics, frames with a hand in the previous frame use the tracking fast path of MediaPipe
+        self.last_latency = None
+        self.frame_count = 0
+        self.tracked_frames = 0
+        self.tracking_latency = 0.0
+        self.detection_latency = 0.0
+        return
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    '''
+    This function creates the MediaPipe Hands graph if it is not open yet. It can be called again after close to
+    reuse the tracker for the next webcam session.
+    @author: Marcel Achner
+    '''
+    def open(self):
+        if self.mp_hands is None:
+            import mediapipe as mp
+            self.mp_hands = mp.solutions.hands
+            self.mp_drawing = mp.solutions.drawing_utils
+        if self.hands is None:
+            self.hands = self.mp_hands.Hands(static_image_mode=False,
+                                             min_detection_confidence=self.min_detection_confidence,
+                                             min_tracking_confidence=self.min_tracking_confidence,
+                                             max_num_hands=self.max_num_hands)
+        self.hand_visible = False
+        return self
+
+    '''
+    This function closes the MediaPipe Hands graph and frees its resources
+    @author: Marcel Achner
+    '''
+    def close(self):
+        if self.hands is not None:
+            self.hands.close()
+            self.hands = None
+        self.hand_visible = False
+
+    '''
+    This function detects the hand landmarks in the given RGB frame and measures the time needed for it
+    @author: Marcel Achner
+    '''
+    def process(self, rgb_frame):
+        if self.hands is None:
+            self.open()
+
+        start_time = time.perf_counter()
+        results = self.hands.process(rgb_frame)
+        self.last_latency = time.perf_counter() - start_time
+
+        # MediaPipe only runs the palm detection if no hand was found in the previous frame
+        self.frame_count += 1
+        if self.hand_visible:
+            self.tracked_frames += 1
+            self.tracking_latency += self.last_latency
+        else:
+            self.detection_latency += self.last_latency
+        self.hand_visible = results.multi_hand_landmarks is not None
+
+        return results
+
+    '''
+    This function returns the landmark latency statistics in milliseconds, split into tracked frames and frames
+    that needed a new palm detection
+    @author: Marcel Achner
+    '''
+    def get_stats(self):
+        detected_frames = self.frame_count - self.tracked_frames
+        return {
+            'frames': self.frame_count,
+            'tracked_frames': self.tracked_frames,
+            'last_latency_ms': None if self.last_latency is None else self.last_latency * 1000,
+            'mean_tracking_latency_ms': self.tracking_latency / self.tracked_frames * 1000
+            if self.tracked_frames > 0 else None,
+            'mean_detection_latency_ms': self.detection_latency / detected_frames * 1000
+            if detected_frames > 0 else None,
+        }
+
+    '''
+    This function resets the latency statistics
+    @author: Marcel Achner
+    '''
+    def reset_stats(self):
+        self.last_latency = None
+        self.frame_count = 0
+        self.tracked_frames = 0
+        self.tracking_latency = 0.0
+        self.detection_latency = 0.0
@@ -0,0 +1,130 @@
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout, TooManyRedirects, MissingSchema, InvalidURL, \
+    InvalidSchema, ChunkedEncodingError, ContentDecodingError
+
+IMAGE_OK = 'ok'
+IMAGE_DEAD = 'dead'
+IMAGE_WRONG_TYPE = 'wrong_type'
+IMAGE_TOO_SMALL = 'too_small'
+IMAGE_UNDECODABLE = 'undecodable'
+# outcomes which say nothing about the url itself, it can be tried again later
+IMAGE_THROTTLED = 'throttled'
+IMAGE_SKIPPED = 'skipped'
+
+
+class ImageFetcher:
+
+    '''
+    This class downloads images with one HTTP session per download process. The session keeps the connections to
+    every host alive (connection pool per host), so not every image needs a new TCP connection and TLS handshake.
+    Responses are streamed: wrong content types and too small images are rejected from the headers before the body
+    is downloaded. With a rate limiter, the requests are paced per host and throttled requests are retried up to
+    max_retries times after the backoff of the host. With an image ingest, every image is decoded and converted to
+    its training copy right after the download, still in the thread of the request.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, timeout=1, min_image_size=1000, pool_connections=32, pool_maxsize=4, chunk_size=16384,
+                 rate_limiter=None, max_retries=2, image_ingest=None):
+        self.timeout = timeout
+        self.min_image_size = min_image_size
+        self.chunk_size = chunk_size
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.image_ingest = image_ingest
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    '''
+    This function downloads one image and returns the outcome (IMAGE_OK, IMAGE_DEAD, IMAGE_WRONG_TYPE,
+    IMAGE_TOO_SMALL, IMAGE_UNDECODABLE, IMAGE_THROTTLED or IMAGE_SKIPPED if the host is skipped by the rate limiter)
+    and the content, which is only set if the image is ok
+    @author: Bastian Pechler
+    '''
+    def fetch(self, img_url):
+        if self.rate_limiter is None:
+            return self.fetch_once(img_url)[:2]
+
+        host = urlsplit(img_url).hostname
+        for attempt in range(self.max_retries + 1):
+            if not self.rate_limiter.acquire(host):
+                return IMAGE_SKIPPED, None
+            outcome, content, timed_out, retry_after = self.fetch_once(img_url)
+            self.rate_limiter.report(host, outcome == IMAGE_THROTTLED, timed_out, retry_after)
+            if outcome != IMAGE_THROTTLED:
+                return outcome, content
+        return IMAGE_THROTTLED, None
+
+    '''
+    This function sends one request for an image. Besides outcome and content it returns if the request timed out
+    and the Retry-After time of a throttled request.
+    @author: Bastian Pechler
+    '''
+    def fetch_once(self, img_url):
+        try:
+            with self.session.get(img_url, timeout=self.timeout, stream=True) as img_resp:
+                if img_resp.status_code == 429 or img_resp.status_code >= 500:
+                    return IMAGE_THROTTLED, None, False, self.get_retry_after(img_resp)
+                if img_resp.status_code != 200:
+                    return IMAGE_DEAD, None, False, None
+                if 'image' not in img_resp.headers.get('content-type', ''):
+                    return IMAGE_WRONG_TYPE, None, False, None
+                content_length = img_resp.headers.get('content-length', '')
+                if content_length.isdigit() and int(content_length) < self.min_image_size:
+                    return IMAGE_TOO_SMALL, None, False, None
+                content = b''.join(img_resp.iter_content(chunk_size=self.chunk_size))
+        except Timeout:
+            return IMAGE_DEAD, None, True, None
+        except (ConnectionError, TooManyRedirects, MissingSchema, InvalidURL, InvalidSchema, ChunkedEncodingError,
+                ContentDecodingError):
+            return IMAGE_DEAD, None, False, None
+
+        if len(content) < self.min_image_size:
+            return IMAGE_TOO_SMALL, None, False, None
+        if self.image_ingest is not None:
+            content = self.image_ingest.ingest(content)
+            if content is None:
+                return IMAGE_UNDECODABLE, None, False, None
+        return IMAGE_OK, content, False, None
+
+    '''
+    This function sends a request through the rate limiter (if there is one) and returns the response, e.g. for the url
+    lists of imagenet. None is returned if the host is skipped or still throttled (429 or 5xx) after the retries. The
+    timeout of the fetcher is used if no timeout is given. Only throttled responses are reported to the rate limiter,
+    so a slow response (e.g. a long url list) does not count as a failure of the host for the image downloads.
+    @author: Bastian Pechler
+    '''
+    def get(self, url, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        host = urlsplit(url).hostname
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None and not self.rate_limiter.acquire(host):
+                return None
+            resp = self.session.get(url, timeout=timeout)
+            throttled = resp.status_code == 429 or resp.status_code >= 500
+            if not throttled:
+                return resp
+            resp.close()
+            if self.rate_limiter is None:
+                # without rate limiter there is no backoff to wait for before another try
+                return None
+            self.rate_limiter.report(host, throttled=True, retry_after=self.get_retry_after(resp))
+        return None
+
+    @staticmethod
+    def get_retry_after(resp):
+        retry_after = resp.headers.get('retry-after', '')
+        if retry_after.isdigit():
+            return int(retry_after)
+        return None
+
+    '''
+    This function closes all pooled connections
+    @author: Bastian Pechler
+    '''
+    def close(self):
+        self.session.close()
@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+
+
+class ImageIngest:
+
+    '''
+    This class prepares downloaded images for training once at download time: the image is decoded (undecodable or
+    truncated files are rejected, of an animated GIF the first frame is kept), converted to three color channels
+    (grayscale, CMYK and images with alpha channel), scaled down to short_side pixels on the shorter side and stored as
+    JPEG. So training gets images of one format and size and the disk usage per class is predictable.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, short_side=256, jpeg_quality=90):
+        self.short_side = short_side
+        self.jpeg_quality = jpeg_quality
+        self.extension = 'jpg'
+
+    '''
+    This function returns the JPEG encoded training copy of the image or None if the image can not be decoded
+    @author: Bastian Pechler
+    '''
+    def ingest(self, content):
+        # IMREAD_COLOR always returns three channels and applies the EXIF orientation
+        img = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None or img.size == 0:
+            return None
+
+        height, width = img.shape[:2]
+        scale = self.short_side / min(height, width)
+        # small images are not scaled up
+        if scale < 1:
+            img = cv2.resize(img, (max(1, round(width * scale)), max(1, round(height * scale))),
+                             interpolation=cv2.INTER_AREA)
+        success, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not success:
+            return None
+        return encoded.tobytes()
@@ -1,71 +1,144 @@
-import os
-
-from image_net_downloader import ImageNetDownloader
-from bing_downloader import Bing
-
-
-class ImageLoader:
-
-    '''
-    This class coordinates the downloading process for creation of test data. In the initialization,
-    the downloading directory is created and ImageNetDownloader and BingDownloader are used
-    @author: Bastian Pechler
-    '''
-    def __init__(self, full_imagenet_list):
-        self.full_imagenet_list = full_imagenet_list
-        self.classes_contained_in_imagenet = {}
-        self.classes_to_be_downloaded_from_bing = {}
-        self.image_folder = os.path.join('data/image_net', 'imagenet_images')
-        self.image_net_downloader = ImageNetDownloader(self.classes_contained_in_imagenet, self.image_folder)
-        if not os.path.isdir(self.image_folder):
-            os.mkdir(self.image_folder)
-
-    '''
-    This function coordinates the downloading processes. The classes to be downloaded are divided in two seperate sets,
-    the ones contained in the ImageNet dataset and the ones not contained there. For the first subset, ImageNetDownloader
-    is used to load as many images as there are contained. If the amount should be too small (e.g. 200 wanted, but only 
-    100 links viable), additional downloads are done using BingDownloader. For the second subset, download is done
-    by just utilizing the bing API)
-    '''
-    def download_images(self, amount_images_per_class, classes_to_scrape, chrome_version, firefox_version,
-                        amount_already_downloaded=0):
-        # classes to be scraped are divided in two dicts
-        # first subset will be loaded from imagenet, second one will be downloaded from bing
-        for key in classes_to_scrape.keys():
-            if self.full_imagenet_list.keys().__contains__(key):
-                self.classes_contained_in_imagenet[key] = classes_to_scrape[key]
-            else:
-                self.classes_to_be_downloaded_from_bing[key] = classes_to_scrape[key]
-
-        downloaded_amount_of_images_per_class = {}
-        for key in classes_to_scrape:
-            downloaded_amount_of_images_per_class[key] = 0
-        downloaded_amount_of_images_per_class.update(self.image_net_downloader.load_from_image_net(amount_images_per_class
-                                                                                              - amount_already_downloaded))
-        for key in downloaded_amount_of_images_per_class.keys():
-            if downloaded_amount_of_images_per_class[key] < amount_images_per_class:
-                self.classes_to_be_downloaded_from_bing[key] = classes_to_scrape[key]
-                self.classes_contained_in_imagenet.__delitem__(key)
-        # do the bing download
-        for key in self.classes_to_be_downloaded_from_bing.keys():
-            # check if there are already downloads from imagenet, if so no need for as many downloads
-            if key in downloaded_amount_of_images_per_class.keys():
-                self.download(self.classes_to_be_downloaded_from_bing[key][0], key, chrome_version, firefox_version,
-                              amount_images_per_class - downloaded_amount_of_images_per_class[key],
-                              amount_already_downloaded=amount_already_downloaded)
-            else:
-                self.download(self.classes_to_be_downloaded_from_bing[key][0], key, chrome_version, firefox_version,
-                              amount_images_per_class,
-                              amount_already_downloaded=amount_already_downloaded)
-
-    '''
-    This function creates an instance of the bing downloader and passes how many images have already been downloaded 
-    from ImageNet, so that the training data can be completed.
-    @author: Bastian Pechler
-    '''
-    def download(self, query, label, chrome_version, firefox_version, limit=100, amount_already_downloaded=0):
-        path = os.path.join(self.image_folder, label)
-        if not os.path.exists(path):
-            os.mkdir(path)
-        bing = Bing(query, limit, path, chrome_version, firefox_version, 60, amount_already_downloaded)
-        bing.run()
\ No newline at end of file
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from download_manifest import DownloadManifest
+from image_ingest import ImageIngest
+from image_net_downloader import ImageNetDownloader
+from progress_reporter import ProgressReporter
+from bing_downloader import Bing
+
+
+class ImageLoader:
+
+    '''
+    This class coordinates the downloading process for creation of test data. In the initialization,
+    the downloading directory is created and ImageNetDownloader and BingDownloader are used. Both share one budget of
+    max_parallel_downloads: every ImageNet task and every Bing download takes one slot while it runs.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, full_imagenet_list, max_parallel_downloads=None, ingest_short_side=256):
+        self.full_imagenet_list = full_imagenet_list
+        self.classes_contained_in_imagenet = {}
+        self.classes_to_be_downloaded_from_bing = {}
+        self.image_folder = os.path.join('data/image_net', 'imagenet_images')
+        self.max_parallel_downloads = max_parallel_downloads or max(1, multiprocessing.cpu_count() - 1)
+        self.download_slots = multiprocessing.BoundedSemaphore(self.max_parallel_downloads)
+        self.image_net_downloader = ImageNetDownloader(self.classes_contained_in_imagenet, self.image_folder,
+                                                       amount_workers=self.max_parallel_downloads,
+                                                       ingest_short_side=ingest_short_side)
+        # the images of Bing are converted like the ones of the ImageNet workers (None keeps the downloaded files)
+        self.image_ingest = ImageIngest(short_side=ingest_short_side) if ingest_short_side is not None else None
+        self.amount_images_per_class = 0
+        if not os.path.isdir(self.image_folder):
+            os.mkdir(self.image_folder)
+
+    '''
+    This function coordinates the downloading processes. The classes to be downloaded are divided in two seperate sets,
+    the ones contained in the ImageNet dataset and the ones not contained there. The second subset is downloaded with
+    the bing API right away, in parallel to the ImageNetDownloader, which loads as many images of the first subset as
+    there are contained. If a class runs out of viable links on ImageNet (e.g. 200 wanted, but only 100 links viable),
+    it is handed over to BingDownloader as soon as its last urls are tried. Both resume from the amount of images in
+    the manifest of the class, amount_already_downloaded is not used anymore. progress_callback gets the amount of
+    downloaded and wanted images about every half second, by default the active progress reporter of the frontend.
+    @author: Bastian Pechler
+    '''
+    def download_images(self, amount_images_per_class, classes_to_scrape, chrome_version, firefox_version,
+                        amount_already_downloaded=0, progress_callback=None):
+        self.amount_images_per_class = amount_images_per_class
+        if progress_callback is None:
+            progress_callback = ProgressReporter.report
+        # classes to be scraped are divided in two dicts
+        # first subset will be loaded from imagenet, second one will be downloaded from bing
+        for key in classes_to_scrape.keys():
+            if self.full_imagenet_list.keys().__contains__(key):
+                self.classes_contained_in_imagenet[key] = classes_to_scrape[key]
+            else:
+                self.classes_to_be_downloaded_from_bing[key] = classes_to_scrape[key]
+
+        exhausted_classes = multiprocessing.Queue()
+        with ThreadPoolExecutor(max_workers=self.max_parallel_downloads) as executor:
+            bing_downloads = []
+            for key in self.classes_to_be_downloaded_from_bing.keys():
+                bing_downloads.append(executor.submit(self.download, self.classes_to_be_downloaded_from_bing[key][0],
+                                                      key, chrome_version, firefox_version, amount_images_per_class))
+
+            # the manifests of the classes count the images of earlier downloads, so the download resumes where it
+            # stopped and only the missing images up to amount_images_per_class are loaded
+            self.image_net_downloader.start_download(amount_images_per_class, exhausted_classes, self.download_slots)
+            image_net_running = True
+            while image_net_running:
+                image_net_running = self.image_net_downloader.is_running()
+                try:
+                    # after the workers stopped, the remaining classes in the queue are handed over without waiting
+                    key = exhausted_classes.get(timeout=0.5) if image_net_running else exhausted_classes.get_nowait()
+                except queue.Empty:
+                    self.report_progress(progress_callback)
+                    continue
+                image_net_running = True
+                # the images already downloaded from imagenet are counted by the manifest of the class
+                self.classes_to_be_downloaded_from_bing[key] = classes_to_scrape[key]
+                self.classes_contained_in_imagenet.__delitem__(key)
+                bing_downloads.append(executor.submit(self.download, classes_to_scrape[key][0], key, chrome_version,
+                                                      firefox_version, amount_images_per_class))
+            self.image_net_downloader.wait()
+
+            while len(wait(bing_downloads, timeout=0.5).not_done) > 0:
+                self.report_progress(progress_callback)
+        self.report_progress(progress_callback)
+
+    '''
+    This function creates an instance of the bing downloader and passes how many images of the class have already been
+    downloaded (from ImageNet or by an earlier download), so that the training data is completed up to limit images.
+    The amount is taken from the manifest of the class, the same source the ImageNet workers resume from. Afterwards
+    the images written by Bing are converted by the image ingest and added to the manifest.
+    @author: Bastian Pechler
+    '''
+    def download(self, query, label, chrome_version, firefox_version, limit=100):
+        path = os.path.join(self.image_folder, label)
+        os.makedirs(self.image_net_downloader.manifest_folder, exist_ok=True)
+        manifest = DownloadManifest(os.path.join(self.image_net_downloader.manifest_folder, label + '.sqlite'), path)
+        try:
+            amount_already_downloaded = manifest.get_ok_count()
+            if amount_already_downloaded >= limit:
+                return
+            bing = Bing(query, limit - amount_already_downloaded, path, chrome_version, firefox_version, 60,
+                        amount_already_downloaded)
+            with self.download_slots:
+                try:
+                    bing.run()
+                except Exception as e:
+                    print('Bing download of', label, 'failed:', e)
+            manifest.import_new_files(self.image_ingest)
+        finally:
+            manifest.close()
+
+    '''
+    This function returns the amount of downloaded images of all classes (at most amount_images_per_class per class)
+    and the amount of wanted images. ImageNet classes are counted by the workers, Bing classes by their files.
+    @author: Bastian Pechler
+    '''
+    def get_progress(self):
+        downloaded_amounts = self.image_net_downloader.get_downloaded_amounts()
+        downloaded = 0
+        for key in self.classes_contained_in_imagenet.keys():
+            downloaded += min(self.amount_images_per_class, downloaded_amounts.get(key, 0))
+        for key in self.classes_to_be_downloaded_from_bing.keys():
+            path = os.path.join(self.image_folder, key)
+            if os.path.isdir(path):
+                downloaded += min(self.amount_images_per_class, len(os.listdir(path)))
+        total = self.amount_images_per_class * (len(self.classes_contained_in_imagenet) +
+                                                len(self.classes_to_be_downloaded_from_bing))
+        return downloaded, total
+
+    '''
+    This function returns the throughput of every ImageNet worker of the last download (see ImageNetDownloader)
+    @author: Bastian Pechler
+    '''
+    def get_stats(self):
+        return self.image_net_downloader.get_stats()
+
+    def report_progress(self, progress_callback):
+        if progress_callback is not None:
+            progress_callback(*self.get_progress())
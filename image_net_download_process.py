@@ -1,105 +1,281 @@
-import glob
-import multiprocessing
-import os
-import random
-from multiprocessing import Value
-from pathlib import Path
-
-import requests
-import time
-from requests.exceptions import ConnectionError, ReadTimeout, TooManyRedirects, MissingSchema, InvalidURL
-
-IMAGENET_API_WNID_TO_URLS = lambda \
-        wnid: f'https://image-net.org/api/imagenet.synset.geturls?wnid={wnid}'
-
-
-class ImageNetDownloadProcess(multiprocessing.Process):
-
-    def __init__(self, classes_to_scrape, shared_amount_images_downloaded, amount_images_per_class, images_folder):
-        self.imagenet_images_folder = images_folder
-        self.downloaded_amount_per_class = shared_amount_images_downloaded
-        self.classes_to_scrape = classes_to_scrape
-        self.class_folder = ''
-        self.class_images = Value('d', 0)
-        self.images_per_class = amount_images_per_class
-        super().__init__()
-
-    '''
-    This function is just delegating and is needed for Thread implementation.
-    @author: Bastian Pechler
-    '''
-    def run(self):
-        self.load_data_from_sublist()
-
-    '''
-    This function sends a request to get urls of the images from imagenet. Therefor the wnid is passed and a list of 
-    available images is generated, which are then used to download the test data.
-    @author: Bastian Pechler
-    '''
-    def load_data_from_sublist(self):
-        for class_wnid in self.classes_to_scrape.keys():
-            self.class_images.value = 0
-            self.downloaded_amount_per_class[class_wnid] = 0
-            url_urls = IMAGENET_API_WNID_TO_URLS(class_wnid)
-
-            time.sleep(3)
-            resp = requests.get(url_urls)
-
-            self.class_folder = os.path.join(self.imagenet_images_folder, class_wnid)
-            if not os.path.exists(self.class_folder):
-                os.mkdir(self.class_folder)
-            image_paths = glob.glob(self.class_folder + '*')
-            self.class_images.value = len(image_paths)
-
-            urls = [url.decode('utf-8') for url in resp.content.splitlines()]
-            random.shuffle(urls)
-            self.get_images(urls, class_wnid)
-
-    '''
-    This function downloads the training data by iterating over the url list of images of one class. If enough images 
-    have been loaded it is stopped. It also checks if the images have the right data format and if the urls are
-    working.
-    @author: Bastian Pechler
-    '''
-    def get_images(self, img_url_list, class_wnid):
-        try:
-            for img_url in img_url_list:
-                if len(img_url) <= 1:
-                    continue
-
-                if self.class_images.value > self.images_per_class:
-                    return
-
-                img_name = img_url.split('/')[-1]
-                img_name = img_name.split("?")[0]
-                if img_name.split('.')[-1] not in ["jpe", "jpeg", "jfif", "tiff", "gif", "bmp", "png", "webp", "jpg"]:
-                    continue
-                img_file_path = Path(os.path.join(self.class_folder, img_name))
-                # this if is there to verify different images if download is started again
-                if img_file_path.is_file():
-                    continue
-                try:
-                    img_resp = requests.get(img_url, timeout=1)
-                except ConnectionError:
-                    continue
-                except ReadTimeout:
-                    continue
-                except TooManyRedirects:
-                    continue
-                except MissingSchema:
-                    continue
-                except InvalidURL:
-                    continue
-                if 'content-type' not in img_resp.headers:
-                    continue
-                if 'image' not in img_resp.headers['content-type']:
-                    continue
-                if len(img_resp.content) < 1000:
-                    continue
-                with open(img_file_path, 'wb') as img_f:
-                    img_f.write(img_resp.content)
-                self.class_images.value += 1
-
-        finally:
-            self.downloaded_amount_per_class[class_wnid] = self.class_images.value
-            return
+import multiprocessing
+import os
+import random
+import time
+from contextlib import nullcontext
+
+from async_image_fetcher import AsyncImageFetcher
+from download_manifest import DownloadManifest, IMAGE_DUPLICATE
+from image_fetcher import ImageFetcher, IMAGE_OK
+from image_ingest import ImageIngest
+
+IMAGENET_API_WNID_TO_URLS = lambda \
+        wnid: f'https://image-net.org/api/imagenet.synset.geturls?wnid={wnid}'
+
+# the url lists are long responses, their requests get more time than the requests of the images
+URL_LIST_TIMEOUT = 30
+
+# task types of the shared task queue
+TASK_URL_LIST = 'urls'
+TASK_IMAGES = 'images'
+
+
+class ImageNetDownloadProcess(multiprocessing.Process):
+
+    '''
+    This class is one worker of the download pool. It takes tasks from the task queue shared by all workers until it
+    gets None: a TASK_URL_LIST task loads the url list of one class and splits it into TASK_IMAGES tasks of
+    url_batch_size urls, which are put back into the queue. So a class with many dead urls is downloaded by all
+    workers which are idle, instead of blocking the one process it was assigned to.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, task_queue, shared_amount_images_downloaded, amount_images_per_class, images_folder,
+                 quota_lock, worker_stats, requests_in_flight=1, requests_per_host=4, url_batch_size=50,
+                 url_list_cache=None, manifest_folder=None, rate_limiter=None, pending_batches=None,
+                 exhausted_classes=None, download_slots=None, ingest_short_side=256, current_tasks=None):
+        self.task_queue = task_queue
+        # the task every worker works on right now (by process name), so the task of a dead worker can be failed
+        self.current_tasks = current_tasks if current_tasks is not None else {}
+        self.imagenet_images_folder = images_folder
+        self.downloaded_amount_per_class = shared_amount_images_downloaded
+        # the amount of images per class is shared by all workers, the lock guards the quota check
+        self.quota_lock = quota_lock
+        self.worker_stats = worker_stats
+        self.images_per_class = amount_images_per_class
+        self.image_fetcher = None
+        # the images are stored as JPEG with this size of the shorter side, None stores them as downloaded
+        self.ingest_short_side = ingest_short_side
+        self.image_ingest = None
+        # with more than one request in flight the images of a batch are downloaded concurrently with asyncio
+        self.requests_in_flight = requests_in_flight
+        self.requests_per_host = requests_per_host
+        self.url_batch_size = url_batch_size
+        # url lists and known bad urls of earlier downloads, None always requests the url lists from imagenet
+        self.url_list_cache = url_list_cache
+        # the manifests of the classes are opened by the worker when it needs them
+        self.manifest_folder = manifest_folder if manifest_folder is not None else \
+            os.path.join(os.path.dirname(images_folder), 'manifests')
+        self.manifests = {}
+        # paces the requests of all workers per host
+        self.rate_limiter = rate_limiter
+        # amount of unfinished batches per class, when a class has no batches left and did not reach its quota, its
+        # wnid is put into exhausted_classes (if given), so it can be completed by another source
+        self.pending_batches = pending_batches if pending_batches is not None else {}
+        self.exhausted_classes = exhausted_classes
+        # a task is only worked on with a slot of the download budget shared with the other downloaders
+        self.download_slots = download_slots if download_slots is not None else nullcontext()
+        self.stats = {'tasks': 0, 'images': 0, 'busy_time': 0.0, 'images_per_second': 0.0}
+        super().__init__()
+
+    '''
+    This function is just delegating and is needed for Thread implementation. The image fetcher (HTTP session with
+    connection pool) is created here, so every process has its own one.
+    @author: Bastian Pechler
+    '''
+    def run(self):
+        if self.ingest_short_side is not None:
+            self.image_ingest = ImageIngest(short_side=self.ingest_short_side)
+        self.image_fetcher = ImageFetcher(timeout=1, pool_maxsize=max(4, self.requests_per_host),
+                                          rate_limiter=self.rate_limiter, image_ingest=self.image_ingest)
+        try:
+            self.work_on_tasks()
+        finally:
+            self.image_fetcher.close()
+            for manifest in self.manifests.values():
+                manifest.close()
+
+    '''
+    This function takes tasks from the queue until it gets None. Every task is marked as done, even if it failed,
+    otherwise the downloader would wait forever.
+    @author: Bastian Pechler
+    '''
+    def work_on_tasks(self):
+        while True:
+            task = self.task_queue.get()
+            if task is None:
+                self.task_queue.task_done()
+                return
+            self.current_tasks[self.name] = task
+            start = time.perf_counter()
+            try:
+                with self.download_slots:
+                    if task[0] == TASK_URL_LIST:
+                        self.load_url_list(task[1])
+                    else:
+                        self.get_images(task[2], task[1])
+            except Exception as e:
+                print('Download task', task[0], 'of class', task[1], 'failed:', e)
+            finally:
+                self.finish_task(task)
+                self.update_stats(time.perf_counter() - start)
+                self.task_queue.task_done()
+                self.current_tasks.pop(self.name, None)
+
+    '''
+    This function counts a finished (or failed) task of a class. The downloader calls it for the task of a worker
+    which died.
+    @author: Bastian Pechler
+    '''
+    def finish_task(self, task):
+        if task[0] == TASK_IMAGES:
+            self.finish_batch(task[1])
+        elif task[1] not in self.pending_batches:
+            # the url list could not be loaded
+            self.finish_class(task[1])
+
+    '''
+    This function sends a request to get urls of the images from imagenet, if they are not cached. Therefor the wnid
+    is passed and a list of available images is generated, which is split into batches for the workers. Urls which
+    are known to be dead or no usable image are skipped.
+    @author: Bastian Pechler
+    '''
+    def load_url_list(self, class_wnid):
+        urls = None
+        bad_urls = set()
+        if self.url_list_cache is not None:
+            urls = self.url_list_cache.get(class_wnid)
+            bad_urls = self.url_list_cache.get_bad_urls(class_wnid)
+        if urls is None:
+            url_urls = IMAGENET_API_WNID_TO_URLS(class_wnid)
+
+            # the requests to imagenet are paced by the rate limiter
+            resp = self.image_fetcher.get(url_urls, timeout=URL_LIST_TIMEOUT)
+            if resp is None:
+                print('Url list of class', class_wnid, 'skipped, imagenet is not reachable')
+                return
+            urls = [url.decode('utf-8') for url in resp.content.splitlines()]
+            if self.url_list_cache is not None and resp.status_code == 200:
+                self.url_list_cache.put(class_wnid, urls)
+                bad_urls = set()
+
+        manifest = self.get_manifest(class_wnid)
+        self.downloaded_amount_per_class[class_wnid] = manifest.get_ok_count()
+
+        urls = [url for url in urls if url not in bad_urls]
+        random.shuffle(urls)
+        img_jobs = self.select_new_images(urls, manifest.get_known_urls())
+        batches = [img_jobs[i:i + self.url_batch_size] for i in range(0, len(img_jobs), self.url_batch_size)]
+        with self.quota_lock:
+            self.pending_batches[class_wnid] = len(batches)
+        if len(batches) == 0:
+            self.finish_class(class_wnid)
+        for batch in batches:
+            self.task_queue.put((TASK_IMAGES, class_wnid, batch))
+
+    '''
+    This function counts a finished batch of a class. After the last batch the class is finished.
+    @author: Bastian Pechler
+    '''
+    def finish_batch(self, class_wnid):
+        with self.quota_lock:
+            self.pending_batches[class_wnid] -= 1
+            last_batch = self.pending_batches[class_wnid] == 0
+        if last_batch:
+            self.finish_class(class_wnid)
+
+    '''
+    This function hands a class over to exhausted_classes, if all its urls are tried and its quota is not reached
+    @author: Bastian Pechler
+    '''
+    def finish_class(self, class_wnid):
+        if self.exhausted_classes is not None and \
+                self.downloaded_amount_per_class.get(class_wnid, 0) < self.images_per_class:
+            self.exhausted_classes.put(class_wnid)
+
+    '''
+    This function downloads one batch of images of a class. If enough images of the class have been loaded (by any
+    worker) it is stopped. Content type and size are checked by the image fetcher while streaming the response.
+    @author: Bastian Pechler
+    '''
+    def get_images(self, img_jobs, class_wnid):
+        remaining = self.images_per_class - self.downloaded_amount_per_class.get(class_wnid, 0)
+        if remaining <= 0:
+            return
+        save_image = lambda img_url, extension, content: self.save_image(img_url, extension, content, class_wnid)
+        url_outcomes = []
+        record_outcome = lambda img_url, outcome: url_outcomes.append((img_url, outcome))
+        try:
+            if self.requests_in_flight > 1:
+                async_image_fetcher = AsyncImageFetcher(self.image_fetcher, self.requests_in_flight,
+                                                        self.requests_per_host)
+                async_image_fetcher.download(img_jobs, remaining, save_image, record_outcome)
+                return
+
+            for img_url, extension in img_jobs:
+                outcome, content = self.image_fetcher.fetch(img_url)
+                record_outcome(img_url, outcome)
+                if outcome != IMAGE_OK:
+                    continue
+                if save_image(img_url, extension, content) is False:
+                    return
+        finally:
+            if self.url_list_cache is not None:
+                self.url_list_cache.record_outcomes(class_wnid, url_outcomes)
+
+    '''
+    This function filters the url list of a class: only urls of images with an allowed file extension are kept, which
+    have not been downloaded before (known urls of the manifest). It returns pairs of url and file extension.
+    @author: Bastian Pechler
+    '''
+    def select_new_images(self, img_url_list, known_urls):
+        img_jobs = []
+        img_urls = set()
+        for img_url in img_url_list:
+            if len(img_url) <= 1:
+                continue
+
+            img_name = img_url.split('/')[-1]
+            img_name = img_name.split("?")[0]
+            extension = img_name.split('.')[-1].lower()
+            if extension not in ["jpe", "jpeg", "jfif", "tiff", "gif", "bmp", "png", "webp", "jpg"]:
+                continue
+            # this if is there to verify different images if download is started again
+            if img_url in known_urls or img_url in img_urls:
+                continue
+            img_urls.add(img_url)
+            img_jobs.append((img_url, extension))
+        return img_jobs
+
+    '''
+    This function stores a downloaded image in the manifest of its class if the quota of the class is not reached yet.
+    It returns True if the image was counted, None if the same image is already stored and False if the quota is
+    reached, so the download of the batch can be stopped.
+    @author: Bastian Pechler
+    '''
+    def save_image(self, img_url, extension, content, class_wnid):
+        with self.quota_lock:
+            amount_images = self.downloaded_amount_per_class.get(class_wnid, 0)
+            if amount_images >= self.images_per_class:
+                return False
+            self.downloaded_amount_per_class[class_wnid] = amount_images + 1
+        if self.image_ingest is not None:
+            extension = self.image_ingest.extension
+        status, _ = self.get_manifest(class_wnid).add_image(img_url, content, extension)
+        if status == IMAGE_DUPLICATE:
+            with self.quota_lock:
+                self.downloaded_amount_per_class[class_wnid] -= 1
+            return None
+        self.stats['images'] += 1
+        return True
+
+    '''
+    This function returns the manifest of a class, which is opened once per worker
+    @author: Bastian Pechler
+    '''
+    def get_manifest(self, class_wnid):
+        if class_wnid not in self.manifests:
+            os.makedirs(self.manifest_folder, exist_ok=True)
+            self.manifests[class_wnid] = DownloadManifest(os.path.join(self.manifest_folder, class_wnid + '.sqlite'),
+                                                          os.path.join(self.imagenet_images_folder, class_wnid))
+        return self.manifests[class_wnid]
+
+    '''
+    This function publishes the throughput of this worker to the downloader
+    @author: Bastian Pechler
+    '''
+    def update_stats(self, task_time):
+        self.stats['tasks'] += 1
+        self.stats['busy_time'] += task_time
+        if self.stats['busy_time'] > 0:
+            self.stats['images_per_second'] = self.stats['images'] / self.stats['busy_time']
+        self.worker_stats[self.name] = dict(self.stats)
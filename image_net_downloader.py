@@ -1,49 +1,184 @@
-import multiprocessing
-from image_net_download_process import ImageNetDownloadProcess
-import os
-from boltons import iterutils
-
-
-class ImageNetDownloader:
-
-    def __init__(self, classes_to_scrape, images_folder):
-        self.amount_images_per_class = 0
-        self.classes_to_scrape = classes_to_scrape
-        self.images_folder = images_folder
-        self.shared_amount_images_downloaded = multiprocessing.Manager().dict()
-        if not os.path.isdir(self.images_folder):
-            os.mkdir(self.images_folder)
-
-    '''
-    This function checks the amount of available cores of the current system, splits the label list to be downloaded in
-    parts and creates different download threads to improve speed of the download.
-    @author: Bastian Pechler
-    '''
-    def load_from_image_net(self, amount_images_per_class=20):
-        self.amount_images_per_class = amount_images_per_class
-        # if less classes than cores, we need less processes than classes
-        amount_cores = min(multiprocessing.cpu_count() - 1, len(self.classes_to_scrape))
-        processes = []
-
-        length = int(len(self.classes_to_scrape) / amount_cores) + 1
-        keys = [*self.classes_to_scrape.keys()]
-
-        key_sub_lists = iterutils.chunked(keys, length)
-        for i in range(amount_cores):
-            if i >= len(key_sub_lists):
-                break
-            classes_sub_lists = {key: self.classes_to_scrape[key] for key in key_sub_lists[i]}
-            processes.append(ImageNetDownloadProcess(classes_sub_lists, self.shared_amount_images_downloaded,
-                                                     self.amount_images_per_class, self.images_folder))
-        for proc in processes:
-            proc.start()
-        for proc in processes:
-            proc.join()
-
-        # this is needed to find those classes where too many urls have been defect
-        # with this information it is possible to make additional downloads via bing
-        downloaded_images_per_class = {}
-
-        downloaded_images_per_class.update(self.shared_amount_images_downloaded)
-
-        return downloaded_images_per_class
+import functools
+import multiprocessing
+import queue
+import threading
+from image_net_download_process import ImageNetDownloadProcess, TASK_URL_LIST
+from rate_limiter import RateLimiter
+from url_list_cache import UrlListCache
+import os
+
+
+class ImageNetDownloader:
+
+    def __init__(self, classes_to_scrape, images_folder, requests_in_flight=1, requests_per_host=4,
+                 amount_workers=None, url_batch_size=50, url_cache_folder=None, url_cache_ttl=7 * 24 * 60 * 60,
+                 rate_per_host=10.0, imagenet_rate=0.5, ingest_short_side=256, liveness_interval=1.0,
+                 max_worker_restarts=None):
+        self.amount_images_per_class = 0
+        # amount of concurrent image requests of every download process (1 downloads one image after another)
+        self.requests_in_flight = requests_in_flight
+        self.requests_per_host = requests_per_host
+        # None uses all cores but one, at least one worker
+        self.amount_workers = amount_workers
+        self.url_batch_size = url_batch_size
+        # the workers store the images as JPEG with this size of the shorter side (None keeps the downloaded files)
+        self.ingest_short_side = ingest_short_side
+        self.classes_to_scrape = classes_to_scrape
+        self.images_folder = images_folder
+        manager = multiprocessing.Manager()
+        self.shared_amount_images_downloaded = manager.dict()
+        self.worker_stats = manager.dict()
+        self.pending_batches = manager.dict()
+        self.current_tasks = manager.dict()
+        # the workers are checked every liveness_interval seconds, a dead worker is replaced at most
+        # max_worker_restarts times per download (None: as often as there are workers)
+        self.liveness_interval = liveness_interval
+        self.max_worker_restarts = max_worker_restarts
+        self.download_thread = None
+        self.quota_lock = multiprocessing.Lock()
+        # one rate limiter for all workers, the imagenet api gets its own (lower) rate
+        self.rate_limiter = RateLimiter(manager, rate_per_host=rate_per_host, burst=max(2, requests_per_host),
+                                        host_rates={'image-net.org': imagenet_rate})
+        if not os.path.isdir(self.images_folder):
+            os.mkdir(self.images_folder)
+        # the url lists are cached next to the images folder
+        if url_cache_folder is None:
+            url_cache_folder = os.path.join(os.path.dirname(self.images_folder), 'url_lists')
+        self.url_list_cache = UrlListCache(url_cache_folder, ttl=url_cache_ttl)
+        self.manifest_folder = os.path.join(os.path.dirname(self.images_folder), 'manifests')
+
+    '''
+    This function starts a fixed pool of download processes, which share one task queue, and waits for them.
+    @author: Bastian Pechler
+    '''
+    def load_from_image_net(self, amount_images_per_class=20):
+        self.start_download(amount_images_per_class)
+        return self.wait()
+
+    '''
+    This function starts a fixed pool of download processes, which share one task queue. For every class a task to
+    load its url list is queued, the workers split the url lists into batches and queue them again, so idle workers
+    help with slow classes. Classes that run out of urls before reaching the amount are put into exhausted_classes
+    (if given). With download_slots, every task of a worker takes one slot of this (shared) semaphore.
+    @author: Bastian Pechler
+    '''
+    def start_download(self, amount_images_per_class=20, exhausted_classes=None, download_slots=None):
+        self.amount_images_per_class = amount_images_per_class
+        amount_workers = self.amount_workers or max(1, multiprocessing.cpu_count() - 1)
+        task_queue = multiprocessing.JoinableQueue()
+        self.worker_stats.clear()
+        self.pending_batches.clear()
+        self.current_tasks.clear()
+
+        for class_wnid in self.classes_to_scrape.keys():
+            task_queue.put((TASK_URL_LIST, class_wnid))
+        make_process = functools.partial(ImageNetDownloadProcess, task_queue, self.shared_amount_images_downloaded,
+                                         self.amount_images_per_class, self.images_folder, self.quota_lock,
+                                         self.worker_stats, self.requests_in_flight, self.requests_per_host,
+                                         self.url_batch_size, self.url_list_cache, self.manifest_folder,
+                                         self.rate_limiter, self.pending_batches, exhausted_classes, download_slots,
+                                         self.ingest_short_side, self.current_tasks)
+        processes = [make_process() for i in range(amount_workers)]
+        for proc in processes:
+            proc.start()
+        max_restarts = self.max_worker_restarts if self.max_worker_restarts is not None else amount_workers
+        self.download_thread = threading.Thread(target=self.stop_workers,
+                                                args=(task_queue, processes, make_process, max_restarts))
+        self.download_thread.start()
+
+    '''
+    This function waits until all tasks are done and then gives every worker None to stop. While waiting, the
+    workers are checked: the task of a worker which died is failed (and not tried again, it could kill the next
+    worker as well) and the worker is replaced. If no worker is left and none may be started anymore, the remaining
+    tasks are failed, so the download never waits forever.
+    @author: Bastian Pechler
+    '''
+    def stop_workers(self, task_queue, processes, make_process, max_restarts):
+        all_done = threading.Event()
+
+        def join_tasks():
+            task_queue.join()
+            all_done.set()
+        threading.Thread(target=join_tasks, daemon=True).start()
+
+        restarts = 0
+        dead_workers = set()
+        while not all_done.wait(self.liveness_interval):
+            for i, proc in enumerate(processes):
+                if proc.is_alive() or proc.name in dead_workers:
+                    continue
+                dead_workers.add(proc.name)
+                self.fail_task_of_dead_worker(task_queue, proc)
+                if restarts < max_restarts:
+                    processes[i] = make_process()
+                    processes[i].start()
+                    restarts += 1
+            if not any(proc.is_alive() for proc in processes):
+                self.fail_remaining_tasks(task_queue, processes[0])
+
+        for proc in processes:
+            task_queue.put(None)
+        for proc in processes:
+            proc.join()
+
+    def fail_task_of_dead_worker(self, task_queue, proc):
+        task = self.current_tasks.pop(proc.name, None)
+        print('Download worker', proc.name, 'died with exit code', proc.exitcode)
+        if task is not None:
+            proc.finish_task(task)
+            self.mark_task_done(task_queue)
+
+    '''
+    This function fails all tasks left in the queue, their classes are counted as finished (e.g. for Bing)
+    @author: Bastian Pechler
+    '''
+    def fail_remaining_tasks(self, task_queue, proc):
+        while True:
+            try:
+                task = task_queue.get(timeout=self.liveness_interval)
+            except queue.Empty:
+                return
+            if task is not None:
+                proc.finish_task(task)
+            self.mark_task_done(task_queue)
+
+    @staticmethod
+    def mark_task_done(task_queue):
+        try:
+            task_queue.task_done()
+        except ValueError:
+            # the worker died after it marked its task as done
+            pass
+
+    def is_running(self):
+        return self.download_thread is not None and self.download_thread.is_alive()
+
+    '''
+    This function waits for the workers and returns the amount of images per class
+    @author: Bastian Pechler
+    '''
+    def wait(self):
+        self.download_thread.join()
+
+        # this is needed to find those classes where too many urls have been defect
+        # with this information it is possible to make additional downloads via bing
+        downloaded_images_per_class = {}
+
+        downloaded_images_per_class.update(self.shared_amount_images_downloaded)
+
+        return downloaded_images_per_class
+
+    '''
+    This function returns the amount of images downloaded so far per class
+    @author: Bastian Pechler
+    '''
+    def get_downloaded_amounts(self):
+        return dict(self.shared_amount_images_downloaded)
+
+    '''
+    This function returns the throughput of every worker of the last download (tasks, images, busy time in seconds
+    and images per second)
+    @author: Bastian Pechler
+    '''
+    def get_stats(self):
+        return dict(self.worker_stats)
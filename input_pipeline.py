@@ -0,0 +1,174 @@
+import multiprocessing
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+from shard_packer import ShardDataset
+
+# dataset of every worker process, opened once by init_worker
+worker_dataset = None
+
+
+def init_worker(shard_folder):
+    global worker_dataset
+    worker_dataset = ShardDataset(shard_folder)
+
+
+'''
+This function is run by the worker processes: it reads one batch from the shards and augments every image with the
+augmentation of the training (albumentations, called as augment(image=img), see model_input). The random generators
+of the worker are seeded by the batch, so every batch is the same, no matter which worker prepares it.
+@author: Bastian Pechler
+'''
+def load_batch(indices, augment, seed):
+    images, labels = worker_dataset.get_batch(indices)
+    seed = int(np.random.SeedSequence(seed).generate_state(1)[0])
+    random.seed(seed)
+    np.random.seed(seed)
+    return np.stack([augment(image=img)['image'] for img in images]), np.array(labels)
+
+
+class InputPipeline:
+
+    '''
+    This class prepares the training batches from the packed shards in a pool of worker processes (decoding is
+    already done by the shards, the workers augment the images), while the model trains on the current batch. At most
+    prefetch_batches batches are prepared in advance, so the memory does not depend on the size of the dataset, and
+    batch_size only controls how many images make up one batch. Without augment, the batches are read in the training
+    process and no workers are needed. list_key_to_int and preprocess (uint8 RGB batch -> input of the model) have to
+    be the ones of the model which is trained. The time the training waits for its next batch is measured and the
+    amount of batches taken by the training is passed to progress_callback(done, total), the total are the batches of
+    amount_epochs epochs (None if amount_epochs is not given).
+    @author: Bastian Pechler
+    '''
+    def __init__(self, shard_folder, batch_size, list_key_to_int, preprocess=None, augment=None, amount_workers=None,
+                 prefetch_batches=4, seed=0, amount_epochs=None, progress_callback=None):
+        self.shard_folder = shard_folder
+        self.dataset = ShardDataset(shard_folder)
+        self.batch_size = batch_size
+        self.list_key_to_int = list_key_to_int
+        self.preprocess = preprocess
+        self.augment = augment
+        self.amount_workers = amount_workers or max(1, multiprocessing.cpu_count() - 1)
+        self.prefetch_batches = prefetch_batches
+        self.seed = seed
+        self.amount_epochs = amount_epochs
+        self.progress_callback = progress_callback
+        self.pool = None
+        # class index of the shards -> output of the model (-1 if the model does not know the class)
+        self.outputs = np.array([list_key_to_int.get(class_key, -1) for class_key in self.dataset.class_keys],
+                                dtype=np.int64)
+        self.reset_stats()
+
+    '''
+    This function returns the amount of images of the shards which belong to an output of the model
+    @author: Bastian Pechler
+    '''
+    def __len__(self):
+        return sum(int(np.count_nonzero(self.outputs[labels] >= 0)) for labels in self.dataset.labels)
+
+    '''
+    This function returns a generator of (images, one hot labels) batches, which runs over the shards endlessly
+    @author: Bastian Pechler
+    '''
+    def make_generator(self):
+        if self.augment is None:
+            batches = (self.dataset.get_batch(indices) for indices in self.iterate_batch_indices())
+        else:
+            batches = self.iterate_prefetched_batches()
+        last_batch_time = None
+        while True:
+            wait_start = time.perf_counter()
+            images, labels = next(batches)
+            batch = self.make_training_batch(images, labels)
+            now = time.perf_counter()
+            if batch is None:
+                continue
+            # a step is the time from one batch to the next: training on the batch and waiting for the next
+            if last_batch_time is None:
+                self.stats['first_batch_time'] = now - wait_start
+            else:
+                self.stats['wait_time'] += now - wait_start
+                self.stats['step_time'] += now - last_batch_time
+            last_batch_time = now
+            self.stats['batches'] += 1
+            if self.progress_callback is not None:
+                self.progress_callback(self.stats['batches'], self.get_total_batches())
+            yield batch
+
+    def get_batches_per_epoch(self):
+        return -(-len(self.dataset) // self.batch_size)
+
+    def get_total_batches(self):
+        return None if self.amount_epochs is None else self.get_batches_per_epoch() * self.amount_epochs
+
+    '''
+    This function returns the image indices of the batches of all epochs, shuffled with the seed of the epoch
+    @author: Bastian Pechler
+    '''
+    def iterate_batch_indices(self):
+        epoch = 0
+        while True:
+            rng = np.random.default_rng([self.seed, epoch])
+            for indices in self.dataset.get_batch_indices(self.batch_size, shuffle=True, rng=rng):
+                yield indices
+            epoch += 1
+
+    '''
+    This function lets the workers prepare the next prefetch_batches batches and returns them in order
+    @author: Bastian Pechler
+    '''
+    def iterate_prefetched_batches(self):
+        # spawn, because the training process has already started the threads of tensorflow
+        self.pool = multiprocessing.get_context('spawn').Pool(self.amount_workers, initializer=init_worker,
+                                                              initargs=(self.shard_folder,))
+        pending_batches = deque()
+        batch_indices = self.iterate_batch_indices()
+        batch_index = 0
+        try:
+            while True:
+                while len(pending_batches) < self.prefetch_batches:
+                    pending_batches.append(self.pool.apply_async(
+                        load_batch, (next(batch_indices), self.augment, [self.seed, batch_index])))
+                    batch_index += 1
+                yield pending_batches.popleft().get()
+        finally:
+            self.close()
+
+    def make_training_batch(self, images, labels):
+        batch_outputs = self.outputs[labels]
+        known = batch_outputs >= 0
+        if not known.all():
+            images, batch_outputs = images[known], batch_outputs[known]
+        if len(batch_outputs) == 0:
+            return None
+        one_hot = np.zeros((len(batch_outputs), len(self.list_key_to_int)), dtype=np.float32)
+        one_hot[np.arange(len(batch_outputs)), batch_outputs] = 1
+        if self.preprocess is not None:
+            images = self.preprocess(images)
+        return images, one_hot
+
+    '''
+    This function stops the worker processes
+    @author: Bastian Pechler
+    '''
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def reset_stats(self):
+        self.stats = {'batches': 0, 'first_batch_time': 0.0, 'wait_time': 0.0, 'step_time': 0.0}
+
+    '''
+    This function returns the amount of batches, the time until the first batch was ready (e.g. starting the
+    workers), the time the training waited for input after that and the part of the step time spent waiting
+    @author: Bastian Pechler
+    '''
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['wait_fraction'] = stats['wait_time'] / stats['step_time'] if stats['step_time'] > 0 else 0.0
+        return stats
@@ -1,299 +1,578 @@
-import time
-import threading
-from webcam_processor import WebcamProcessor
-from data_parser import DataParser
-from progress_bar_thread import ProgressBarThread
-
-
-class InteractionController:
-
-    '''
-    This method instantiates the interaction controller (used for button clicks).
-    Needed objects:
-        CompanionModel
-        WebcamProcessor
-        FrontendModel
-        BackendModel
-        AvatarManager
-    @author: Bastian Pechler
-    '''
-    def __init__(self, frontend_model, backend_model, companion_model, avatar_manager):
-        self.companion_model = companion_model
-        self.frontend_model = frontend_model
-        self.backend_model = backend_model
-        self.webcam_processor = WebcamProcessor()
-        self.avatar_manager = avatar_manager
-
-    '''
-    This function handles the deactivation of the voice recognizer
-    @author: Bastian Pechler
-    '''
-    def handle_goodbye(self):
-        self.frontend_model.sound_recognizer_active = 'hidden'
-        self.frontend_model.sound_recognizer_not_active = 'visible'
-        if self.backend_model.avatar_active:
-            self.speak_avatar_dialect('Talk to you soon!')
-
-    '''
-    This function delegates a request to start the webcam input feed and shows a adequate response to the user
-    @author: Bastian Pechler
-    '''
-    def handle_webcam_started(self):
-        self.frontend_model.output_text = 'Select a section in the image by pointing at the object!'
-        self.handle_speak_request()
-        self.bounding_box()
-
-    '''
-    This function shows the user that detection was done. The detected label is displayed.
-    @author: Bastian Pechler
-    '''
-    def handle_detection_finished(self):
-        self.frontend_model.input_label = self.frontend_model.output_text
-        self.frontend_model.output_text = "The object is a " + self.frontend_model.output_text + \
-                                          '. Please validate this label now.'
-        self.frontend_model.do_not_let_user_validate_result = 'visible'
-        self.handle_speak_request()
-
-    '''
-    This method calls the explanation feature of our model.
-    author: Bastian Pechler
-    '''
-    def handle_asked_for_explanation(self):
-        self.explain_prediction()
-        self.frontend_model.output_text = 'Here are the recognized patterns'
-        self.handle_speak_request()
-
-    '''
-    This method checks if the avatar is activated. If so, it will read the content of 
-    the output textfield (located in the GUI). 
-    @author Bastian Pechler
-    '''
-    def handle_speak_request(self):
-        if self.backend_model.avatar_active:
-            self.speak_avatar_dialect(self.frontend_model.output_text)
-
-    '''
-    This method is called if the user specified the prediction as wrong. In this case, the correct label has to 
-    be specified, so that the model can retrain or add another label to the label list. 
-    @author: Bastian Pechler
-    '''
-    def handle_label_to_be_specified(self):
-        self.frontend_model.output_text = 'Please specify which label could be used for the shown object!'
-        self.handle_speak_request()
-
-    '''
-    This method is called if the user wished the classification of a detection of an (uploaded or recorded) image.
-    @author: Bastian Pechler
-    '''
-    def detect(self):
-        if len(self.frontend_model.image_bytes) == 0:
-            self.frontend_model.output_text = 'Please provide me an input picture first.'
-            self.handle_speak_request()
-        else:
-            self.backend_model.current_label_index = self.companion_model.predict(self.frontend_model.image_path)
-            key = [*self.backend_model.label_list.keys()][self.backend_model.current_label_index]
-            self.backend_model.list_entry = 0
-            self.frontend_model.output_text = self.backend_model.label_list[key][self.backend_model.list_entry]
-            self.frontend_model.do_not_let_user_validate_result = 'visible'
-            self.handle_detection_finished()
-
-    '''
-    This method is there that all classification labels for one class of objects can be viewed. 
-    After all those synonyms are shown once, it will display that all labels have been shown.
-    @author: Bastian Pechler
-    '''
-    def show_synonym(self):
-        if self.frontend_model.do_not_let_user_validate_result == 'hidden':
-            self.frontend_model.output_text = 'Please let me classify the image first.'
-
-        elif self.backend_model.current_label_index is not None:
-            key = [*self.backend_model.label_list.keys()][self.backend_model.current_label_index]
-            if len(self.backend_model.label_list[key]) - 1 > self.backend_model.list_entry:
-                self.backend_model.list_entry += 1
-                self.frontend_model.output_text = 'A known synonym is :' + self.backend_model.label_list[key][
-                    self.backend_model.list_entry]
-            else:
-                self.backend_model.list_entry = 0
-                self.frontend_model.output_text = 'No more synonyms for the current label are known.'
-
-        self.handle_speak_request()
-
-    '''
-    This function checks if entered label is new to the companion model (not yet in label list)
-    In this case, additional training data is generated by downloading images.
-    If the label is already present, but the model predicted wrong it is just retrained
-    @author: Bastian Pechler
-    '''
-    def handle_user_labelling(self):
-        entered_label = self.frontend_model.input_label.lower()
-        new_label_key = self.backend_model.check_user_label(entered_label)
-        if new_label_key is not None:
-            self.frontend_model.output_text = 'Downloading and retraining to make this object ' \
-                                              'detectable in the future'
-            if self.backend_model.avatar_active:
-                self.handle_speak_request()
-            self.frontend_model.loading_active = True
-            self.frontend_model.loading_progress_description = "Downloading: "
-            progress_bar_thread = ProgressBarThread(frontend_model=self.frontend_model)
-            thread = threading.Thread(target=progress_bar_thread.start)
-            thread.start()
-            self.backend_model.generate_data_for_new_label(self.frontend_model.image_bytes, entered_label,
-                                                           new_label_key, self.frontend_model.model_chrome_version,
-                                                           self.frontend_model.model_firefox_version)
-            self.companion_model.add_output_for_classifier(len(self.backend_model.label_list))
-            self.backend_model.output_classifiers = len(self.backend_model.label_list)
-            DataParser.save_current_state(self.backend_model.amount_downloaded_images_per_class,
-                                          self.backend_model.model_already_trained,
-                                          self.backend_model.label_list_modified,
-                                          self.backend_model.output_classifiers)
-            progress_bar_thread.stop()
-            thread.join()
-        self.frontend_model.output_text = 'The training process will start now!'
-        if self.backend_model.avatar_active:
-            self.handle_speak_request()
-        self.retrain_model()
-        self.frontend_model.output_text = 'Training is done!'
-        if self.backend_model.avatar_active:
-            self.handle_speak_request()
-
-    '''
-    This function handles a retrain request by the user
-    @author: Bastian Pechler
-    '''
-    def handle_retrain(self):
-        self.frontend_model.output_text = 'Retraining, this may take a while.'
-        self.handle_speak_request()
-        time.sleep(3)
-        self.retrain_model()
-
-    '''
-    This function handles a retrain and download request by the user
-    @author: Bastian Pechler
-    '''
-    def handle_download_and_retrain(self):
-        self.frontend_model.output_text = 'Downloading and retraining, this can take a while'
-        self.handle_speak_request()
-        self.download_and_retrain()
-
-    '''
-    This function is called when a user classifies an image as correct. He/ She is thanked for the feedback
-    @author: Bastian Pechler
-    '''
-    def handle_correct_prediction(self):
-        self.frontend_model.output_text = 'Thank you for the feedback'
-        self.handle_speak_request()
-
-    '''
-    This function delegates a retrain request to the companion model.
-    Data is parsed (by DataParser), UI Elements are managed and the new state is persisted (model trained = true)
-    @author: Bastian Pechler
-    '''
-    def retrain_model(self):
-        self.frontend_model.loading_active = True
-        self.frontend_model.loading_progress_description = "Training: "
-        progress_bar_thread = ProgressBarThread(frontend_model=self.frontend_model)
-        thread = threading.Thread(target=progress_bar_thread.start)
-        thread.start()
-
-        self.frontend_model.do_not_let_user_validate_result = 'hidden'
-        self.frontend_model.do_not_let_user_enter_label = 'hidden'
-        generator, list_key_to_int = self.backend_model.parse_images_and_labels(
-            self.frontend_model.image_augmentation_active, self.frontend_model.model_chunk_size)
-
-        self.companion_model.set_generator(generator, list_key_to_int)
-
-        self.companion_model.improvement_threshold = self.frontend_model.model_accuracy_improvement_threshold
-        self.companion_model.train_model(self.frontend_model.model_learning_rate,
-                                         self.frontend_model.model_accuracy_improvement_threshold,
-                                         self.frontend_model.number_training_epochs)
-        self.backend_model.model_already_trained = True
-        DataParser.save_current_state(self.backend_model.amount_downloaded_images_per_class,
-                                      self.backend_model.model_already_trained, self.backend_model.label_list_modified,
-                                      self.backend_model.output_classifiers)
-        self.frontend_model.output_text = "Done training"
-
-        progress_bar_thread.stop()
-        thread.join()
-
-
-    '''
-    This function resets the model to the initial state
-    @author: Bastian Pechler
-    '''
-    def reset(self):
-        self.frontend_model.output_text = 'The prediction model will be reset to the basic state.'
-        self.handle_speak_request()
-        self.companion_model.reset(self.frontend_model.model_learning_rate)
-        self.backend_model.reset()
-
-    '''
-    This function delegates a download and retrain request. The amount of images downloaded will be set to the amount
-    specified by the user in the frontend. If He/ she specifies more images than before, download is triggered. Else 
-    just the state saved in backend is updated.
-    Afterwards a retrain is triggered.
-    @author: Bastian Pechler
-    '''
-    def download_and_retrain(self):
-        self.frontend_model.loading_active = True
-        self.frontend_model.loading_progress_description = "Downloading: "
-        progress_bar_thread = ProgressBarThread(frontend_model=self.frontend_model)
-        thread = threading.Thread(target=progress_bar_thread.start)
-        thread.start()
-
-        self.backend_model.download_images(self.frontend_model.model_chrome_version,
-                                           self.frontend_model.model_firefox_version,
-                                           amount=self.frontend_model.number_download_images
-                                           )
-        self.backend_model.download_images = self.frontend_model.number_download_images
-        self.backend_model.save_state()
-
-        progress_bar_thread.stop()
-        thread.join()
-        self.retrain_model()
-
-    '''
-    This function connects the frontend with the webcam processor to detect the objects on the webcam feed and 
-    implement the fingerpointing functionality. The specified object is passed to the frontend and displayed there.
-    @author: Marcel Achner
-    '''
-    def bounding_box(self):
-        self.frontend_model.image_path = self.webcam_processor.detect_objects()
-        # to use that you need to return the path of the screenshot that needs to be extracted to the net
-        # if the path cannot be read the webcam was manually closed and nothing should happen with the displayed img
-        try:
-            file = open(self.frontend_model.image_path, "rb")
-            self.frontend_model.image_bytes = file.read()
-            self.backend_model.image_to_be_verified = True
-        except OSError:
-            pass
-
-    '''
-    This function calls the explain_prediction method in the backend to show why the generated label was chosen 
-    by Fritzi
-    @author: Marcel Achner
-    '''
-    def explain_prediction(self):
-        self.frontend_model.loading_active = True
-        self.frontend_model.loading_progress_description = "Explaining: "
-        progress_bar_thread = ProgressBarThread(frontend_model=self.frontend_model)
-        thread = threading.Thread(target=progress_bar_thread.start)
-        thread.start()
-
-        resulting_image_paths = self.companion_model.explain_prediction(self.frontend_model.image_path)
-        self.frontend_model.img_xai_one_bytes = open(resulting_image_paths[0][0], "rb").read()
-        self.frontend_model.img_xai_two_bytes = open(resulting_image_paths[1][0], "rb").read()
-
-        progress_bar_thread.stop()
-        thread.join()
-
-    '''
-    This function passes the desired dialect of the avatar from the frontend to the backend and speaks the specified 
-    message
-    @author: Marcel Achner
-    '''
-    def speak_avatar_dialect(self, message):
-        self.avatar_manager.set_dialect(self.frontend_model.avatar_dialect)
-        self.avatar_manager.avatar_speak(self.backend_model.node_process, message)
-
-
-
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from webcam_processor import WebcamProcessor
+from data_parser import DataParser
+from progress_reporter import ProgressReporter
+from input_pipeline import InputPipeline
+from model_input import IMAGE_SIZE, get_label_mapping, make_augmentation, preprocess_images
+from job_executor import JobExecutor
+from shard_packer import ShardPacker
+from prediction_cache import PredictionCache
+from startup import Startup
+
+
+class InteractionController:
+
+    # settings of the webcam session, see WebcamProcessor. In pipelined mode capturing, object detection, hand
+    # tracking and rendering run in their own threads, joined by queues keeping the latest pipeline_queue_size frames.
+    # The object detector runs every detection_interval frames or if the scene changed more than
+    # scene_change_threshold, the boxes are tracked in between. The image used for the detection is downsized down to
+    # min_scale_percent to hold target_fps (None keeps scale_percent).
+    WEBCAM_SETTINGS = {'pipelined': True, 'pipeline_queue_size': 1, 'detection_interval': 3,
+                       'scene_change_threshold': 12.0, 'scale_percent': 100, 'target_fps': 15, 'min_scale_percent': 30}
+
+    '''
+    This method instantiates the interaction controller (used for button clicks).
+    Needed objects:
+        CompanionModel
+        WebcamProcessor
+        FrontendModel
+        BackendModel
+        AvatarManager
+    Retraining, downloads and explanations run as jobs of the job executor, which can be shared by several
+    controllers, the same holds for the cache of the predictions and the lock of the companion model, which is held
+    while the model predicts or trains. With a staged startup the companion model can be None at first, the features
+    needing it check the startup phase (see MasterController).
+    @author: Bastian Pechler
+    '''
+    def __init__(self, frontend_model, backend_model, companion_model, avatar_manager, job_executor=None,
+                 prediction_cache=None, startup=None, model_lock=None, webcam_settings=None):
+        self.companion_model = companion_model
+        self.frontend_model = frontend_model
+        self.backend_model = backend_model
+        # the given settings replace single entries of WEBCAM_SETTINGS
+        self.webcam_settings = dict(self.WEBCAM_SETTINGS, **(webcam_settings or {}))
+        self.webcam_processor = WebcamProcessor(**self.webcam_settings)
+        self.avatar_manager = avatar_manager
+        self.job_executor = job_executor if job_executor is not None else JobExecutor()
+        self.prediction_cache = prediction_cache if prediction_cache is not None else PredictionCache()
+        # a prediction must not run while the model is trained, reset or gets a new output
+        self.model_lock = model_lock if model_lock is not None else threading.RLock()
+        # created on the first explanation, lime is imported with it
+        self.explanation_engine = None
+        self.startup = startup if startup is not None else Startup()
+        # decoded version of frontend_model.image_bytes, so the same image is decoded only once
+        self.input_image = None
+        self.input_image_bytes = None
+        # the companion model reads its input from a file, the webcam selection is only written there when needed
+        self.webcam_image_path = 'data/detect_object.png'
+        self.webcam_image_bytes = None
+        self.webcam_image_written = False
+        # the samples of an explanation are classified from this file, see predict_samples
+        self.explanation_sample_path = 'data/explanation_sample.png'
+        # the downloaded images packed into shards for training
+        self.shard_packer = ShardPacker(image_size=IMAGE_SIZE)
+        self.input_pipeline_stats = None
+
+    '''
+    This function handles the deactivation of the voice recognizer
+    @author: Bastian Pechler
+    '''
+    def handle_goodbye(self):
+        self.frontend_model.sound_recognizer_active = 'hidden'
+        self.frontend_model.sound_recognizer_not_active = 'visible'
+        if self.backend_model.avatar_active:
+            self.speak_avatar_dialect('Talk to you soon!')
+
+    '''
+    This function delegates a request to start the webcam input feed and shows a adequate response to the user
+    @author: Bastian Pechler
+    '''
+    def handle_webcam_started(self):
+        if not self.check_ready('object_detector', 'hand_tracking'):
+            return
+        self.frontend_model.output_text = 'Select a section in the image by pointing at the object!'
+        self.handle_speak_request()
+        self.bounding_box()
+
+    '''
+    This function shows the user that detection was done. The detected label is displayed.
+    @author: Bastian Pechler
+    '''
+    def handle_detection_finished(self):
+        self.frontend_model.input_label = self.frontend_model.output_text
+        self.frontend_model.output_text = "The object is a " + self.frontend_model.output_text + \
+                                          '. Please validate this label now.'
+        self.frontend_model.do_not_let_user_validate_result = 'visible'
+        self.handle_speak_request()
+
+    '''
+    This method calls the explanation feature of our model in the background and returns the id of the job.
+    author: Bastian Pechler
+    '''
+    def handle_asked_for_explanation(self):
+        return self.submit_job('explain', self.explain_and_answer, dedup_key='explain')
+
+    def explain_and_answer(self):
+        if not self.explain_prediction():
+            return
+        self.frontend_model.output_text = 'Here are the recognized patterns'
+        self.handle_speak_request()
+
+    '''
+    This method checks if the avatar is activated. If so, it will read the content of 
+    the output textfield (located in the GUI). 
+    @author Bastian Pechler
+    '''
+    def handle_speak_request(self):
+        if self.backend_model.avatar_active:
+            self.speak_avatar_dialect(self.frontend_model.output_text)
+
+    '''
+    This method is called if the user specified the prediction as wrong. In this case, the correct label has to 
+    be specified, so that the model can retrain or add another label to the label list. 
+    @author: Bastian Pechler
+    '''
+    def handle_label_to_be_specified(self):
+        self.frontend_model.output_text = 'Please specify which label could be used for the shown object!'
+        self.handle_speak_request()
+
+    '''
+    This method is called if the user wished the classification of a detection of an (uploaded or recorded) image.
+    @author: Bastian Pechler
+    '''
+    def detect(self):
+        if len(self.frontend_model.image_bytes) == 0:
+            self.frontend_model.output_text = 'Please provide me an input picture first.'
+            self.handle_speak_request()
+        elif self.check_ready('companion_model') and self.check_model_free():
+            try:
+                # the same image is only predicted once per model version
+                label_index = self.prediction_cache.predict(self.frontend_model.image_bytes, self.predict_input_image)
+            finally:
+                self.model_lock.release()
+            if label_index is None:
+                self.frontend_model.output_text = 'I can not read this picture, please provide another one.'
+                self.handle_speak_request()
+                return
+            self.backend_model.current_label_index = label_index
+            key = [*self.backend_model.label_list.keys()][self.backend_model.current_label_index]
+            self.backend_model.list_entry = 0
+            self.frontend_model.output_text = self.backend_model.label_list[key][self.backend_model.list_entry]
+            self.frontend_model.do_not_let_user_validate_result = 'visible'
+            self.handle_detection_finished()
+
+    '''
+    This method is there that all classification labels for one class of objects can be viewed. 
+    After all those synonyms are shown once, it will display that all labels have been shown.
+    @author: Bastian Pechler
+    '''
+    def show_synonym(self):
+        if self.frontend_model.do_not_let_user_validate_result == 'hidden':
+            self.frontend_model.output_text = 'Please let me classify the image first.'
+
+        elif self.backend_model.current_label_index is not None:
+            key = [*self.backend_model.label_list.keys()][self.backend_model.current_label_index]
+            if len(self.backend_model.label_list[key]) - 1 > self.backend_model.list_entry:
+                self.backend_model.list_entry += 1
+                self.frontend_model.output_text = 'A known synonym is :' + self.backend_model.label_list[key][
+                    self.backend_model.list_entry]
+            else:
+                self.backend_model.list_entry = 0
+                self.frontend_model.output_text = 'No more synonyms for the current label are known.'
+
+        self.handle_speak_request()
+
+    '''
+    This function checks if entered label is new to the companion model (not yet in label list)
+    In this case, additional training data is generated by downloading images.
+    If the label is already present, but the model predicted wrong it is just retrained.
+    This runs in the background, the id of the job is returned.
+    @author: Bastian Pechler
+    '''
+    def handle_user_labelling(self):
+        entered_label = self.frontend_model.input_label.lower()
+        return self.submit_job('user_labelling', self.learn_user_label, entered_label,
+                               dedup_key=('user_labelling', entered_label))
+
+    def learn_user_label(self, entered_label):
+        if not self.wait_ready('companion_model'):
+            return
+        new_label_key = self.backend_model.check_user_label(entered_label)
+        if new_label_key is not None:
+            self.frontend_model.output_text = 'Downloading and retraining to make this object ' \
+                                              'detectable in the future'
+            if self.backend_model.avatar_active:
+                self.handle_speak_request()
+            with ProgressReporter(self.frontend_model, "Downloading: "):
+                self.backend_model.generate_data_for_new_label(self.frontend_model.image_bytes, entered_label,
+                                                               new_label_key, self.frontend_model.model_chrome_version,
+                                                               self.frontend_model.model_firefox_version)
+                with self.model_lock:
+                    self.companion_model.add_output_for_classifier(len(self.backend_model.label_list))
+                    self.prediction_cache.invalidate()
+                self.backend_model.output_classifiers = len(self.backend_model.label_list)
+                DataParser.save_current_state(self.backend_model.amount_downloaded_images_per_class,
+                                              self.backend_model.model_already_trained,
+                                              self.backend_model.label_list_modified,
+                                              self.backend_model.output_classifiers)
+        if self.job_executor.cancel_requested():
+            return
+        self.frontend_model.output_text = 'The training process will start now!'
+        if self.backend_model.avatar_active:
+            self.handle_speak_request()
+        self.retrain_model()
+        self.frontend_model.output_text = 'Training is done!'
+        if self.backend_model.avatar_active:
+            self.handle_speak_request()
+
+    '''
+    This function handles a retrain request by the user
+    @author: Bastian Pechler
+    '''
+    def handle_retrain(self):
+        return self.submit_job('retrain', self.retrain_model, dedup_key='retrain',
+                               accepted_text='Retraining, this may take a while.')
+
+    '''
+    This function handles a retrain and download request by the user
+    @author: Bastian Pechler
+    '''
+    def handle_download_and_retrain(self):
+        return self.submit_job('download_and_retrain', self.download_and_retrain, dedup_key='download_and_retrain',
+                               accepted_text='Downloading and retraining, this can take a while')
+
+    '''
+    This function is called when a user classifies an image as correct. He/ She is thanked for the feedback
+    @author: Bastian Pechler
+    '''
+    def handle_correct_prediction(self):
+        self.frontend_model.output_text = 'Thank you for the feedback'
+        self.handle_speak_request()
+
+    '''
+    This function delegates a retrain request to the companion model.
+    The new images are packed into the shards, which are read by the input pipeline, UI Elements are managed and the
+    new state is persisted (model trained = true)
+    @author: Bastian Pechler
+    '''
+    def retrain_model(self):
+        if not self.wait_ready('companion_model'):
+            return
+        with ProgressReporter(self.frontend_model, "Training: ") as progress:
+            self.frontend_model.do_not_let_user_validate_result = 'hidden'
+            self.frontend_model.do_not_let_user_enter_label = 'hidden'
+            input_pipeline = self.make_input_pipeline(progress)
+            if input_pipeline is None:
+                self.frontend_model.output_text = 'I have no images to learn from, please download some first.'
+                self.handle_speak_request()
+                return
+            try:
+                with self.model_lock:
+                    self.companion_model.set_generator(input_pipeline.make_generator(), input_pipeline.list_key_to_int)
+
+                    self.companion_model.improvement_threshold = \
+                        self.frontend_model.model_accuracy_improvement_threshold
+                    self.companion_model.train_model(self.frontend_model.model_learning_rate,
+                                                     self.frontend_model.model_accuracy_improvement_threshold,
+                                                     self.frontend_model.number_training_epochs)
+                    self.prediction_cache.invalidate()
+            finally:
+                input_pipeline.close()
+                # e.g. the part of the step time spent waiting for input, see InputPipeline.get_stats
+                self.input_pipeline_stats = input_pipeline.get_stats()
+            self.backend_model.model_already_trained = True
+            DataParser.save_current_state(self.backend_model.amount_downloaded_images_per_class,
+                                          self.backend_model.model_already_trained,
+                                          self.backend_model.label_list_modified,
+                                          self.backend_model.output_classifiers)
+            self.frontend_model.output_text = "Done training"
+
+    '''
+    This function packs the new images of the labels (e.g. of a download) and returns the input pipeline reading the
+    shards. The label mapping, the preprocessing of a batch and the augmentation are the ones of the companion model
+    (see model_input), the augmentation runs in the worker processes of the pipeline. Returns None if there are no
+    images of the labels.
+    @author: Bastian Pechler
+    '''
+    def make_input_pipeline(self, progress):
+        label_keys = list(self.backend_model.label_list)
+        self.shard_packer.pack(label_keys)
+        # the chunk size is the size of the batches, at most a few batches are prepared in advance
+        augment = make_augmentation() if self.frontend_model.image_augmentation_active else None
+        input_pipeline = InputPipeline(self.shard_packer.shard_folder, self.frontend_model.model_chunk_size,
+                                       get_label_mapping(label_keys), preprocess=preprocess_images, augment=augment,
+                                       amount_epochs=self.frontend_model.number_training_epochs,
+                                       progress_callback=progress.update)
+        if len(input_pipeline) == 0:
+            return None
+        # every batch taken by the training is reported
+        progress.update(0, input_pipeline.get_total_batches())
+        return input_pipeline
+
+    '''
+    This function resets the model to the initial state. Waiting jobs are cancelled, the reset waits for the running
+    job in the job queue.
+    @author: Bastian Pechler
+    '''
+    def reset(self):
+        self.frontend_model.output_text = 'The prediction model will be reset to the basic state.'
+        self.handle_speak_request()
+        self.job_executor.cancel_all()
+        return self.submit_job('reset', self.reset_models, dedup_key='reset')
+
+    def reset_models(self):
+        if not self.wait_ready('companion_model'):
+            return
+        with self.model_lock:
+            self.companion_model.reset(self.frontend_model.model_learning_rate)
+            self.prediction_cache.invalidate()
+        self.backend_model.reset()
+        # the labels and their images are reset, the shards are packed again by the next training
+        self.shard_packer.clear()
+
+    '''
+    This function delegates a download and retrain request. The amount of images downloaded will be set to the amount
+    specified by the user in the frontend. If He/ she specifies more images than before, download is triggered. Else 
+    just the state saved in backend is updated.
+    Afterwards a retrain is triggered.
+    @author: Bastian Pechler
+    '''
+    def download_and_retrain(self):
+        # the backend model is replaced if the companion model had to be reset while loading
+        if not self.wait_ready('companion_model'):
+            return
+        with ProgressReporter(self.frontend_model, "Downloading: "):
+            self.backend_model.download_images(self.frontend_model.model_chrome_version,
+                                               self.frontend_model.model_firefox_version,
+                                               amount=self.frontend_model.number_download_images
+                                               )
+            self.backend_model.download_images = self.frontend_model.number_download_images
+            self.backend_model.save_state()
+
+        if self.job_executor.cancel_requested():
+            return
+        self.retrain_model()
+
+    '''
+    This function checks if the given startup phases are ready. If not, the user is told that Fritzi is still warming
+    up (or that the feature could not be started, if a phase failed) and False is returned.
+    @author: Bastian Pechler
+    '''
+    def check_ready(self, *phases):
+        if self.startup.is_ready(*phases):
+            return True
+        if self.startup.get_failed(*phases):
+            self.tell_start_failed(phases)
+        else:
+            self.frontend_model.output_text = 'I am still warming up, please try again in a moment.'
+            self.handle_speak_request()
+        return False
+
+    '''
+    This function waits until the given startup phases are done, the jobs use it. If a phase failed, the user is told
+    so and False is returned.
+    @author: Bastian Pechler
+    '''
+    def wait_ready(self, *phases):
+        if self.startup.wait(*phases):
+            return True
+        self.tell_start_failed(phases)
+        return False
+
+    def tell_start_failed(self, phases):
+        self.frontend_model.output_text = 'This feature could not be started (%s failed), please restart me.' % \
+                                          ', '.join(self.startup.get_failed(*phases))
+        self.handle_speak_request()
+
+    '''
+    This function takes the lock of the companion model without waiting. If the model is trained right now, the user
+    is told so and False is returned, otherwise the caller has to release the lock.
+    @author: Bastian Pechler
+    '''
+    def check_model_free(self):
+        if self.model_lock.acquire(blocking=False):
+            return True
+        self.frontend_model.output_text = 'I am learning right now, please try again when the training is done.'
+        self.handle_speak_request()
+        return False
+
+    '''
+    This function submits a job to the job executor and returns its id. accepted_text is told the user if the job was
+    accepted. If too many jobs are waiting, the user is told to try again later and None is returned.
+    @author: Bastian Pechler
+    '''
+    def submit_job(self, name, function, *args, dedup_key=None, accepted_text=None):
+        job_id = self.job_executor.submit(name, function, *args, dedup_key=dedup_key)
+        if job_id is None:
+            self.frontend_model.output_text = 'I have too many tasks waiting, please try again later.'
+        elif accepted_text is not None:
+            self.frontend_model.output_text = accepted_text
+        else:
+            return job_id
+        self.handle_speak_request()
+        return job_id
+
+    '''
+    This function returns the status of a job or of all jobs (id, name, status, times and error), so the frontend
+    can show it
+    @author: Bastian Pechler
+    '''
+    def get_job_status(self, job_id=None):
+        return self.job_executor.get_status(job_id)
+
+    '''
+    This function cancels a job, a running job stops at its next check
+    @author: Bastian Pechler
+    '''
+    def cancel_job(self, job_id):
+        return self.job_executor.cancel(job_id)
+
+    '''
+    This function connects the frontend with the webcam processor to detect the objects on the webcam feed and 
+    implement the fingerpointing functionality. The specified object is passed to the frontend and displayed there.
+    The image stays in memory, it is only encoded once for the frontend.
+    @author: Marcel Achner
+    '''
+    def bounding_box(self):
+        image = self.webcam_processor.detect_objects()
+        # if no image is returned the webcam was manually closed and nothing should happen with the displayed img
+        if image is None:
+            return
+        success, encoded_image = cv2.imencode('.png', image)
+        if not success:
+            return
+        self.frontend_model.image_bytes = encoded_image.tobytes()
+        self.input_image_bytes = self.frontend_model.image_bytes
+        self.input_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        self.webcam_image_bytes = self.frontend_model.image_bytes
+        self.webcam_image_written = False
+        self.backend_model.image_to_be_verified = True
+
+    '''
+    This function predicts the label index of the input image with the companion model, which reads the image from
+    its path. The image is not decoded here: the webcam selection is known to be readable, an uploaded image is only
+    read by the model. If the model can not read the upload, None is returned.
+    @author: Bastian Pechler
+    '''
+    def predict_input_image(self):
+        image_path = self.get_input_image_path()
+        if image_path == self.webcam_image_path:
+            return self.companion_model.predict(image_path)
+        try:
+            return self.companion_model.predict(image_path)
+        except Exception as error:
+            print('The image %s could not be predicted: %r' % (image_path, error))
+            return None
+
+    '''
+    This function returns the current input image (webcam screenshot or uploaded image) as RGB array. The bytes shown
+    in the frontend are only decoded if they changed since the last call. None is returned if they can not be decoded.
+    @author: Marcel Achner
+    '''
+    def get_input_image(self):
+        image_bytes = self.frontend_model.image_bytes
+        if image_bytes != self.input_image_bytes:
+            image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+            self.input_image = None if image is None else cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            self.input_image_bytes = image_bytes
+        return self.input_image
+
+    '''
+    This function returns the path of the current input image, the companion model reads its input from this path.
+    An uploaded image already has its path in the frontend model. The webcam selection is kept in memory and written
+    to webcam_image_path on the first call after the selection.
+    @author: Marcel Achner
+    '''
+    def get_input_image_path(self):
+        if self.webcam_image_bytes is None or self.frontend_model.image_bytes != self.webcam_image_bytes:
+            return self.frontend_model.image_path
+        if not self.webcam_image_written:
+            os.makedirs(os.path.dirname(self.webcam_image_path), exist_ok=True)
+            with open(self.webcam_image_path, 'wb') as file:
+                file.write(self.webcam_image_bytes)
+            self.webcam_image_written = True
+        self.frontend_model.image_path = self.webcam_image_path
+        return self.webcam_image_path
+
+    '''
+    This function shows why the generated label was chosen by Fritzi with the explanation engine: a preview with few
+    samples is shown right away, the refinement with all samples runs as another job in the background.
+    Returns False if the input image can not be read or the companion model could not be started.
+    @author: Marcel Achner
+    '''
+    def explain_prediction(self):
+        with ProgressReporter(self.frontend_model, "Explaining: ") as progress:
+            if not self.wait_ready('companion_model', 'explanation'):
+                return False
+            image_bytes = self.frontend_model.image_bytes
+            if self.get_input_image() is None:
+                self.frontend_model.output_text = 'I can not read this picture, please provide another one.'
+                self.handle_speak_request()
+                return False
+
+            explanation_engine = self.get_explanation_engine()
+            image = self.webcam_processor.padding_and_resize(self.get_input_image())
+            overlays = explanation_engine.explain(image_bytes, image, explanation_engine.preview_samples,
+                                                  progress_callback=progress.update)
+            self.show_explanation(image_bytes, overlays)
+
+        self.job_executor.submit('refine_explanation', self.refine_explanation, image_bytes, image,
+                                 dedup_key=('refine_explanation', explanation_engine.make_key(image_bytes)))
+        return True
+
+    '''
+    This function refines the explanation of the image with all samples, the progress is shown while it runs. A
+    cancelled refinement keeps its samples, so the next explanation of the image continues from there.
+    @author: Marcel Achner
+    '''
+    def refine_explanation(self, image_bytes, image):
+        explanation_engine = self.get_explanation_engine()
+        with ProgressReporter(self.frontend_model, "Refining explanation: ") as progress:
+            overlays = explanation_engine.explain(image_bytes, image, explanation_engine.full_samples,
+                                                  progress_callback=progress.update,
+                                                  stop_requested=self.job_executor.cancel_requested)
+        self.show_explanation(image_bytes, overlays)
+
+    '''
+    This function returns the explanation engine, it is created on the first call because lime and scikit-learn take
+    long to import. The samples are classified by predict_samples.
+    @author: Marcel Achner
+    '''
+    def get_explanation_engine(self):
+        if self.explanation_engine is None:
+            from explanation_engine import ExplanationEngine
+            self.explanation_engine = ExplanationEngine(self.predict_samples, self.prediction_cache)
+        return self.explanation_engine
+
+    '''
+    This function classifies the samples of an explanation (RGB, the input size of the companion model) with the
+    predict method of the companion model and returns one row per sample, 1 for the predicted label and 0 for the
+    others. predict reads its input from a file, so every sample is written to explanation_sample_path. The model
+    lock is held for each sample only, so a detection does not wait for a whole batch.
+    @author: Marcel Achner
+    '''
+    def predict_samples(self, images):
+        os.makedirs(os.path.dirname(self.explanation_sample_path), exist_ok=True)
+        predictions = np.zeros((len(images), len(self.backend_model.label_list)), dtype=np.float32)
+        for sample_index, image in enumerate(images):
+            with self.model_lock:
+                cv2.imwrite(self.explanation_sample_path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+                predictions[sample_index, self.companion_model.predict(self.explanation_sample_path)] = 1
+        return predictions
+
+    '''
+    This function shows the overlays (PNG bytes) of an explanation, if the explained image is still the input image
+    @author: Marcel Achner
+    '''
+    def show_explanation(self, image_bytes, overlays):
+        if overlays is None or image_bytes != self.frontend_model.image_bytes:
+            return
+        self.frontend_model.img_xai_one_bytes = overlays[0]
+        self.frontend_model.img_xai_two_bytes = overlays[1]
+
+    '''
+    This function passes the desired dialect of the avatar from the frontend to the backend and speaks the specified 
+    message
+    @author: Marcel Achner
+    '''
+    def speak_avatar_dialect(self, message):
+        self.avatar_manager.set_dialect(self.frontend_model.avatar_dialect)
+        self.avatar_manager.avatar_speak(self.backend_model.node_process, message)
+
+
+
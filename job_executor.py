@@ -0,0 +1,194 @@
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, CancelledError
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+
+class Job:
+
+    '''
+    This class holds the state of one job of the job executor
+    @author: Bastian Pechler
+    '''
+    def __init__(self, job_id, name, dedup_key):
+        self.job_id = job_id
+        self.name = name
+        self.dedup_key = dedup_key
+        self.status = JOB_PENDING
+        self.cancel_requested = False
+        self.error = None
+        self.result = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    def get_status(self):
+        return {'job_id': self.job_id, 'name': self.name, 'status': self.status,
+                'cancel_requested': self.cancel_requested, 'error': self.error, 'submitted_at': self.submitted_at,
+                'started_at': self.started_at, 'finished_at': self.finished_at}
+
+
+class JobExecutor:
+
+    '''
+    This class runs long tasks (retrain, download, explanation) in a bounded pool of background threads, so the
+    frontend and the voice recognizer are not blocked. Every job gets an id to poll its status or cancel it. A job
+    with the same dedup_key as a job that is still pending is not added again, e.g. two retrain requests in a row. At
+    most max_pending jobs wait at the same time. Pending jobs are cancelled right away, running jobs can check
+    cancel_requested() and stop early. The worker threads are daemon threads, so a running job (e.g. a training) does
+    not keep the application from exiting.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, max_workers=1, max_pending=8, max_finished=50):
+        self.job_queue = queue.Queue()
+        # one worker by default, the jobs use the same model and must not run at the same time
+        self.workers = [threading.Thread(target=self.work_on_jobs, name='job_%d' % i, daemon=True)
+                        for i in range(max_workers)]
+        for worker in self.workers:
+            worker.start()
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.job_ids = itertools.count(1)
+        self.local = threading.local()
+
+    '''
+    This function adds a job which calls function(*args, **kwargs) and returns its id. If a job with the same
+    dedup_key is pending, its id is returned instead. If too many jobs are pending, None is returned.
+    @author: Bastian Pechler
+    '''
+    def submit(self, name, function, *args, dedup_key=None, **kwargs):
+        with self.lock:
+            pending_jobs = [job for job in self.jobs.values() if job.status == JOB_PENDING]
+            for job in pending_jobs:
+                if dedup_key is not None and job.dedup_key == dedup_key:
+                    return job.job_id
+            if len(pending_jobs) >= self.max_pending:
+                return None
+            job = Job(next(self.job_ids), name, dedup_key)
+            job.future = Future()
+            self.jobs[job.job_id] = job
+            self.job_queue.put((job, function, args, kwargs))
+            self.remove_finished_jobs()
+            return job.job_id
+
+    '''
+    This function is run by every worker thread: it runs the jobs of the queue until it gets None
+    @author: Bastian Pechler
+    '''
+    def work_on_jobs(self):
+        while True:
+            item = self.job_queue.get()
+            if item is None:
+                return
+            job, function, args, kwargs = item
+            # a cancelled job is skipped
+            if job.future.set_running_or_notify_cancel():
+                job.future.set_result(self.run_job(job, function, args, kwargs))
+
+    def run_job(self, job, function, args, kwargs):
+        with self.lock:
+            if job.status != JOB_PENDING:
+                return None
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+        self.local.job = job
+        try:
+            job.result = function(*args, **kwargs)
+            status = JOB_CANCELLED if job.cancel_requested else JOB_DONE
+        except Exception as e:
+            job.error = str(e)
+            status = JOB_FAILED
+        finally:
+            self.local.job = None
+        with self.lock:
+            job.status = status
+            job.finished_at = time.time()
+        return job.result
+
+    '''
+    This function cancels a job. It returns False if the job is unknown or already finished.
+    @author: Bastian Pechler
+    '''
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status not in (JOB_PENDING, JOB_RUNNING):
+                return False
+            job.cancel_requested = True
+            if job.status == JOB_PENDING:
+                job.future.cancel()
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+            return True
+
+    '''
+    This function cancels all pending and running jobs, e.g. before the model is reset
+    @author: Bastian Pechler
+    '''
+    def cancel_all(self):
+        with self.lock:
+            job_ids = [job.job_id for job in self.jobs.values() if job.status in (JOB_PENDING, JOB_RUNNING)]
+        for job_id in job_ids:
+            self.cancel(job_id)
+
+    '''
+    This function is called by a running job to check if it should stop
+    @author: Bastian Pechler
+    '''
+    def cancel_requested(self):
+        job = getattr(self.local, 'job', None)
+        return job is not None and job.cancel_requested
+
+    '''
+    This function returns the status of a job (or of all known jobs if job_id is None) for the frontend
+    @author: Bastian Pechler
+    '''
+    def get_status(self, job_id=None):
+        with self.lock:
+            if job_id is None:
+                return [job.get_status() for job in self.jobs.values()]
+            job = self.jobs.get(job_id)
+            return job.get_status() if job is not None else None
+
+    '''
+    This function waits until a job is finished and returns its result
+    @author: Bastian Pechler
+    '''
+    def wait(self, job_id, timeout=None):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        try:
+            return job.future.result(timeout)
+        except CancelledError:
+            return None
+
+    def remove_finished_jobs(self):
+        finished_jobs = [job_id for job_id, job in self.jobs.items()
+                         if job.status in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)]
+        for job_id in finished_jobs[:max(0, len(finished_jobs) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    '''
+    This function cancels all jobs and stops the worker threads, with wait after the running jobs are stopped
+    @author: Bastian Pechler
+    '''
+    def shutdown(self, wait=True):
+        self.cancel_all()
+        for _ in self.workers:
+            self.job_queue.put(None)
+        if wait:
+            for worker in self.workers:
+                worker.join()
@@ -1,69 +1,139 @@
-from companion_model import CompanionModel
-from interaction_controller import InteractionController, ProgressBarThread
-from backend_model import BackendModel
-from speech_to_text_controller import SpeechToTextController
-from avatar_manager import AvatarManager
-import threading
-
-
-class MasterController:
-
-    """
-    This constructor call is instantiating all the needed backend model and all the controllers needed to use
-    the functionality of this application.
-    Needed controllers: AvatarManager, InteractionController, SpeechToTextController
-    Needed models:  BackendModel
-                        -> for state maintenance (amount classifiers, amount train data downloaded,
-                                                  is model trained, have labels been modified, current label list)
-
-                    CompanionModel
-                        -> to load weights of current keras model, reset, (re)train, predict
-    If weights will not fit the current label list (e.g. label was added, but interruption in training),
-    the companion model will be reset to make it work again.
-    @author: Bastian Pechler
-    """
-    def __init__(self, frontend_model, node_process):
-        avatar_manager = AvatarManager()
-        frontend_model = frontend_model
-
-        frontend_model.loading_active = True
-        frontend_model.loading_progress_description = "Downloading: "
-        progress_bar_thread = ProgressBarThread(frontend_model=frontend_model)
-        thread = threading.Thread(target=progress_bar_thread.start)
-        thread.start()
-
-        # This here is needed, if images are downloaded in Initialization of backend model!
-        backend_model = BackendModel(frontend_model.number_download_images,
-                                     frontend_model.model_chrome_version, frontend_model.model_firefox_version,
-                                     node_process)
-        progress_bar_thread.stop()
-        thread.join()
-
-        frontend_model.loading_active = True
-        frontend_model.loading_progress_description = "Training: "
-        progress_bar_thread = ProgressBarThread(frontend_model=frontend_model)
-        thread = threading.Thread(target=progress_bar_thread.start)
-        thread.start()
-        try:
-            companion_model = CompanionModel(amount_outputs=backend_model.output_classifiers,
-                                             already_trained=backend_model.model_already_trained,
-                                             learning_rate=frontend_model.model_learning_rate)
-        except :
-            print("Oops, it seems like the saved weights did not match your specified labels. "
-                  "To fix this, your labels and model will be reset.")
-            backend_model.reset()
-            backend_model = BackendModel(frontend_model.number_download_images,
-                                         frontend_model.model_chrome_version, frontend_model.model_firefox_version,
-                                         node_process=node_process)
-            companion_model = CompanionModel(amount_outputs=backend_model.output_classifiers,
-                                             already_trained=backend_model.model_already_trained,
-                                             learning_rate=frontend_model.model_learning_rate,
-                                             model_path='model_backup.h5')
-
-        progress_bar_thread.stop()
-        thread.join()
-        self.speech_to_text_controller = SpeechToTextController(frontend_model, backend_model, companion_model,
-                                                                avatar_manager)
-        self.button_interaction_controller = InteractionController(frontend_model, backend_model, companion_model,
-                                                                   avatar_manager)
-        return
+import threading
+
+from interaction_controller import InteractionController
+from backend_model import BackendModel
+from speech_to_text_controller import SpeechToTextController
+from avatar_manager import AvatarManager
+from job_executor import JobExecutor
+from prediction_cache import PredictionCache
+from progress_reporter import ProgressReporter
+from startup import Startup
+from webcam_processor import WebcamProcessor
+from model.boxTrackingImagenet.detector1K.detector_registry import DetectorRegistry
+
+
+class MasterController:
+
+    """
+    This constructor call is instantiating all the needed backend model and all the controllers needed to use
+    the functionality of this application.
+    Needed controllers: AvatarManager, InteractionController, SpeechToTextController
+    Needed models:  BackendModel
+                        -> for state maintenance (amount classifiers, amount train data downloaded,
+                                                  is model trained, have labels been modified, current label list)
+
+                    CompanionModel
+                        -> to load weights of current keras model, reset, (re)train, predict
+    If weights will not fit the current label list (e.g. label was added, but interruption in training),
+    the companion model will be reset to make it work again.
+    The start is staged: TensorFlow, onnxruntime, mediapipe and lime are imported and warmed up in background
+    threads, while the backend model and the controllers are created. The controllers are usable right away, the
+    features needing a part which is still warming up say so until it is ready.
+    webcam_settings replace single settings of the webcam session (see InteractionController.WEBCAM_SETTINGS).
+    @author: Bastian Pechler
+    """
+    def __init__(self, frontend_model, node_process, webcam_settings=None):
+        self.startup = Startup()
+        self.frontend_model = frontend_model
+        self.node_process = node_process
+
+        # these do not depend on the state of the backend model, so they start right away
+        self.startup.warm_up('model_import', self.startup.timed_import, 'companion_model')
+        self.startup.warm_up('object_detector', self.load_object_detector)
+        self.startup.warm_up('hand_tracking', self.startup.timed_import, 'mediapipe')
+        self.startup.warm_up('explanation', self.startup.timed_import, 'explanation_engine')
+
+        avatar_manager = self.startup.run_phase('avatar_manager', AvatarManager)
+
+        # This here is needed, if images are downloaded in Initialization of backend model!
+        with ProgressReporter(frontend_model, "Downloading: "):
+            self.backend_model = self.startup.run_phase('backend_model', self.create_backend_model)
+
+        # one lock of the companion model, so the buttons do not predict while a retrain started by voice runs
+        self.model_lock = threading.RLock()
+        # started before the controllers, so jobs submitted by them (e.g. the first training) wait for the model
+        self.controllers_created = threading.Event()
+        self.startup.warm_up('companion_model', self.load_companion_model, on_ready=self.set_companion_model)
+
+        # both controllers share one job queue, so voice and button requests do not train the model at the same time
+        self.job_executor = JobExecutor()
+        # one prediction cache, so a retrain started by voice also invalidates the predictions of the buttons
+        self.prediction_cache = PredictionCache()
+        # the companion model is set when it is loaded
+        self.speech_to_text_controller = self.startup.run_phase(
+            'speech_controller', SpeechToTextController, frontend_model, self.backend_model, None, avatar_manager,
+            self.job_executor, self.prediction_cache, self.startup, self.model_lock, webcam_settings)
+        self.button_interaction_controller = self.startup.run_phase(
+            'button_controller', InteractionController, frontend_model, self.backend_model, None, avatar_manager,
+            self.job_executor, self.prediction_cache, self.startup, self.model_lock, webcam_settings)
+        self.controllers_created.set()
+        self.startup.all_phases_started()
+        return
+
+    def create_backend_model(self):
+        return BackendModel(self.frontend_model.number_download_images, self.frontend_model.model_chrome_version,
+                            self.frontend_model.model_firefox_version, self.node_process)
+
+    '''
+    This function loads the companion model (which imports TensorFlow) in the warm up thread. If the saved weights do
+    not fit the labels, labels and model are reset (see reset_backend_model).
+    @author: Bastian Pechler
+    '''
+    def load_companion_model(self):
+        CompanionModel = self.startup.timed_import('companion_model').CompanionModel
+        with ProgressReporter(self.frontend_model, "Training: "):
+            try:
+                companion_model = CompanionModel(amount_outputs=self.backend_model.output_classifiers,
+                                                 already_trained=self.backend_model.model_already_trained,
+                                                 learning_rate=self.frontend_model.model_learning_rate)
+            except :
+                print("Oops, it seems like the saved weights did not match your specified labels. "
+                      "To fix this, your labels and model will be reset.")
+                self.reset_backend_model()
+                companion_model = CompanionModel(amount_outputs=self.backend_model.output_classifiers,
+                                                 already_trained=self.backend_model.model_already_trained,
+                                                 learning_rate=self.frontend_model.model_learning_rate,
+                                                 model_path='model_backup.h5')
+        return companion_model
+
+    '''
+    This function resets the labels and replaces the backend model. The controllers get the new backend model right
+    away, while holding the lock of the companion model and before the companion_model phase is ready. The features
+    using the labels or the model wait for this phase, so none of them uses the old backend model.
+    @author: Bastian Pechler
+    '''
+    def reset_backend_model(self):
+        with self.model_lock:
+            self.backend_model.reset()
+            self.backend_model = BackendModel(self.frontend_model.number_download_images,
+                                              self.frontend_model.model_chrome_version,
+                                              self.frontend_model.model_firefox_version,
+                                              node_process=self.node_process)
+            self.controllers_created.wait()
+            for controller in [self.speech_to_text_controller, self.button_interaction_controller]:
+                controller.backend_model = self.backend_model
+
+    '''
+    This function passes the loaded companion model to the controllers
+    @author: Bastian Pechler
+    '''
+    def set_companion_model(self, companion_model):
+        self.controllers_created.wait()
+        for controller in [self.speech_to_text_controller, self.button_interaction_controller]:
+            controller.companion_model = companion_model
+
+    '''
+    This function builds and warms up the onnxruntime session of the object detector, the webcam processors get it
+    from the detector registry
+    @author: Bastian Pechler
+    '''
+    def load_object_detector(self):
+        self.startup.timed_import('onnxruntime')
+        return DetectorRegistry.get_detector(WebcamProcessor.DETECTION_MODEL_PATH, WebcamProcessor.DETECTION_THRESHOLD)
+
+    '''
+    This function returns the status of the startup phases and the import times
+    @author: Bastian Pechler
+    '''
+    def get_startup_report(self):
+        return self.startup.get_report()
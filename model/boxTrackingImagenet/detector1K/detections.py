@@ -0,0 +1,76 @@
+import numpy as np
+
+
+class Detections:
+    '''
+    This class stores the detections of one image column wise: one array of bounding boxes (x1, y1, x2, y2),
+    one array of detection scores and one array of class ids. So thresholding, scaling and filtering can be done
+    for all detections at once instead of looping over single dicts. If the boxes are tracked over several frames,
+    the stable ids of the tracks are stored as well.
+    @author: Marcel Achner
+    '''
+    def __init__(self, boxes, scores, class_ids, track_ids=None):
+        self.boxes = boxes
+        self.scores = scores
+        self.class_ids = class_ids
+        self.track_ids = track_ids
+
+    def __len__(self):
+        return len(self.boxes)
+
+    '''
+    This function creates an empty detection result
+    @author: Marcel Achner
+    '''
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), dtype=int), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=int))
+
+    '''
+    This function converts the raw outputs of the object localizer to detections. The model returns normalized boxes
+    in the order (y1, x1, y2, x2), they are thresholded with one mask and scaled to pixel coordinates (x1, y1, x2, y2)
+    of an image with the given size.
+    @author: Marcel Achner
+    '''
+    @classmethod
+    def from_model_outputs(cls, outputs, threshold, img_width, img_height):
+        num_objects = int(outputs[3][0])
+        boxes = np.reshape(outputs[0], (-1, 4))[:num_objects]
+        scores = np.reshape(outputs[2], -1)[:num_objects]
+
+        mask = scores >= threshold
+        scale = np.array([img_width, img_height, img_width, img_height], dtype=np.float32)
+        pixel_boxes = (boxes[mask][:, [1, 0, 3, 2]] * scale).astype(int)
+        return cls(pixel_boxes, scores[mask], np.zeros(len(pixel_boxes), dtype=int))
+
+    '''
+    This function returns the detections selected by a boolean mask or an index array
+    @author: Marcel Achner
+    '''
+    def select(self, mask):
+        track_ids = None if self.track_ids is None else self.track_ids[mask]
+        return Detections(self.boxes[mask], self.scores[mask], self.class_ids[mask], track_ids)
+
+    '''
+    This function returns a copy of the detections with all box coordinates multiplied by the given factor
+    @author: Marcel Achner
+    '''
+    def scaled(self, factor):
+        return Detections(self.boxes * factor, self.scores, self.class_ids, self.track_ids)
+
+    '''
+    This function maps the boxes detected on a (downsized) image of size detected_width x detected_height back to an
+    image of size image_width x image_height and removes the boxes on the bottom edge of the window (the surrounding)
+    @author: Marcel Achner
+    '''
+    def fit_to_image(self, detected_width, detected_height, image_width, image_height, edge_margin=30):
+        scale = np.array([image_width / detected_width, image_height / detected_height] * 2)
+        detections = self.scaled(scale)
+        return detections.select(detections.boxes[:, 3] + edge_margin < image_height)
+
+    '''
+    This function is the adapter to the old list format of boxes used by the fingertip hit test
+    @author: Marcel Achner
+    '''
+    def to_boxes_list(self):
+        return list(self.boxes)
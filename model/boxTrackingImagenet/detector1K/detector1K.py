@@ -1,179 +1,225 @@
-import cv2
-import numpy as np
-import onnxruntime
-
-'''
-This class provides the functionality of the feature extraction model to detect and track objects and draw bounding
-boxes.
-@author: Marcel Achner
-'''
-
-
-class Detector1K:
-    '''
-    This method initializes the needed class parameters, the detection model, and the classification model
-    @author: Marcel Achner
-    '''
-    def __init__(self, detector_model_path, detector_threshold=0.2):
-
-        self.input_width = None
-        self.input_height = None
-        self.input_shape = None
-        self.input_name = None
-        self.session = None
-        self.output_names = None
-        self.img_channels = None
-        self.img_width = None
-        self.img_height = None
-        self.label_detections = None
-        self.threshold = detector_threshold
-
-        # Initialize detection model
-        self.initialize_model(detector_model_path)
-
-        # Set the crop offset
-        self.crop_offset = 0
-
-    '''
-    This method defines the call to detect objects in the given image
-    @author: Marcel Achner
-    '''
-    def __call__(self, image):
-
-        return self.detect_objects(image)
-
-    '''
-    This function is responsible for the initialisation of the model to detect objects
-    @author: Marcel Achner
-    '''
-    def initialize_model(self, model_path):
-
-        self.session = onnxruntime.InferenceSession(model_path)
-
-        # Get model info
-        self.get_model_input_details()
-        self.get_model_output_details()
-
-    '''
-    This function gets invoked by the __call__ method and it prepares the image as input and performs inference on it.
-    The result is used to find detections in the image which get pre-classified then. In the end the label of the 
-    detections are returned.
-    @author: Marcel Achner
-    '''
-    def detect_objects(self, image):
-
-        input_tensor = self.prepare_input(image)
-
-        # Perform inference on the image
-        outputs = self.inference(input_tensor)
-
-        # Process output data
-        detections = self.process_output(outputs)
-
-        # Set the label detections
-        self.label_detections = detections
-
-        return self.label_detections
-
-    '''
-    This function performs different modifications on the input image: resizing, changing BGR to RGB color
-    and transposing
-    @author: Marcel Achner
-    '''
-    def prepare_input(self, img):
-
-        self.img_height, self.img_width, self.img_channels = img.shape
-
-        # Transform the image for inference
-        img = cv2.resize(img, (self.input_width, self.input_height))
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-        img = img.transpose(2, 0, 1)
-        input_tensor = img[np.newaxis, :, :, :].astype(np.float32)
-
-        return input_tensor
-
-    '''
-    This method performs the inference on the image using the input name and the output names as parameter
-    @author: Marcel Achner
-    '''
-    def inference(self, input_tensor):
-
-        outputs = self.session.run(self.output_names, {self.input_name: input_tensor})
-        return outputs
-
-    '''
-    This method processes the output and calculates the bounding box coordinates if the confidence >= threshold.
-    Then it constructs a JSON-Object as return object with the bounding box coordinates and some more parameters.
-    @author: Marcel Achner
-    '''
-    def process_output(self, outputs):
-
-        # Get all output details
-        boxes = np.squeeze(outputs[0])
-        scores = np.squeeze(outputs[2])
-        num_objects = int(outputs[3][0])
-
-        results = []
-        for i in range(num_objects):
-            if scores[i] >= self.threshold:
-                y1 = (self.img_height * boxes[i][0]).astype(int)
-                y2 = (self.img_height * boxes[i][2]).astype(int)
-                x1 = (self.img_width * boxes[i][1]).astype(int)
-                x2 = (self.img_width * boxes[i][3]).astype(int)
-
-                result = {
-                    'bounding_box': np.array([x1, y1, x2, y2], dtype=int),
-                    'class_id': 0,
-                    'label': "",
-                    'detection_score': scores[i],
-                    'classification_score': 0,
-                }
-                results.append(result)
-        return results
-
-    '''
-    This function sets class parameter with information from the input of the model
-    @author: Marcel Achner
-    '''
-    def get_model_input_details(self):
-
-        self.input_name = self.session.get_inputs()[0].name
-        self.input_shape = self.session.get_inputs()[0].shape
-        self.input_height = self.input_shape[2]
-        self.input_width = self.input_shape[3]
-
-    '''
-    This function sets class parameter with information from the output of the model
-    @author: Marcel Achner
-    '''
-    def get_model_output_details(self):
-
-        model_outputs = self.session.get_outputs()
-        self.output_names = [model_outputs[i].name for i in range(len(model_outputs))]
-
-    '''
-    This method uses the detected objects in an image to draw the corresponding bounding boxes around them.
-    For a better performance only the objects of interest are detected when they are not detected on the 
-    very edge of the window. This won´t recognize human bodies or faces in the given image.
-    @author: Marcel Achner
-    '''
-    def draw_detections(self, image, scale_percent):
-        boxes_list = []
-
-        for idx, detection in enumerate(self.label_detections):
-
-            # calculate boxes for original image size and use original image size for next steps
-            # check if the object is from the surrounding and do not draw boxes then
-            box = detection['bounding_box']
-            if int(box[3]) + (30 * (scale_percent / 100)) >= image.shape[0] / (100 / scale_percent):
-                continue
-            # rescale the boxes back to the original size
-            box = np.multiply(box, (100 / scale_percent))
-            boxes_list.append(box)
-
-            color = (255, 0, 0)
-            text_thickness = int(min([self.img_height, self.img_width]) * 0.004)
-            cv2.rectangle(image, (int(box[0]), int(box[1])), (int(box[2]), int(box[3])), color, text_thickness)
-
-        return image, boxes_list
+import threading
+
+import cv2
+import numpy as np
+from model.boxTrackingImagenet.detector1K.detections import Detections
+
+'''
+This class provides the functionality of the feature extraction model to detect and track objects and draw bounding
+boxes.
+@author: Marcel Achner
+'''
+
+
+class Detector1K:
+    '''
+    This method initializes the needed class parameters, the detection model, and the classification model
+    @author: Marcel Achner
+    '''
+    def __init__(self, detector_model_path, detector_threshold=0.2, session_options=None):
+
+        self.input_width = None
+        self.input_height = None
+        self.input_shape = None
+        self.input_name = None
+        self.session = None
+        self.output_names = None
+        self.io_binding = None
+        self.resized_buffer = None
+        self.input_tensor = None
+        self.img_channels = None
+        self.img_width = None
+        self.img_height = None
+        self.label_detections = None
+        self.visible_detections = None
+        self.threshold = detector_threshold
+        # one detector is shared by all webcam processors (see DetectorRegistry), the lock protects the buffers and the
+        # detections of the last call until they are filtered
+        self.lock = threading.RLock()
+
+        # Initialize detection model
+        self.initialize_model(detector_model_path, session_options)
+
+        # Set the crop offset
+        self.crop_offset = 0
+
+    '''
+    This method defines the call to detect objects in the given image
+    @author: Marcel Achner
+    '''
+    def __call__(self, image):
+
+        return self.detect_objects(image)
+
+    '''
+    This function is responsible for the initialisation of the model to detect objects. The session options are given
+    as dict of onnxruntime.SessionOptions attributes (e.g. {'intra_op_num_threads': 2}). onnxruntime is imported
+    here and not with the module, so it is only loaded when the first detector is built.
+    @author: Marcel Achner
+    '''
+    def initialize_model(self, model_path, session_options=None):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        for option_name, option_value in (session_options or {}).items():
+            setattr(options, option_name, option_value)
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options)
+
+        # Get model info
+        self.get_model_input_details()
+        self.get_model_output_details()
+
+        # the preallocated input tensor is bound once, so onnxruntime reads it directly on every inference
+        self.io_binding = self.session.io_binding()
+        self.io_binding.bind_ortvalue_input(self.input_name,
+                                            onnxruntime.OrtValue.ortvalue_from_numpy(self.input_tensor))
+        for output_name in self.output_names:
+            self.io_binding.bind_output(output_name)
+
+    '''
+    This function runs one inference on an empty image, so that onnxruntime allocates its memory before the first
+    webcam frame arrives
+    @author: Marcel Achner
+    '''
+    def warm_up(self):
+
+        self.detect_objects(np.zeros((self.input_height, self.input_width, 3), dtype=np.uint8))
+        self.label_detections = None
+
+    '''
+    This function gets invoked by the __call__ method and it prepares the image as input and performs inference on it.
+    The result is used to find detections in the image which get pre-classified then. In the end the label of the 
+    detections are returned.
+    @author: Marcel Achner
+    '''
+    def detect_objects(self, image):
+
+        with self.lock:
+            input_tensor = self.prepare_input(image)
+
+            # Perform inference on the image
+            outputs = self.inference(input_tensor)
+
+            # Process output data
+            detections = self.process_output(outputs)
+
+            # Set the label detections
+            self.label_detections = detections
+
+            return self.label_detections
+
+    '''
+    This function detects the objects in the (downsized) image and returns them scaled to the size of the original
+    image (see filter_detections). Both steps hold the lock, so other callers of the shared detector can not replace
+    the detections in between.
+    @author: Marcel Achner
+    '''
+    def detect_and_filter(self, image, image_height, image_width):
+
+        with self.lock:
+            self.detect_objects(image)
+            return self.filter_detections(image_height, image_width)
+
+    '''
+    This function performs different modifications on the input image: resizing, changing BGR to RGB color
+    and transposing. Everything is written into the preallocated buffers, so no new arrays are created per frame.
+    @author: Marcel Achner
+    '''
+    def prepare_input(self, img):
+
+        self.img_height, self.img_width, self.img_channels = img.shape
+
+        # Transform the image for inference
+        cv2.resize(img, (self.input_width, self.input_height), dst=self.resized_buffer)
+
+        # swapping BGR to RGB and transposing are only views, the float conversion is written into the input tensor
+        np.copyto(self.input_tensor[0], self.resized_buffer[:, :, ::-1].transpose(2, 0, 1), casting='unsafe')
+
+        return self.input_tensor
+
+    '''
+    This method performs the inference on the image using the input name and the output names as parameter. The
+    preallocated input tensor is already bound to the session, other tensors are passed as before.
+    @author: Marcel Achner
+    '''
+    def inference(self, input_tensor):
+
+        if input_tensor is not self.input_tensor:
+            return self.session.run(self.output_names, {self.input_name: input_tensor})
+
+        self.session.run_with_iobinding(self.io_binding)
+        outputs = self.io_binding.copy_outputs_to_cpu()
+        return outputs
+
+    '''
+    This method processes the output and calculates the bounding box coordinates if the confidence >= threshold.
+    The result is a column wise Detections object (boxes, scores and class ids as arrays), so thresholding and
+    scaling are done for all objects at once.
+    @author: Marcel Achner
+    '''
+    def process_output(self, outputs):
+
+        return Detections.from_model_outputs(outputs, self.threshold, self.img_width, self.img_height)
+
+    '''
+    This function sets class parameter with information from the input of the model
+    @author: Marcel Achner
+    '''
+    def get_model_input_details(self):
+
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_shape = self.session.get_inputs()[0].shape
+        self.input_height = self.input_shape[2]
+        self.input_width = self.input_shape[3]
+
+        # buffers reused for every frame
+        self.resized_buffer = np.empty((self.input_height, self.input_width, 3), dtype=np.uint8)
+        self.input_tensor = np.empty((1, 3, self.input_height, self.input_width), dtype=np.float32)
+
+    '''
+    This function sets class parameter with information from the output of the model
+    @author: Marcel Achner
+    '''
+    def get_model_output_details(self):
+
+        model_outputs = self.session.get_outputs()
+        self.output_names = [model_outputs[i].name for i in range(len(model_outputs))]
+
+    '''
+    This method rescales the boxes from the (downsized) image the detection ran on back to the size of the original
+    image and removes the detections on the very edge of the window. The scale factors are taken from the image sizes,
+    so the boxes are mapped correctly for every downsize factor. Both steps are done for all detections at once.
+    @author: Marcel Achner
+    '''
+    def filter_detections(self, image_height, image_width):
+
+        # rescale the boxes back to the original size, objects from the surrounding (bottom edge of the window) are
+        # not kept
+        return self.label_detections.fit_to_image(self.img_width, self.img_height, image_width, image_height)
+
+    '''
+    This method uses the detected objects in an image to draw the corresponding bounding boxes around them.
+    For a better performance only the objects of interest are detected when they are not detected on the 
+    very edge of the window. This won´t recognize human bodies or faces in the given image.
+    The list of boxes is returned in the old format for the fingertip hit test.
+    @author: Marcel Achner
+    '''
+    def draw_detections(self, image):
+        with self.lock:
+            visible_detections = self.filter_detections(image.shape[0], image.shape[1])
+            self.visible_detections = visible_detections
+        image = self.draw_boxes(image, visible_detections)
+
+        return image, visible_detections.to_boxes_list()
+
+    '''
+    This method draws the boxes of the given detections (in the size of the image) on the image
+    @author: Marcel Achner
+    '''
+    def draw_boxes(self, image, detections):
+        color = (255, 0, 0)
+        text_thickness = max(1, int(min(image.shape[:2]) * 0.004))
+        for box in detections.boxes:
+            cv2.rectangle(image, (int(box[0]), int(box[1])), (int(box[2]), int(box[3])), color, text_thickness)
+
+        return image
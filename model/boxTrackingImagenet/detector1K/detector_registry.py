@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+
+from model.boxTrackingImagenet.detector1K.detector1K import Detector1K
+
+
+class DetectorRegistry:
+    '''
+    This class holds one Detector1K instance per model path, threshold and session options for the whole process.
+    Building an onnxruntime session parses and optimizes the whole graph, so every WebcamProcessor and
+    InteractionController asks the registry instead of creating a new detector for every frame. A shared detector
+    serializes its calls with its own lock, so processors running in parallel do not mix up their detections.
+    @author: Marcel Achner
+    '''
+    _detectors = {}
+    _build_times = {}
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    '''
+    This function returns the cached detector for the given configuration. On the first request the session is built
+    and warmed up once, so the first webcam frame does not pay for the graph initialisation.
+    @author: Marcel Achner
+    '''
+    @classmethod
+    def get_detector(cls, model_path, threshold, session_options=None):
+        key = cls.make_key(model_path, threshold, session_options)
+        with cls._lock:
+            detector = cls._detectors.get(key)
+            if detector is not None:
+                cls.hits += 1
+                return detector
+
+            cls.misses += 1
+            start_time = time.perf_counter()
+            detector = Detector1K(model_path, threshold, session_options)
+            detector.warm_up()
+            cls._build_times[key] = time.perf_counter() - start_time
+            cls._detectors[key] = detector
+            return detector
+
+    '''
+    This function creates the cache key. The session options are given as dict of onnxruntime.SessionOptions
+    attributes, so they are sorted to get the same key independent of the order.
+    @author: Marcel Achner
+    '''
+    @staticmethod
+    def make_key(model_path, threshold, session_options=None):
+        options = tuple(sorted((session_options or {}).items()))
+        return os.path.abspath(model_path), float(threshold), options
+
+    '''
+    This function returns the cache statistics: hits, misses and the time needed to build and warm up each session
+    @author: Marcel Achner
+    '''
+    @classmethod
+    def get_stats(cls):
+        with cls._lock:
+            return {
+                'hits': cls.hits,
+                'misses': cls.misses,
+                'cached_detectors': len(cls._detectors),
+                'build_time_seconds': sum(cls._build_times.values()),
+                'build_times': dict(cls._build_times),
+            }
+
+    '''
+    This function removes all cached detectors, e.g. when the model file was replaced
+    @author: Marcel Achner
+    '''
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._detectors.clear()
+            cls._build_times.clear()
+            cls.hits = 0
+            cls.misses = 0
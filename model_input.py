@@ -0,0 +1,34 @@
+import numpy as np
+
+# input size of the companion model (height, width), the training shards are packed in this size
+IMAGE_SIZE = (224, 224)
+
+
+'''
+This function returns the output index of every label key. The companion model has one output per entry of the label
+list in its order, which is the same order detect uses to map a predicted index back to its label.
+@author: Bastian Pechler
+'''
+def get_label_mapping(label_list):
+    return {label_key: index for index, label_key in enumerate(label_list)}
+
+
+'''
+This function converts a batch of uint8 RGB images (N x 224 x 224 x 3) into the input of the companion model:
+float32 scaled to [0, 1]
+@author: Bastian Pechler
+'''
+def preprocess_images(images):
+    return images.astype(np.float32) / 255.0
+
+
+'''
+This function returns the augmentation of the training images (albumentations, called as augment(image=img) on one
+uint8 RGB image). albumentations is only imported when the augmentation is active.
+@author: Bastian Pechler
+'''
+def make_augmentation():
+    import albumentations as A
+    return A.Compose([A.HorizontalFlip(p=0.5),
+                      A.Rotate(limit=15, p=0.5),
+                      A.RandomBrightnessContrast(brightness_limit=0.2, contrast_limit=0.2, p=0.5)])
@@ -0,0 +1,68 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+
+    '''
+    This class keeps the last predictions of the companion model (least recently used are removed first). The key is
+    the hash of the image bytes together with the version of the model weights, so asking for the same image again
+    (e.g. "what is this" twice or the same image uploaded again) does not run the model.
+    Every change of the model (retrain, new output, reset) has to call invalidate(), which increases the version.
+    The cache is shared by all controllers, so a retrain started by voice also invalidates the button predictions.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.model_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    '''
+    This function returns the prediction of one image. The image_bytes are only used for the key, if the image is not
+    cached predict_function() is called and whatever it returns (e.g. the label index of CompanionModel.predict) is
+    stored.
+    @author: Bastian Pechler
+    '''
+    def predict(self, image_bytes, predict_function):
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        with self.lock:
+            model_version = self.model_version
+            key = (image_hash, model_version)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        prediction = predict_function()
+        with self.lock:
+            # a prediction running during an invalidation belongs to the old weights and is not stored
+            if model_version == self.model_version:
+                self.entries[key] = prediction
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return prediction
+
+    '''
+    This function removes all predictions, it has to be called whenever the weights of the model change
+    @author: Bastian Pechler
+    '''
+    def invalidate(self):
+        with self.lock:
+            self.model_version += 1
+            self.entries.clear()
+
+    '''
+    This function returns the hits, misses, hit rate, amount of cached predictions and the model version
+    @author: Bastian Pechler
+    '''
+    def get_stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / requests if requests > 0 else 0.0,
+                    'entries': len(self.entries), 'model_version': self.model_version}
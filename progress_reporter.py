@@ -0,0 +1,149 @@
+import threading
+import time
+from traitlets import TraitError
+
+
+class ProgressReporter:
+
+    '''
+    This class shows the real progress of a long operation (download, training, explanation) in the progress bar of
+    the frontend. The work reports its progress (done of total) from any thread, the frontend is updated at most
+    every min_interval seconds, and the description shows the estimated remaining time, based on the measured
+    throughput. No extra thread is needed. Code which can not get the reporter passed (e.g. the download workers
+    behind the backend model) reports to the active reporter with ProgressReporter.report.
+    @author: Marcel Achner
+    '''
+    active_reporters = []
+    active_lock = threading.Lock()
+
+    def __init__(self, frontend_model, description, total=None, min_interval=0.25, progress_max=10, smoothing=0.3):
+        self.frontend_model = frontend_model
+        self.description = description
+        self.total = total
+        self.min_interval = min_interval
+        # the progress bar of the frontend counts from 0 to progress_max
+        self.progress_max = progress_max
+        self.smoothing = smoothing
+        self.done = 0
+        self.lock = threading.Lock()
+        self.start_time = None
+        self.last_update_time = None
+        self.last_done = 0
+        self.rate = None
+        # updates are ignored before start and after stop, so a late update does not show the bar again
+        self.stopped = True
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    '''
+    This function shows the progress bar and makes this reporter the active one
+    @author: Marcel Achner
+    '''
+    def start(self):
+        with self.lock:
+            self.start_time = time.perf_counter()
+            self.last_update_time = self.start_time
+            self.stopped = False
+            self.set_frontend(True, 0, self.description)
+        with ProgressReporter.active_lock:
+            ProgressReporter.active_reporters.append(self)
+
+    '''
+    This function stops the reporter, later updates are ignored. The progress bar is shared, so it is only hidden if
+    no other reporter is active, otherwise it shows the progress of the latest active reporter again.
+    @author: Marcel Achner
+    '''
+    def stop(self):
+        with ProgressReporter.active_lock:
+            if self in ProgressReporter.active_reporters:
+                ProgressReporter.active_reporters.remove(self)
+            with self.lock:
+                self.stopped = True
+                if len(ProgressReporter.active_reporters) == 0:
+                    self.set_frontend(False, self.progress_max, self.description)
+            if len(ProgressReporter.active_reporters) > 0:
+                ProgressReporter.active_reporters[-1].show()
+
+    '''
+    This function shows the current progress of the reporter in the progress bar, if it is not stopped
+    @author: Marcel Achner
+    '''
+    def show(self):
+        with self.lock:
+            if not self.stopped:
+                value, description = self.get_progress_text()
+                self.set_frontend(True, value, description)
+
+    '''
+    This function sets the amount of finished work (and the total, if it is known now)
+    @author: Marcel Achner
+    '''
+    def update(self, done, total=None):
+        with self.lock:
+            if self.stopped:
+                return
+            if total is not None:
+                self.total = total
+            self.done = done
+            now = time.perf_counter()
+            finished = self.total is not None and self.done >= self.total
+            if now - self.last_update_time < self.min_interval and not finished:
+                return
+            # throughput of the last interval, smoothed
+            rate = (self.done - self.last_done) / max(now - self.last_update_time, 1e-9)
+            self.rate = rate if self.rate is None else self.smoothing * rate + (1 - self.smoothing) * self.rate
+            self.last_update_time = now
+            self.last_done = self.done
+            value, description = self.get_progress_text()
+            self.set_frontend(True, value, description)
+
+    '''
+    This function adds amount to the finished work
+    @author: Marcel Achner
+    '''
+    def advance(self, amount=1):
+        self.update(self.done + amount)
+
+    def get_progress_text(self):
+        if not self.total:
+            return 0, f'{self.description}{self.done}'
+        fraction = min(1.0, self.done / self.total)
+        description = f'{self.description}{fraction * 100:.0f}%'
+        eta = self.get_eta()
+        if eta is not None:
+            description += f' (about {int(eta) // 60}:{int(eta) % 60:02d} left)'
+        return int(fraction * self.progress_max), description
+
+    '''
+    This function returns the estimated remaining time in seconds or None if it is not known yet
+    @author: Marcel Achner
+    '''
+    def get_eta(self):
+        if not self.total or not self.rate or self.rate <= 0:
+            return None
+        return max(0.0, (self.total - self.done) / self.rate)
+
+    def set_frontend(self, active, value, description):
+        try:
+            self.frontend_model.loading_active = active
+            self.frontend_model.loading_progress_description = description
+            self.frontend_model.loading_progress_value = value
+        except (ValueError, TraitError):
+            return
+
+    '''
+    This function reports progress to the latest active reporter, if there is one
+    @author: Marcel Achner
+    '''
+    @staticmethod
+    def report(done, total=None):
+        with ProgressReporter.active_lock:
+            if len(ProgressReporter.active_reporters) == 0:
+                return
+            reporter = ProgressReporter.active_reporters[-1]
+        reporter.update(done, total)
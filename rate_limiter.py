@@ -0,0 +1,92 @@
+import time
+
+
+class RateLimiter:
+
+    '''
+    This class paces the requests of all download processes per host. Every host has a token bucket, which is refilled
+    with rate_per_host tokens per second up to burst tokens, and every request takes one token. If a host answers with
+    429 or a 5xx status, all requests to it wait for an exponentially growing backoff (or the Retry-After time of the
+    host). If a host times out failure_threshold times in a row, the circuit is opened and its requests are skipped
+    for open_time seconds. The state lives in a dict of a multiprocessing manager, so all processes share it.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, manager, rate_per_host=10.0, burst=10, host_rates=None, backoff_base=1.0, backoff_max=60.0,
+                 failure_threshold=5, open_time=60.0):
+        self.hosts = manager.dict()
+        self.lock = manager.Lock()
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        # hosts with an own rate, e.g. the imagenet api
+        self.host_rates = host_rates if host_rates is not None else {}
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.open_time = open_time
+
+    def get_rate(self, host):
+        return self.host_rates.get(host, self.rate_per_host)
+
+    '''
+    This function waits until a request to the host is allowed. It returns False without waiting if the circuit of the
+    host is open, so the request should be skipped.
+    @author: Bastian Pechler
+    '''
+    def acquire(self, host):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                state = self.get_state(host, now)
+                if state['open_until'] > now:
+                    return False
+                wait_time = state['blocked_until'] - now
+                if wait_time <= 0:
+                    if state['tokens'] >= 1:
+                        state['tokens'] -= 1
+                        self.hosts[host] = state
+                        return True
+                    wait_time = (1 - state['tokens']) / self.get_rate(host)
+                self.hosts[host] = state
+            time.sleep(wait_time)
+
+    def get_state(self, host, now):
+        state = self.hosts.get(host)
+        if state is None:
+            return {'tokens': float(self.burst), 'refilled': now, 'blocked_until': 0.0, 'backoff_level': 0,
+                    'timeouts': 0, 'open_until': 0.0}
+        state['tokens'] = min(self.burst, state['tokens'] + (now - state['refilled']) * self.get_rate(host))
+        state['refilled'] = now
+        return state
+
+    '''
+    This function updates the state of the host with the result of a request: throttled (429 or 5xx, with the
+    Retry-After time in seconds if the host sent one), timed out or successful
+    @author: Bastian Pechler
+    '''
+    def report(self, host, throttled=False, timed_out=False, retry_after=None):
+        with self.lock:
+            now = time.monotonic()
+            state = self.get_state(host, now)
+            if throttled:
+                backoff = min(self.backoff_max, self.backoff_base * 2 ** state['backoff_level'])
+                if retry_after is not None:
+                    backoff = min(self.backoff_max, max(backoff, retry_after))
+                state['backoff_level'] += 1
+                state['blocked_until'] = max(state['blocked_until'], now + backoff)
+            elif timed_out:
+                state['timeouts'] += 1
+                # after open_time one request may try the host again, if it times out the circuit opens again
+                if state['timeouts'] >= self.failure_threshold:
+                    state['open_until'] = now + self.open_time
+            else:
+                state['backoff_level'] = 0
+                state['timeouts'] = 0
+            self.hosts[host] = state
+
+    '''
+    This function returns the hosts whose circuit is open at the moment
+    @author: Bastian Pechler
+    '''
+    def get_open_hosts(self):
+        now = time.monotonic()
+        return [host for host, state in self.hosts.items() if state['open_until'] > now]
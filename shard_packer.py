@@ -0,0 +1,196 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+INDEX_FILE = 'index.json'
+
+
+class ShardPacker:
+
+    '''
+    This class packs the class folders of the downloaded images into shards for training: every shard is a raw
+    uint8 file of shard_size images of a fixed size (N x H x W x 3, RGB) and a file with the class index of every
+    image. An index file remembers the order of the classes and which files are already packed, so new images and new
+    classes are appended without packing everything again. Images which can not be decoded are skipped.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, images_folder=os.path.join('data/image_net', 'imagenet_images'),
+                 shard_folder=os.path.join('data/image_net', 'shards'), image_size=(224, 224), shard_size=1024):
+        self.images_folder = images_folder
+        self.shard_folder = shard_folder
+        # (height, width)
+        self.image_size = tuple(image_size)
+        self.shard_size = shard_size
+
+    '''
+    This function packs all new images of the given classes (all class folders if None). With rebuild, the shards
+    are packed from scratch. If a packed image was deleted since (e.g. a duplicate removed by the download manifest
+    or a reset of the labels), the shards are packed from scratch as well, so they never outlive their images.
+    It returns the amount of packed images.
+    @author: Bastian Pechler
+    '''
+    def pack(self, label_keys=None, rebuild=False):
+        os.makedirs(self.shard_folder, exist_ok=True)
+        index = None if rebuild else self.load_index()
+        if index is not None and self.has_deleted_images(index):
+            index = None
+        if index is None or tuple(index['image_size']) != self.image_size:
+            self.remove_shards()
+            index = {'image_size': list(self.image_size), 'classes': [], 'packed_files': {}, 'shards': []}
+            self.save_index(index)
+
+        if label_keys is None:
+            label_keys = sorted(entry for entry in os.listdir(self.images_folder)
+                                if os.path.isdir(os.path.join(self.images_folder, entry)))
+        amount_packed = 0
+        for label_key in label_keys:
+            class_folder = os.path.join(self.images_folder, label_key)
+            if not os.path.isdir(class_folder):
+                continue
+            if label_key not in index['classes']:
+                index['classes'].append(label_key)
+                index['packed_files'][label_key] = []
+            packed_files = set(index['packed_files'][label_key])
+            new_files = sorted(file_name for file_name in os.listdir(class_folder)
+                               if file_name not in packed_files and not file_name.endswith('.tmp'))
+            for file_name in new_files:
+                img = self.load_image(os.path.join(class_folder, file_name))
+                if img is not None:
+                    self.append_image(index, img, index['classes'].index(label_key))
+                    amount_packed += 1
+            # also undecodable files are remembered, so they are not tried again
+            index['packed_files'][label_key].extend(new_files)
+            self.save_index(index)
+        return amount_packed
+
+    '''
+    This function returns True if an image of the index is not in its class folder anymore
+    @author: Bastian Pechler
+    '''
+    def has_deleted_images(self, index):
+        for label_key, packed_files in index['packed_files'].items():
+            class_folder = os.path.join(self.images_folder, label_key)
+            existing_files = set(os.listdir(class_folder)) if os.path.isdir(class_folder) else set()
+            if not existing_files.issuperset(packed_files):
+                return True
+        return False
+
+    '''
+    This function decodes an image and resizes it to the shard image size, it returns None if it can not be decoded
+    @author: Bastian Pechler
+    '''
+    def load_image(self, file_path):
+        img = cv2.imread(file_path, cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        img = cv2.resize(img, (self.image_size[1], self.image_size[0]), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+    '''
+    This function appends one image and its class index to the last shard or starts a new one if it is full
+    @author: Bastian Pechler
+    '''
+    def append_image(self, index, img, class_index):
+        if len(index['shards']) == 0 or index['shards'][-1]['count'] >= self.shard_size:
+            index['shards'].append({'name': 'shard_%05d' % len(index['shards']), 'count': 0})
+        shard = index['shards'][-1]
+        images_path, labels_path = self.get_shard_paths(shard['name'])
+        image_bytes = img.nbytes
+        # images appended after the last saved index (e.g. if packing was stopped) are overwritten
+        with open(images_path, 'ab') as images_file:
+            images_file.truncate(shard['count'] * image_bytes)
+            images_file.write(img.tobytes())
+        with open(labels_path, 'ab') as labels_file:
+            labels_file.truncate(shard['count'] * 4)
+            labels_file.write(np.int32(class_index).tobytes())
+        shard['count'] += 1
+
+    def get_shard_paths(self, shard_name):
+        return os.path.join(self.shard_folder, shard_name + '.images'), \
+            os.path.join(self.shard_folder, shard_name + '.labels')
+
+    def load_index(self):
+        try:
+            with open(os.path.join(self.shard_folder, INDEX_FILE), 'r') as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return None
+
+    def save_index(self, index):
+        index_path = os.path.join(self.shard_folder, INDEX_FILE)
+        with open(index_path + '.tmp', 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(index_path + '.tmp', index_path)
+
+    '''
+    This function removes the shards and the index, e.g. after the labels and their images were reset. The next pack
+    starts from scratch.
+    @author: Bastian Pechler
+    '''
+    def clear(self):
+        if os.path.isdir(self.shard_folder):
+            self.remove_shards()
+
+    def remove_shards(self):
+        for file_name in os.listdir(self.shard_folder):
+            if file_name.endswith('.images') or file_name.endswith('.labels') or file_name == INDEX_FILE:
+                os.remove(os.path.join(self.shard_folder, file_name))
+
+
+class ShardDataset:
+
+    '''
+    This class reads the packed shards with numpy.memmap, so no image is decoded again. The shards are packed class by
+    class, so a batch is not a slice of one shard: the indices of all images are shuffled across the shards for every
+    epoch and the rows of a batch are gathered from the mapped files. The operating system keeps the used parts of the
+    shards in the page cache between the epochs.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, shard_folder=os.path.join('data/image_net', 'shards')):
+        with open(os.path.join(shard_folder, INDEX_FILE), 'r') as index_file:
+            index = json.load(index_file)
+        self.image_size = tuple(index['image_size'])
+        self.class_keys = index['classes']
+        self.images = []
+        self.labels = []
+        for shard in index['shards']:
+            if shard['count'] == 0:
+                continue
+            images_path = os.path.join(shard_folder, shard['name'] + '.images')
+            labels_path = os.path.join(shard_folder, shard['name'] + '.labels')
+            self.images.append(np.memmap(images_path, dtype=np.uint8, mode='r',
+                                         shape=(shard['count'],) + self.image_size + (3,)))
+            self.labels.append(np.fromfile(labels_path, dtype=np.int32, count=shard['count']))
+        # index of the first image of every shard
+        self.shard_starts = np.cumsum([0] + [len(labels) for labels in self.labels])[:-1]
+
+    def __len__(self):
+        return sum(len(labels) for labels in self.labels)
+
+    '''
+    This function returns the image indices of every batch of one epoch. With shuffle the images of all shards are
+    mixed, so every batch contains images of several classes.
+    @author: Bastian Pechler
+    '''
+    def get_batch_indices(self, batch_size, shuffle=False, rng=None):
+        indices = rng.permutation(len(self)) if shuffle else np.arange(len(self))
+        return [indices[start:start + batch_size] for start in range(0, len(indices), batch_size)]
+
+    '''
+    This function returns the images (uint8) and class indices of one batch. The rows are read shard by shard in the
+    order of the files, which keeps the reads of the mapped files sequential.
+    @author: Bastian Pechler
+    '''
+    def get_batch(self, indices):
+        indices = np.sort(indices)
+        shard_indices = np.searchsorted(self.shard_starts, indices, side='right') - 1
+        images = np.empty((len(indices),) + self.image_size + (3,), dtype=np.uint8)
+        labels = np.empty(len(indices), dtype=np.int32)
+        for shard_index in np.unique(shard_indices):
+            in_shard = shard_indices == shard_index
+            offsets = indices[in_shard] - self.shard_starts[shard_index]
+            images[in_shard] = self.images[shard_index][offsets]
+            labels[in_shard] = self.labels[shard_index][offsets]
+        return images, labels
@@ -0,0 +1,191 @@
+import importlib
+import sys
+import threading
+import time
+
+PHASE_WARMING_UP = 'warming up'
+PHASE_READY = 'ready'
+PHASE_FAILED = 'failed'
+
+# the modules which take the longest to import, they are imported lazily or warmed up in the background
+HEAVY_MODULES = ['cv2', 'speech_recognition', 'onnxruntime', 'mediapipe', 'sklearn', 'lime.lime_image',
+                 'tensorflow']
+
+
+class Startup:
+
+    '''
+    This class runs the start of the application in phases. The phases needed by everything (e.g. the backend model)
+    run one after the other with run_phase. The heavy parts (TensorFlow, onnxruntime, mediapipe) are warmed up in
+    background threads with warm_up, the features using them show a warming up state until their phase is ready and
+    an error if it failed.
+    Every phase and every import done with timed_import is timed. The report is printed when all phases are done
+    (after all_phases_started was called), so a slower start is visible right away.
+    @author: Bastian Pechler
+    '''
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.phases = {}
+        self.imports = {}
+        self.ready_events = {}
+        self.lock = threading.Lock()
+        self.all_started = False
+        self.report_printed = False
+
+    '''
+    This function runs a phase in the calling thread and returns the result of function(*args, **kwargs)
+    @author: Bastian Pechler
+    '''
+    def run_phase(self, name, function, *args, **kwargs):
+        self.begin_phase(name, threading.current_thread().name)
+        try:
+            result = function(*args, **kwargs)
+        except BaseException as error:
+            self.end_phase(name, error)
+            raise
+        self.end_phase(name)
+        return result
+
+    '''
+    This function runs a phase in a background thread. on_ready(result) is called in this thread when the phase is
+    done, afterwards the phase is ready. A failing phase is printed and stays failed.
+    @author: Bastian Pechler
+    '''
+    def warm_up(self, name, function, *args, on_ready=None, **kwargs):
+        thread_name = 'warm_up_' + name
+        self.begin_phase(name, thread_name)
+
+        def run():
+            try:
+                result = function(*args, **kwargs)
+                if on_ready is not None:
+                    on_ready(result)
+            except Exception as error:
+                print('Warm up of %s failed: %r' % (name, error))
+                self.end_phase(name, error)
+                return
+            self.end_phase(name)
+
+        threading.Thread(target=run, name=thread_name, daemon=True).start()
+
+    def begin_phase(self, name, thread_name):
+        with self.lock:
+            self.phases[name] = {'status': PHASE_WARMING_UP, 'started': time.perf_counter() - self.start_time,
+                                 'duration': None, 'error': None, 'thread': thread_name}
+            self.ready_events.setdefault(name, threading.Event()).clear()
+
+    def end_phase(self, name, error=None):
+        with self.lock:
+            phase = self.phases[name]
+            phase['duration'] = time.perf_counter() - self.start_time - phase['started']
+            phase['status'] = PHASE_READY if error is None else PHASE_FAILED
+            phase['error'] = None if error is None else repr(error)
+            self.ready_events[name].set()
+        self.print_report_when_done()
+
+    '''
+    This function tells that no more phases will be started, the report is printed as soon as all phases are done
+    @author: Bastian Pechler
+    '''
+    def all_phases_started(self):
+        with self.lock:
+            self.all_started = True
+        self.print_report_when_done()
+
+    def print_report_when_done(self):
+        with self.lock:
+            all_done = all(phase['status'] != PHASE_WARMING_UP for phase in self.phases.values())
+            print_report = self.all_started and all_done and not self.report_printed
+            self.report_printed = self.report_printed or print_report
+        if print_report:
+            self.print_report()
+
+    '''
+    This function imports a module and records the time needed for it. If the module was already imported (or is
+    imported by another thread right now), the time is not recorded.
+    @author: Bastian Pechler
+    '''
+    def timed_import(self, module_name):
+        already_imported = module_name in sys.modules
+        start_time = time.perf_counter()
+        # waits for the import of another thread, so the returned module is always complete
+        module = importlib.import_module(module_name)
+        if not already_imported:
+            with self.lock:
+                self.imports.setdefault(module_name, time.perf_counter() - start_time)
+        return module
+
+    '''
+    This function returns True if all given phases are ready. A phase which is still warming up or failed is not ready,
+    get_failed tells which of them failed. Unknown phases count as ready, so a controller without staged start can
+    use it as well.
+    @author: Bastian Pechler
+    '''
+    def is_ready(self, *names):
+        with self.lock:
+            return all(self.phases.get(name, {'status': PHASE_READY})['status'] == PHASE_READY for name in names)
+
+    '''
+    This function returns the names of the given phases which failed
+    @author: Bastian Pechler
+    '''
+    def get_failed(self, *names):
+        with self.lock:
+            return [name for name in names if self.phases.get(name, {'status': PHASE_READY})['status'] == PHASE_FAILED]
+
+    '''
+    This function waits until all given phases are done. It returns False if the timeout was reached before or one of
+    the phases failed.
+    @author: Bastian Pechler
+    '''
+    def wait(self, *names, timeout=None):
+        for name in names:
+            with self.lock:
+                event = self.ready_events.get(name)
+            if event is not None and not event.wait(timeout):
+                return False
+        return not self.get_failed(*names)
+
+    '''
+    This function returns the status of every phase and the import times, e.g. to show them in the frontend
+    @author: Bastian Pechler
+    '''
+    def get_report(self):
+        with self.lock:
+            return {'phases': {name: dict(phase) for name, phase in self.phases.items()},
+                    'imports': dict(self.imports)}
+
+    '''
+    This function prints the start time, duration and status of every phase and the import times
+    @author: Bastian Pechler
+    '''
+    def print_report(self):
+        report = self.get_report()
+        print('Startup report:')
+        for name, phase in sorted(report['phases'].items(), key=lambda item: item[1]['started']):
+            duration = '' if phase['duration'] is None else '%6.2f s' % phase['duration']
+            print('  %-27s started at %6.2f s %9s  %-10s (%s)' % (name, phase['started'], duration, phase['status'],
+                                                               phase['thread']))
+        for module_name, seconds in sorted(report['imports'].items(), key=lambda item: -item[1]):
+            print('  import %-20s %6.2f s' % (module_name, seconds))
+
+
+'''
+This function measures the import time of the heavy modules one after the other (modules imported by an earlier one
+are not counted again), so a slower import is visible without starting the application.
+Start it with: python startup.py
+@author: Bastian Pechler
+'''
+def main():
+    startup = Startup()
+    for module_name in HEAVY_MODULES:
+        try:
+            startup.timed_import(module_name)
+        except ImportError as error:
+            print('%s could not be imported: %s' % (module_name, error))
+    for module_name, seconds in startup.get_report()['imports'].items():
+        print('import %-18s %6.2f s' % (module_name, seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import os
+import time
+
+from image_fetcher import IMAGE_OK, IMAGE_THROTTLED, IMAGE_SKIPPED
+
+
+class UrlListCache:
+
+    '''
+    This class stores the url lists of the ImageNet synsets on disk, so a new download does not need to request them
+    again. Every class (wnid) has a file with its url list and a file with the outcome of every url that has been
+    downloaded (ok, dead, wrong type or too small). Url lists older than ttl seconds are loaded again and their
+    outcomes are forgotten, if all files together are larger than max_size_bytes, the least recently used classes
+    are removed. Several download processes can use the same folder.
+    @author: Bastian Pechler
+    '''
+    def __init__(self, cache_folder, ttl=7 * 24 * 60 * 60, max_size_bytes=50 * 1024 * 1024):
+        self.cache_folder = cache_folder
+        self.ttl = ttl
+        self.max_size_bytes = max_size_bytes
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+    def url_list_path(self, wnid):
+        return os.path.join(self.cache_folder, wnid + '.urls')
+
+    def outcomes_path(self, wnid):
+        return os.path.join(self.cache_folder, wnid + '.outcomes')
+
+    '''
+    This function returns the cached url list of a class or None if it is not cached or expired
+    @author: Bastian Pechler
+    '''
+    def get(self, wnid):
+        url_list_path = self.url_list_path(wnid)
+        try:
+            if time.time() - os.path.getmtime(url_list_path) > self.ttl:
+                return None
+            with open(url_list_path, 'r', encoding='utf-8') as url_list_file:
+                urls = url_list_file.read().splitlines()
+        except OSError:
+            return None
+        # the access time is used to find the least recently used classes
+        os.utime(url_list_path, (time.time(), os.path.getmtime(url_list_path)))
+        return urls
+
+    '''
+    This function stores the url list of a class, the outcomes of an older list are removed
+    @author: Bastian Pechler
+    '''
+    def put(self, wnid, urls):
+        url_list_path = self.url_list_path(wnid)
+        # written to a temporary file first, so no other process reads a half written list
+        tmp_path = url_list_path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as url_list_file:
+            url_list_file.write('\n'.join(urls))
+        os.replace(tmp_path, url_list_path)
+        self.remove_file(self.outcomes_path(wnid))
+        self.evict()
+
+    '''
+    This function returns the known outcome of every url of a class as dict
+    @author: Bastian Pechler
+    '''
+    def get_outcomes(self, wnid):
+        outcomes = {}
+        try:
+            with open(self.outcomes_path(wnid), 'r', encoding='utf-8') as outcomes_file:
+                for line in outcomes_file:
+                    outcome, _, url = line.rstrip('\n').partition('\t')
+                    if url:
+                        outcomes[url] = outcome
+        except OSError:
+            pass
+        return outcomes
+
+    '''
+    This function returns the urls of a class which are known to be dead or no usable image. Throttled and skipped
+    urls are tried again.
+    @author: Bastian Pechler
+    '''
+    def get_bad_urls(self, wnid):
+        return {url for url, outcome in self.get_outcomes(wnid).items()
+                if outcome not in (IMAGE_OK, IMAGE_THROTTLED, IMAGE_SKIPPED)}
+
+    '''
+    This function appends the outcomes of downloaded urls, given as (url, outcome) pairs, to the file of the class.
+    All lines are appended with one write, so the outcomes of several processes do not mix.
+    @author: Bastian Pechler
+    '''
+    def record_outcomes(self, wnid, url_outcomes):
+        if len(url_outcomes) == 0:
+            return
+        lines = ''.join(outcome + '\t' + url + '\n' for url, outcome in url_outcomes)
+        with open(self.outcomes_path(wnid), 'a', encoding='utf-8') as outcomes_file:
+            outcomes_file.write(lines)
+
+    '''
+    This function removes the least recently used classes until the cache is smaller than max_size_bytes
+    @author: Bastian Pechler
+    '''
+    def evict(self):
+        classes = {}
+        total_size = 0
+        for file_name in os.listdir(self.cache_folder):
+            wnid, extension = os.path.splitext(file_name)
+            if extension not in ('.urls', '.outcomes'):
+                continue
+            try:
+                file_stat = os.stat(os.path.join(self.cache_folder, file_name))
+            except OSError:
+                continue
+            total_size += file_stat.st_size
+            last_used, size = classes.get(wnid, (0, 0))
+            if extension == '.urls':
+                last_used = file_stat.st_atime
+            classes[wnid] = (last_used, size + file_stat.st_size)
+
+        for wnid, (last_used, size) in sorted(classes.items(), key=lambda item: item[1][0]):
+            if total_size <= self.max_size_bytes:
+                return
+            self.remove_file(self.url_list_path(wnid))
+            self.remove_file(self.outcomes_path(wnid))
+            total_size -= size
+
+    @staticmethod
+    def remove_file(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
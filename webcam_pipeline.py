@@ -0,0 +1,238 @@
+import collections
+import threading
+import time
+
+import cv2
+
+
+class DropOldestQueue:
+
+    '''
+    This class is a bounded queue between two stages of the webcam pipeline. If the queue is full, the oldest item is
+    dropped, so a slow stage always gets the newest frame instead of a stale one.
+    @author: Marcel Achner
+    '''
+    def __init__(self, maxsize=1):
+        self.items = collections.deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    '''
+    This function adds an item and drops the oldest one if the queue is full
+    @author: Marcel Achner
+    '''
+    def put(self, item):
+        with self.condition:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.condition.notify()
+
+    '''
+    This function returns the oldest item or None if nothing arrived within the timeout or the queue was closed
+    @author: Marcel Achner
+    '''
+    def get(self, timeout=None):
+        with self.condition:
+            self.condition.wait_for(lambda: self.items or self.closed, timeout)
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    '''
+    This function wakes up all waiting stages, so they can stop
+    @author: Marcel Achner
+    '''
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class StageMeter:
+
+    '''
+    This class measures the frame rate of one pipeline stage over the last frames
+    @author: Marcel Achner
+    '''
+    def __init__(self, window=30):
+        self.timestamps = collections.deque(maxlen=window)
+        self.frames = 0
+
+    def tick(self):
+        self.timestamps.append(time.perf_counter())
+        self.frames += 1
+
+    def get_fps(self):
+        if len(self.timestamps) < 2 or self.timestamps[-1] == self.timestamps[0]:
+            return 0.0
+        return (len(self.timestamps) - 1) / (self.timestamps[-1] - self.timestamps[0])
+
+
+class WebcamPipeline:
+
+    '''
+    This class runs the webcam feed of a WebcamProcessor as pipeline: a capture thread only keeps the latest frame,
+    a detection worker draws the bounding boxes and a hand worker locates the index finger tip on the same frame in
+    parallel. The render loop runs in the calling thread, because OpenCV windows have to be updated from there.
+    If the camera does not deliver frames for max_failed_reads reads in a row, the pipeline stops.
+    @author: Marcel Achner
+    '''
+    def __init__(self, webcam_processor, cam, frame_width, frame_height, queue_size=1, max_failed_reads=200):
+        self.webcam_processor = webcam_processor
+        self.cam = cam
+        self.max_failed_reads = max_failed_reads
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+
+        self.detection_queue = DropOldestQueue(queue_size)
+        self.hand_queue = DropOldestQueue(queue_size)
+        self.render_queue = DropOldestQueue(queue_size)
+        self.finger_tip = None
+
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.meters = {
+            'capture': StageMeter(),
+            'detection': StageMeter(),
+            'hands': StageMeter(),
+            'render': StageMeter(),
+        }
+
+    '''
+    This function starts the worker threads and runs the render loop until a bounding box was selected (returns True)
+    or the camera was closed with esc (returns False)
+    @author: Marcel Achner
+    '''
+    def run(self):
+        for target in [self.capture_loop, self.detection_loop, self.hand_loop]:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        try:
+            return self.render_loop()
+        finally:
+            self.stop()
+
+    '''
+    This function stops all worker threads and waits for them, so the camera and the hand tracker can be released
+    afterwards. The workers check the stop event after every frame, so this takes at most one frame.
+    @author: Marcel Achner
+    '''
+    def stop(self):
+        self.stop_event.set()
+        for queue in [self.detection_queue, self.hand_queue, self.render_queue]:
+            queue.close()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    '''
+    This function reads the webcam continuously, so the camera buffer never fills up with stale frames
+    @author: Marcel Achner
+    '''
+    def capture_loop(self):
+        frame_id = 0
+        failed_reads = 0
+        while not self.stop_event.is_set():
+            ret, image = self.cam.read()
+            if not ret or image is None:
+                failed_reads += 1
+                if failed_reads >= self.max_failed_reads:
+                    print('The webcam does not deliver frames, closing the camera')
+                    self.stop_event.set()
+                    break
+                time.sleep(0.01)
+                continue
+            failed_reads = 0
+            frame_id += 1
+            self.detection_queue.put((frame_id, image))
+            self.hand_queue.put((frame_id, image))
+            self.meters['capture'].tick()
+
+    '''
+    This function detects the objects of the latest frame and draws the bounding boxes on a copy of it. The original
+    frame is kept to crop the selected object without bounding boxes.
+    @author: Marcel Achner
+    '''
+    def detection_loop(self):
+        while not self.stop_event.is_set():
+            item = self.detection_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            frame_id, image = item
+            # the detection stage limits the frame rate of the pipeline, so its time adapts the downsize factor
+            start_time = time.perf_counter()
+            img, hit_index = self.webcam_processor.track_imnet(img=image.copy(),
+                                                               scale_percent=self.webcam_processor.scale_percent)
+            self.webcam_processor.update_scale(time.perf_counter() - start_time)
+            self.render_queue.put((frame_id, image, img, hit_index))
+            self.meters['detection'].tick()
+
+    '''
+    This function locates the index finger tip on the latest frame, the frame is mirrored like on screen
+    @author: Marcel Achner
+    '''
+    def hand_loop(self):
+        while not self.stop_event.is_set():
+            item = self.hand_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            frame_id, image = item
+            self.finger_tip = self.webcam_processor.locate_index_finger_tip(cv2.flip(image, 1), self.frame_width,
+                                                                            self.frame_height)
+            self.meters['hands'].tick()
+
+    '''
+    This function shows the frames with bounding boxes and the latest finger tip and checks if the finger tip is
+    pointing on a bounding box. If the pipeline was stopped (the camera delivers no frames), False is returned.
+    @author: Marcel Achner
+    '''
+    def render_loop(self):
+        while not self.stop_event.is_set():
+            item = self.render_queue.get(timeout=0.1)
+            if item is not None:
+                frame_id, image, img, hit_index = item
+                # flip img needs to be done because it is mirrored on screen
+                img = cv2.flip(img, 1)
+                finger_tip = self.finger_tip
+                if finger_tip is not None:
+                    try:
+                        cv2.circle(img, finger_tip, 2, (255, 0, 0), -1)
+                    except:
+                        finger_tip = None
+                if finger_tip is None:
+                    self.webcam_processor.dwell_selector.update(None)
+                else:
+                    # the frame without bounding boxes belonging to these boxes is used for cropping
+                    self.webcam_processor.backup_img = image
+                    self.webcam_processor.check_fingerpointing(finger_tip, self.frame_width, hit_index)
+                cv2.imshow("", img)
+                self.meters['render'].tick()
+
+                if self.webcam_processor.take_screenshot:
+                    self.webcam_processor.take_screenshot = False
+                    return True  # close camera
+
+            key = cv2.waitKey(1)
+            # close camera with esc
+            if key == 27:
+                return False
+        return False
+
+    '''
+    This function returns the frame rate of every stage and the amount of frames dropped between the stages
+    @author: Marcel Achner
+    '''
+    def get_stats(self):
+        return {
+            'fps': {name: meter.get_fps() for name, meter in self.meters.items()},
+            'frames': {name: meter.frames for name, meter in self.meters.items()},
+            'scale_percent': self.webcam_processor.scale_percent,
+            'dropped': {
+                'detection': self.detection_queue.dropped,
+                'hands': self.hand_queue.dropped,
+                'render': self.render_queue.dropped,
+            },
+        }
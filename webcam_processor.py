@@ -1,197 +1,356 @@
-import cv2
-import mediapipe as mp
-from model.boxTrackingImagenet.detector1K.detector1K import Detector1K
-
-
-class WebcamProcessor:
-
-    '''
-    This method initialises the class parameter needed for the bounding boxes, webcam feed, finger point detection
-    and image processing
-    @author: Marcel Achner
-    '''
-    def __init__(self):
-        self.backup_img = None
-        self.WEBCAM_WIDTH = 800
-        self.WEBCAM_HEIGHT = 600
-        self.take_screenshot = False
-        self.current_x1 = None
-        self.current_y1 = None
-        self.current_x2 = None
-        self.current_y2 = None
-        self.cropping_offset = 8
-
-        # variables for usage of mediapipe cause needed in every method
-        self.mp_hands = mp.solutions.hands
-        self.mp_drawing = mp.solutions.drawing_utils
-        return
-
-    '''
-    This function detects the hand landmarks recognized from the input image and visualizes the visible index finger
-    tip with a small circle in the image before returning it. Furthermore here the bounding box coordinates are 
-    saved when a finger tip is pointing on or in a bounding box.
-    @author: Marcel Achner
-    '''
-    def detect_fingerpointing_webcam(self, frame, frame_width, frame_height, boxes_list):
-        with self.mp_hands.Hands(static_image_mode=False, min_detection_confidence=0.6, min_tracking_confidence=0.6,
-                                 max_num_hands=1) as hands:
-
-            # flip img needs to be done because it is mirrored on screen
-            frame = cv2.flip(frame, 1)
-            results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-
-            if results.multi_hand_landmarks is not None:
-                normalized_landmark = results.multi_hand_landmarks[0].landmark[
-                    self.mp_hands.HandLandmark.INDEX_FINGER_TIP]
-                pixel_coordinates_landmark = self.mp_drawing._normalized_to_pixel_coordinates(normalized_landmark.x,
-                                                                                              normalized_landmark.y,
-                                                                                              frame_width,
-                                                                                              frame_height)
-                try:
-                    cv2.circle(frame, pixel_coordinates_landmark, 2, (255, 0, 0), -1)
-                except:
-                    return frame
-
-                # the bounding boxes list, (x1, y1) top-left starting point, (x2, y2) bottom-right ending point
-                for box in boxes_list:
-                    x1 = int(box[2])
-                    y1 = int(box[1])
-                    x2 = int(box[0])
-                    y2 = int(box[3])
-
-                    # note: bounding box is calculated and drawn in a coordinate system starting from top-right to
-                    # bottom-left
-                    landmark_x_tmp = int(pixel_coordinates_landmark[0])
-                    landmark_y_tmp = int(pixel_coordinates_landmark[1])
-                    # adapt the finger coordinates to be calculated in the same way as the bounding boxes
-                    landmark_x = frame_width - landmark_x_tmp
-                    landmark_y = landmark_y_tmp
-                    # check if the finger is pointing on or in an existing bounding box
-                    if x2 <= landmark_x <= x1 and y1 <= landmark_y <= y2:
-                        self.take_screenshot = True
-                        self.current_x1 = x2
-                        self.current_y1 = y1
-                        self.current_x2 = x1
-                        self.current_y2 = y2
-
-        return frame
-
-    '''
-    This function captures the webcam feed and combines object tracking using bounding boxes with fingerpointing
-    of the index tip to specify the object that should be classified. Finally a screenshot from the cropped object
-    is taken and returned
-    @author: Marcel Achner
-    '''
-    def detect_objects(self):
-        # path where the fingerpointing selected object image should be written on
-        image_path = "data/detect_object.png"
-        # create the video stream input of the webcam
-        cam = cv2.VideoCapture(0)  # 0=front-cam, 1=back-cam
-        cam.set(cv2.CAP_PROP_FRAME_WIDTH, self.WEBCAM_WIDTH)
-        cam.set(cv2.CAP_PROP_FRAME_HEIGHT, self.WEBCAM_HEIGHT)
-        frame_width = cam.get(cv2.CAP_PROP_FRAME_WIDTH)
-        frame_height = cam.get(cv2.CAP_PROP_FRAME_HEIGHT)
-
-        while True:
-            ret, image = cam.read()
-            # save the input image from the webcam feed to use this as backup when one want to remove bounding boxes
-            if image is None:
-                continue
-            self.backup_img = image.copy()
-            cv2.flip(self.backup_img, 1)
-            if not ret:
-                continue
-
-            # downsize factor of the img
-            scale_percent = 100
-
-            # update the image in the video sream and use bounding boxes to detect when finger pointing on it
-            img, boxes_list = self.track_imnet(img=image, scale_percent=scale_percent)
-            img = self.detect_fingerpointing_webcam(frame=img, frame_width=frame_width, frame_height=frame_height,
-                                                    boxes_list=boxes_list)
-            cv2.imshow("", img)
-            # take a screenshot of the current image and write it to a file that can be read afterwards
-            if self.take_screenshot:
-                self.take_screenshot = False
-                # use the previously saved image without bounding boxes for cropping and showing object
-                cropped_img = self.crop_image()
-                resized_img = self.padding_and_resize(cropped_img)
-                cv2.flip(resized_img, 1)
-                cv2.imwrite(image_path, resized_img)
-                break  # close camera
-
-            key = cv2.waitKey(30)
-            # close camera with esc
-            if key == 27:
-                break
-        cam.release()
-        cv2.destroyAllWindows()
-        return image_path
-
-    '''
-    This function uses the feature extraction model to get the shown objects and draws bounding boxes for each 
-    object. At first downsize the given image to make predictions and bouding box drawings more efficient
-    @author: Marcel Achner
-    '''
-    @staticmethod
-    def track_imnet(img, scale_percent):
-        detection_model_path = 'model/boxTrackingImagenet/models/object_localizer_float32.onnx'
-        detection_threshold = 0.22
-
-        detector = Detector1K(detection_model_path, detection_threshold)
-
-        # downsize the image read from the webcam to ensure a faster processing of object tracking
-        width = int(img.shape[1] * scale_percent / 100)
-        height = int(img.shape[0] * scale_percent / 100)
-        dim_new = (width, height)
-        # resize and downsize the image
-        resized_img = cv2.resize(img, dim_new, interpolation=cv2.INTER_AREA)
-        # detect objects on the smaller image
-        detections = detector(resized_img)
-        # draw detections on the original image
-        detection_img, boxes_list = detector.draw_detections(img, scale_percent)
-
-        return detection_img, boxes_list
-
-    '''
-    This function crops out the currently selected bounding box plus some more pixel to make sure to receive the 
-    whole area of interest
-    @author: Marcel Achner
-    '''
-    def crop_image(self):
-        x_lower = int(self.current_x1 - self.cropping_offset)
-        x_upper = int(self.current_x2 + self.cropping_offset)
-        y_lower = int(self.current_y1 - self.cropping_offset)
-        y_upper = int(self.current_y2 + self.cropping_offset)
-
-        cropped_image = self.backup_img[y_lower:y_upper, x_lower:x_upper]
-
-        return cropped_image
-
-    '''
-    This function uses the padding function for adding a padding to the smaller side of the image and then resizes 
-    the image to the desired output size of 224x224
-    @author: Marcel Achner
-    '''
-    def padding_and_resize(self, img):
-        img = self.padding(img)
-        cv2.resize(img, dsize=(224, 224), interpolation=cv2.INTER_AREA)
-        return img
-
-    '''
-    This function adds a padding to the image so that it will be of equal height and width
-    @author: Marcel Achner
-    '''
-    @staticmethod
-    def padding(img):
-        img_height = img.shape[0]
-        img_width = img.shape[1]
-
-        # setting the desired img size to the size of the larger side of the img
-        desired_size = max(img_width, img_height)
-
-        delta_width = desired_size - img_width
-        delta_height = desired_size - img_height
-        pad_width = delta_width // 2
-        pad_height = delta_height // 2
-        return cv2.copyMakeBorder(img, pad_height, pad_height, pad_width, pad_width, cv2.BORDER_CONSTANT)
+import time
+
+import cv2
+from adaptive_scale_controller import AdaptiveScaleController
+from box_hit_index import BoxHitIndex, DwellSelector
+from box_tracker import BoxTracker, DetectionScheduler
+from hand_tracker import HandTracker
+from model.boxTrackingImagenet.detector1K.detector_registry import DetectorRegistry
+from webcam_pipeline import WebcamPipeline
+
+
+class WebcamProcessor:
+
+    DETECTION_MODEL_PATH = 'model/boxTrackingImagenet/models/object_localizer_float32.onnx'
+    DETECTION_THRESHOLD = 0.22
+
+    '''
+    This method initialises the class parameter needed for the bounding boxes, webcam feed, finger point detection
+    and image processing
+    @author: Marcel Achner
+    '''
+    def __init__(self, pipelined=False, pipeline_queue_size=1, detection_interval=1, scene_change_threshold=12.0,
+                 scale_percent=100, target_fps=None, min_scale_percent=30, dwell_time=0.3, hit_preference='smallest',
+                 debug_image_path=None):
+        self.backup_img = None
+        self.WEBCAM_WIDTH = 800
+        self.WEBCAM_HEIGHT = 600
+        self.take_screenshot = False
+        self.current_x1 = None
+        self.current_y1 = None
+        self.current_x2 = None
+        self.current_y2 = None
+        self.current_box_id = None
+        self.cropping_offset = 8
+        # the selected object is returned in memory, it is only written to this path for debugging
+        self.debug_image_path = debug_image_path
+        self.detector = None
+        self.detection_session_options = None
+        # time needed for the last object detection (inference only, the session is built once by the registry)
+        self.last_detection_time = None
+        # the detector runs every detection_interval frames (or if the scene changed), in between the boxes are
+        # carried forward by the box tracker which also gives every box a stable id
+        self.detection_scheduler = DetectionScheduler(detection_interval, scene_change_threshold)
+        self.box_tracker = BoxTracker.for_detection_interval(detection_interval)
+        self.visible_detections = None
+        # the hit test index is built once per detection result, a box is selected after pointing on it for dwell_time
+        self.hit_index = None
+        self.hit_preference = hit_preference
+        self.dwell_selector = DwellSelector(dwell_time)
+        # downsize factor of the img used for object detection, adapted to hold the target frame rate if one is given
+        self.scale_percent = scale_percent
+        self.scale_controller = None
+        if target_fps is not None:
+            self.scale_controller = AdaptiveScaleController(target_fps, scale_percent=scale_percent,
+                                                            min_scale_percent=min_scale_percent)
+        # in pipelined mode capturing, detection, hand tracking and rendering run in parallel (see WebcamPipeline)
+        self.pipelined = pipelined
+        self.pipeline_queue_size = pipeline_queue_size
+        self.pipeline_stats = None
+        # frame rate and latencies of the last webcam session, see get_session_stats
+        self.session_stats = None
+
+        # the hand tracker lives for a whole webcam session, so MediaPipe can track the hand between frames
+        self.hand_tracker = HandTracker(max_num_hands=1, min_detection_confidence=0.6, min_tracking_confidence=0.6)
+        # variables for usage of mediapipe cause needed in every method, set when the hand tracker imported mediapipe
+        self.mp_hands = None
+        self.mp_drawing = None
+        return
+
+    '''
+    This function detects the hand landmarks recognized from the input image and visualizes the visible index finger
+    tip with a small circle in the image before returning it. Furthermore here the bounding box coordinates are 
+    saved when a finger tip is pointing on or in a bounding box.
+    @author: Marcel Achner
+    '''
+    def detect_fingerpointing_webcam(self, frame, frame_width, frame_height, hit_index):
+
+        # flip img needs to be done because it is mirrored on screen
+        frame = cv2.flip(frame, 1)
+        pixel_coordinates_landmark = self.locate_index_finger_tip(frame, frame_width, frame_height)
+
+        if pixel_coordinates_landmark is None:
+            self.dwell_selector.update(None)
+            return frame
+
+        try:
+            cv2.circle(frame, pixel_coordinates_landmark, 2, (255, 0, 0), -1)
+        except:
+            return frame
+
+        self.check_fingerpointing(pixel_coordinates_landmark, frame_width, hit_index)
+
+        return frame
+
+    '''
+    This function returns the pixel coordinates of the index finger tip in the given (already mirrored) BGR frame or
+    None if no hand is visible
+    @author: Marcel Achner
+    '''
+    def locate_index_finger_tip(self, mirrored_frame, frame_width, frame_height):
+        results = self.hand_tracker.process(cv2.cvtColor(mirrored_frame, cv2.COLOR_BGR2RGB))
+        if results.multi_hand_landmarks is None:
+            return None
+
+        normalized_landmark = results.multi_hand_landmarks[0].landmark[self.mp_hands.HandLandmark.INDEX_FINGER_TIP]
+        return self.mp_drawing._normalized_to_pixel_coordinates(normalized_landmark.x, normalized_landmark.y,
+                                                                frame_width, frame_height)
+
+    '''
+    This function checks if the finger tip is pointing on or in a bounding box. If it stays on the same box for the
+    dwell time, the coordinates of this bounding box (and its track id) are saved for the screenshot.
+    @author: Marcel Achner
+    '''
+    def check_fingerpointing(self, pixel_coordinates_landmark, frame_width, hit_index):
+        # note: bounding box is calculated and drawn in a coordinate system starting from top-right to bottom-left,
+        # so the finger coordinates are adapted to be calculated in the same way as the bounding boxes
+        landmark_x = frame_width - int(pixel_coordinates_landmark[0])
+        landmark_y = int(pixel_coordinates_landmark[1])
+
+        index = hit_index.query(landmark_x, landmark_y)
+        box_id = None if index is None else hit_index.box_ids[index]
+        if self.dwell_selector.update(box_id) is None:
+            return
+
+        # the bounding box, (x1, y1) top-left starting point, (x2, y2) bottom-right ending point
+        box = hit_index.boxes[index]
+        self.take_screenshot = True
+        self.current_x1 = int(box[0])
+        self.current_y1 = int(box[1])
+        self.current_x2 = int(box[2])
+        self.current_y2 = int(box[3])
+        self.current_box_id = box_id
+
+    '''
+    This function captures the webcam feed and combines object tracking using bounding boxes with fingerpointing
+    of the index tip to specify the object that should be classified. Finally a screenshot from the cropped object
+    is taken and returned as image array (None if the camera was closed with esc). The hand tracker is opened once
+    for the whole session and closed when the camera is closed.
+    In pipelined mode capturing, object detection, hand detection and rendering run in their own threads.
+    @author: Marcel Achner
+    '''
+    def detect_objects(self):
+        screenshot = None
+        # create the video stream input of the webcam
+        cam = cv2.VideoCapture(0)  # 0=front-cam, 1=back-cam
+        cam.set(cv2.CAP_PROP_FRAME_WIDTH, self.WEBCAM_WIDTH)
+        cam.set(cv2.CAP_PROP_FRAME_HEIGHT, self.WEBCAM_HEIGHT)
+        frame_width = cam.get(cv2.CAP_PROP_FRAME_WIDTH)
+        frame_height = cam.get(cv2.CAP_PROP_FRAME_HEIGHT)
+
+        self.hand_tracker.open()
+        self.mp_hands = self.hand_tracker.mp_hands
+        self.mp_drawing = self.hand_tracker.mp_drawing
+        self.detection_scheduler.reset()
+        self.box_tracker.reset()
+        self.dwell_selector.reset()
+        self.hand_tracker.reset_stats()
+        session_start = time.perf_counter()
+        try:
+            if self.pipelined:
+                pipeline = WebcamPipeline(self, cam, frame_width, frame_height, self.pipeline_queue_size)
+                screenshot_requested = pipeline.run()
+                self.pipeline_stats = pipeline.get_stats()
+            else:
+                screenshot_requested = self.process_webcam_feed(cam, frame_width, frame_height)
+
+            # take a screenshot of the current image
+            if screenshot_requested:
+                screenshot = self.take_screenshot_of_selection()
+        finally:
+            self.hand_tracker.close()
+            cam.release()
+            cv2.destroyAllWindows()
+            self.session_stats = self.get_session_stats(time.perf_counter() - session_start)
+            self.print_session_report()
+        return screenshot
+
+    '''
+    This function returns the statistics of the last webcam session: the frame rate, the time of the last object
+    detection, the downsize factor, the latencies of the hand tracker and in pipelined mode the stats of every stage
+    @author: Marcel Achner
+    '''
+    def get_session_stats(self, session_time):
+        hand_stats = self.hand_tracker.get_stats()
+        return {
+            'fps': hand_stats['frames'] / session_time if session_time > 0 else 0.0,
+            'last_detection_ms': None if self.last_detection_time is None else self.last_detection_time * 1000,
+            'scale_percent': self.scale_percent,
+            'hand_tracking': hand_stats,
+            'pipeline': self.pipeline_stats if self.pipelined else None,
+        }
+
+    '''
+    This function prints the frame rate and the latencies of the last webcam session, so a slower feed is visible
+    right away
+    @author: Marcel Achner
+    '''
+    def print_session_report(self):
+        stats = self.session_stats
+        hand_stats = stats['hand_tracking']
+        print('Webcam session: %.1f fps, %d frames, scale %d%%' % (stats['fps'], hand_stats['frames'],
+                                                                 stats['scale_percent']))
+        for name, value in [('object detection', stats['last_detection_ms']),
+                            ('hand tracking (tracked)', hand_stats['mean_tracking_latency_ms']),
+                            ('hand tracking (palm detection)', hand_stats['mean_detection_latency_ms'])]:
+            if value is not None:
+                print('  %-32s %7.1f ms' % (name, value))
+        if stats['pipeline'] is not None:
+            for name, fps in stats['pipeline']['fps'].items():
+                print('  %-32s %7.1f fps' % (name + ' stage', fps))
+
+    '''
+    This function processes the webcam feed frame by frame in one thread until a bounding box was selected (returns
+    True) or the camera was closed with esc (returns False)
+    @author: Marcel Achner
+    '''
+    def process_webcam_feed(self, cam, frame_width, frame_height):
+        while True:
+            ret, image = cam.read()
+            # save the input image from the webcam feed to use this as backup when one want to remove bounding boxes
+            if image is None:
+                continue
+            self.backup_img = image.copy()
+            if not ret:
+                continue
+
+            # update the image in the video sream and use bounding boxes to detect when finger pointing on it
+            start_time = time.perf_counter()
+            img, hit_index = self.track_imnet(img=image, scale_percent=self.scale_percent)
+            img = self.detect_fingerpointing_webcam(frame=img, frame_width=frame_width, frame_height=frame_height,
+                                                    hit_index=hit_index)
+            self.update_scale(time.perf_counter() - start_time)
+            cv2.imshow("", img)
+            if self.take_screenshot:
+                self.take_screenshot = False
+                return True  # close camera
+
+            key = cv2.waitKey(30)
+            # close camera with esc
+            if key == 27:
+                return False
+
+    '''
+    This function uses the previously saved image without bounding boxes for cropping the selected object and
+    returns it. Only if a debug path is set, the image is written to a file as well.
+    @author: Marcel Achner
+    '''
+    def take_screenshot_of_selection(self):
+        cropped_img = self.crop_image()
+        resized_img = self.padding_and_resize(cropped_img)
+        if self.debug_image_path is not None:
+            cv2.imwrite(self.debug_image_path, resized_img)
+        return resized_img
+
+    '''
+    This function returns the object detector. It is requested once from the DetectorRegistry, so all webcam 
+    processors share the same onnxruntime session instead of building a new one for every frame
+    @author: Marcel Achner
+    '''
+    def get_detector(self):
+        if self.detector is None:
+            self.detector = DetectorRegistry.get_detector(self.DETECTION_MODEL_PATH, self.DETECTION_THRESHOLD,
+                                                          self.detection_session_options)
+        return self.detector
+
+    '''
+    This function uses the feature extraction model to get the shown objects and draws bounding boxes for each 
+    object. At first downsize the given image to make predictions and bouding box drawings more efficient.
+    Depending on the detection scheduler the model only runs on some frames, the boxes of the other frames are
+    predicted by the box tracker.
+    @author: Marcel Achner
+    '''
+    def track_imnet(self, img, scale_percent):
+        detector = self.get_detector()
+
+        if self.detection_scheduler.should_detect(img):
+            # downsize the image read from the webcam to ensure a faster processing of object tracking
+            width = int(img.shape[1] * scale_percent / 100)
+            height = int(img.shape[0] * scale_percent / 100)
+            dim_new = (width, height)
+            # resize and downsize the image
+            resized_img = cv2.resize(img, dim_new, interpolation=cv2.INTER_AREA)
+            # detect objects on the smaller image
+            start_time = time.perf_counter()
+            detections = detector.detect_and_filter(resized_img, img.shape[0], img.shape[1])
+            self.last_detection_time = time.perf_counter() - start_time
+            # boxes mapped back to the size of the original image get their track ids
+            self.visible_detections = self.box_tracker.update(detections)
+        else:
+            # carry the boxes of the last detection forward
+            self.visible_detections = self.box_tracker.predict()
+
+        # draw detections on the original image
+        detection_img = detector.draw_boxes(img, self.visible_detections)
+        self.hit_index = BoxHitIndex(self.visible_detections, prefer=self.hit_preference)
+
+        return detection_img, self.hit_index
+
+    '''
+    This function passes the processing time of the last frame to the adaptive scale controller (if a target frame
+    rate is set) and uses the returned downsize factor for the next frames
+    @author: Marcel Achner
+    '''
+    def update_scale(self, frame_time):
+        if self.scale_controller is not None:
+            self.scale_percent = self.scale_controller.update(frame_time)
+
+    '''
+    This function crops out the currently selected bounding box plus some more pixel to make sure to receive the 
+    whole area of interest
+    @author: Marcel Achner
+    '''
+    def crop_image(self):
+        return self.crop_box(self.backup_img, (self.current_x1, self.current_y1, self.current_x2, self.current_y2))
+
+    '''
+    This function crops out the given bounding box (x1, y1, x2, y2) plus the cropping offset, limited to the image
+    @author: Marcel Achner
+    '''
+    def crop_box(self, img, box):
+        x_lower = max(int(box[0] - self.cropping_offset), 0)
+        x_upper = int(box[2] + self.cropping_offset)
+        y_lower = max(int(box[1] - self.cropping_offset), 0)
+        y_upper = int(box[3] + self.cropping_offset)
+
+        cropped_image = img[y_lower:y_upper, x_lower:x_upper]
+
+        return cropped_image
+
+    '''
+    This function uses the padding function for adding a padding to the smaller side of the image and then resizes 
+    the image to the desired output size of 224x224
+    @author: Marcel Achner
+    '''
+    def padding_and_resize(self, img):
+        img = self.padding(img)
+        img = cv2.resize(img, dsize=(224, 224), interpolation=cv2.INTER_AREA)
+        return img
+
+    '''
+    This function adds a padding to the image so that it will be of equal height and width
+    @author: Marcel Achner
+    '''
+    @staticmethod
+    def padding(img):
+        img_height = img.shape[0]
+        img_width = img.shape[1]
+
+        # setting the desired img size to the size of the larger side of the img
+        desired_size = max(img_width, img_height)
+
+        delta_width = desired_size - img_width
+        delta_height = desired_size - img_height
+        pad_width = delta_width // 2
+        pad_height = delta_height // 2
+        return cv2.copyMakeBorder(img, pad_height, pad_height, pad_width, pad_width, cv2.BORDER_CONSTANT)